@@ -4,6 +4,9 @@ from models import db_models, user_models
 from sqlmodel import Session, select
 from core import db, security
 from core.security import require_admin
+from core.frodo.resilience import get_breaker_states
+from core.frodo.variable_cache import variable_file_cache
+from core.services.esv_plan_cache import esv_plan_cache
 
 router = APIRouter()
 
@@ -102,3 +105,30 @@ def delete_user(
     session.commit()
 
     return {"msg": f"User {user_id} deleted successfully"}
+
+@router.get("/circuit-breakers", response_model=list[dict])
+def list_circuit_breakers(
+    admin: db_models.UserProfile = Depends(require_admin)
+):
+    """
+    Current state of the per-tenant circuit breakers guarding frodo and PAIC calls.
+    """
+    return get_breaker_states()
+
+@router.get("/esv-file-cache", response_model=dict)
+def get_esv_file_cache_stats(
+    admin: db_models.UserProfile = Depends(require_admin)
+):
+    """
+    Hit/miss statistics of the parsed PAIC variable file cache.
+    """
+    return variable_file_cache.stats()
+
+@router.get("/esv-plan-cache", response_model=dict)
+def get_esv_plan_cache_stats(
+    admin: db_models.UserProfile = Depends(require_admin)
+):
+    """
+    Hit/miss statistics of the cached ESV diff plans.
+    """
+    return esv_plan_cache.stats()
@@ -1,25 +1,40 @@
 # api/env.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlmodel import Session, select
+from typing import Optional
 from core import db
 from core.security import get_current_user
 from models import db_models
-from models.env_models import EnvironmentCreate, EnvironmentUpdate
+from models.env_models import EnvironmentCreate, EnvironmentUpdate, EnvironmentCloneValues
 from core.logger import get_logger
 from core.frodo.save_connection import save_connection
+from core.etag import weak_etag, not_modified
+from core.services.esv_revision import bump_env_revision, clear_push_watermark, get_revisions
+from core.services.sync_esv_service import clone_env_values_in_db
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+def _env_etag(session: Session, current_user: db_models.UserProfile, *query) -> str:
+    _, env_revision = get_revisions(session, current_user)
+    return weak_etag("env", current_user.id, env_revision, query)
+
 @router.get("/", response_model=list[db_models.Environment])
 def list_envs(
+    request: Request,
+    response: Response,
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
     List all environments owned by the current user.
+    Answers 304 when If-None-Match matches the user's environment revision.
     """
+    cached = not_modified(request, response, _env_etag(session, current_user))
+    if cached:
+        return cached
+
     envs = session.exec(
         select(db_models.Environment).where(
             db_models.Environment.user_profile_id == current_user.id
@@ -48,6 +63,7 @@ def create_env(
 
     env = db_models.Environment(**payload.model_dump(), user_profile_id=current_user.id)
     session.add(env)
+    bump_env_revision(session, current_user)
     session.commit()
     session.refresh(env)
     logger.info(f"Environment '{payload.name}' created for user_id={current_user.id}")
@@ -56,12 +72,19 @@ def create_env(
 @router.get("/{env_name}", response_model=db_models.Environment)
 def get_env(
     env_name: str,
+    request: Request,
+    response: Response,
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
     Get a specific environment by name for the current user.
+    Answers 304 when If-None-Match matches the user's environment revision.
     """
+    cached = not_modified(request, response, _env_etag(session, current_user, env_name))
+    if cached:
+        return cached
+
     env = session.exec(
         select(db_models.Environment).where(
             (db_models.Environment.user_profile_id == current_user.id) &
@@ -94,8 +117,11 @@ def update_env(
     env_data = payload.model_dump(exclude_unset=True)
     for key, value in env_data.items():
         setattr(env, key, value)
+    # The env may now point at another tenant
+    clear_push_watermark(session, env)
 
     session.add(env)
+    bump_env_revision(session, current_user)
     session.commit()
     session.refresh(env)
     logger.info(f"Environment '{env_name}' updated for user_id={current_user.id}")
@@ -119,7 +145,9 @@ def delete_env(
     if not env:
         raise HTTPException(status_code=404, detail="Environment not found.")
 
+    clear_push_watermark(session, env)
     session.delete(env)
+    bump_env_revision(session, current_user)
     session.commit()
     logger.info(f"Environment '{env_name}' deleted for user_id={current_user.id}")
     return {"detail": "Environment deleted successfully."}
@@ -152,3 +180,37 @@ def save_env_connection(
 
     logger.info(f"Frodo connection saved for environment '{env_name}' and user_id={current_user.id}")
     return {"detail": f"Connection saved for environment '{env_name}'"}
+
+@router.post("/{env_name}/clone-values/{target_env_name}", response_model=dict)
+def clone_env_values(
+    env_name: str,
+    target_env_name: str,
+    payload: Optional[EnvironmentCloneValues] = None,
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Copy the ESV values of env_name to target_env_name, server-side.
+    Optionally restricted by name prefix or list, with per-variable value
+    overrides; existing target values are only replaced with overwrite=true.
+    """
+    if env_name == target_env_name:
+        raise HTTPException(status_code=400, detail="Source and target environments must differ.")
+
+    payload = payload or EnvironmentCloneValues()
+    try:
+        counts = clone_env_values_in_db(
+            session=session,
+            current_user=current_user,
+            source_env_name=env_name,
+            target_env_name=target_env_name,
+            prefix=payload.prefix,
+            names=payload.names,
+            overrides=payload.overrides,
+            overwrite=payload.overwrite
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    logger.info(f"Cloned ESV values from '{env_name}' to '{target_env_name}' for user_id={current_user.id}")
+    return counts
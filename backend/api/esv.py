@@ -1,51 +1,199 @@
 # api/esv.py
-from fastapi import APIRouter, HTTPException, Depends, Body
+import base64
+import binascii
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from typing import Iterator, List, Literal, Optional
 from core import db
 from core.security import get_current_user
 from core.logger import get_logger
 from core.job import run_job_in_background
+from core.etag import weak_etag, not_modified
+from core.ndjson import NDJSON_MEDIA_TYPE, encode_json, iter_ndjson
+from core.frodo.git_source import GitPathError, GitRefError
 from models import db_models
 from models.esv_models import (
     EsvVariableResponse,
     EsvVariableCreate,
     EsvVariableUpdate,
-    EsvVariableDelete
+    EsvVariableDelete,
+    EsvPushMany
 )
 from core.services.sync_esv_service import (
-    get_variables_in_db,
+    ESV_VARIABLE_FIELDS,
+    list_variables_in_db,
+    get_variable_matrix,
+    compare_envs_in_db,
     create_variables_in_db,
     update_variables_in_db,
     delete_variables_in_db,
     diff_source_vs_db_all_envs,
     diff_db_vs_source_all_envs,
+    iter_diff_source_vs_db_all_envs,
+    iter_diff_db_vs_source_all_envs,
+    source_fingerprints,
     apply_pull_from_source,
     apply_push_to_source
 )
+from core.services.push_many_service import apply_push_to_sources
+from core.services.drift_service import check_drift, apply_push_and_verify
+from core.services.esv_revision import get_revisions
+from core.services.esv_diff import DiffEntry, summarize_diff
+from core.services.esv_transfer import EsvImportError, import_variables, export_variables
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
-@router.get("/variable", status_code=200, response_model=List[EsvVariableResponse])
+def _encode_cursor(name: str) -> str:
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> str:
+    try:
+        return base64.b64decode(cursor.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (binascii.Error, UnicodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@router.get(
+    "/variable",
+    status_code=200,
+    response_model=List[EsvVariableResponse],
+    response_model_exclude_unset=True
+)
 def get_esv_variables(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all variables when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    prefix: Optional[str] = Query(None, description="Only variables whose name starts with this"),
+    env: Optional[str] = Query(None, description="Only variables with a value in this env, with only that value"),
+    expressionType: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated fields besides name: description,expressionType,values"),
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
-    Get all ESV variables for the current user, grouped with values per environment.
-    Uses the get_variables_in_db service.
+    Get ESV variables for the current user, grouped with values per environment,
+    ordered by name. With `limit`, results are paged: pass the X-Next-Cursor
+    response header as `cursor` to get the next page (no header on the last page).
+    Answers 304 when If-None-Match matches the user's current ESV/env revisions
+    for the same query.
     """
     logger.info(f"Fetching ESV variables for user_id={current_user.id}")
 
-    response = get_variables_in_db(
-        session=session,
-        current_user=current_user
+    selected_fields = set(ESV_VARIABLE_FIELDS)
+    if fields is not None:
+        selected_fields = {field.strip() for field in fields.split(",") if field.strip()}
+        unknown = selected_fields - set(ESV_VARIABLE_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+    etag = weak_etag(
+        "esv",
+        current_user.id,
+        get_revisions(session, current_user),
+        (limit, cursor, prefix, env, expressionType, tuple(sorted(selected_fields)))
     )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    try:
+        variables, next_after = list_variables_in_db(
+            session=session,
+            current_user=current_user,
+            limit=limit,
+            after=_decode_cursor(cursor) if cursor else None,
+            prefix=prefix,
+            env_name=env,
+            expression_type=expressionType,
+            fields=selected_fields
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if next_after is not None:
+        response.headers["X-Next-Cursor"] = _encode_cursor(next_after)
+
+    logger.info(f"Found {len(variables)} ESV variables for user_id={current_user.id}")
+    return variables
+
+@router.get("/matrix", status_code=200)
+def get_esv_matrix(
+    request: Request,
+    response: Response,
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Get all ESV values of the current user as a columnar variables x environments
+    matrix: {"envs": [...], "names": [...], "values": [one column per env, null for gaps]}.
+    Much smaller than GET /variable, which repeats env names for every variable.
+    """
+    etag = weak_etag("esv-matrix", current_user.id, get_revisions(session, current_user))
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    matrix = get_variable_matrix(session=session, current_user=current_user)
+    return Response(content=encode_json(matrix), media_type="application/json", headers={"ETag": etag})
+
+@router.get("/compare", status_code=200)
+def compare_esv_envs(
+    request: Request,
+    response: Response,
+    left: str = Query(..., description="Env name, e.g. SBX"),
+    right: str = Query(..., description="Env name, e.g. PROD"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all differences when omitted"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one entry per line"),
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    List the variables whose values differ between two envs, ordered by name:
+    {"name", "status": "missing_left" | "missing_right" | "different", "left", "right"}.
+    With `limit`, results are paged like GET /variable (X-Next-Cursor header).
+    """
+    logger.info(f"Comparing envs {left} and {right} for user_id={current_user.id}")
 
-    logger.info(f"Found {len(response)} ESV variables for user_id={current_user.id}")
-    return response
+    etag = weak_etag(
+        "esv-compare",
+        format,
+        current_user.id,
+        get_revisions(session, current_user),
+        (left, right, limit, cursor)
+    )
+    cached = not_modified(request, response, etag)
+    if cached:
+        return cached
+
+    try:
+        entries = compare_envs_in_db(
+            session=session,
+            current_user=current_user,
+            left_env_name=left,
+            right_env_name=right,
+            limit=limit,
+            after=_decode_cursor(cursor) if cursor else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    headers = {"ETag": etag}
+    if limit is not None:
+        # A page is small: read it first so the next cursor can go in the headers
+        entries = list(entries)
+        if len(entries) > limit:
+            entries = entries[:limit]
+            headers["X-Next-Cursor"] = _encode_cursor(entries[-1]["name"])
+
+    if format == "ndjson":
+        return StreamingResponse(iter_ndjson(entries), media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+    response.headers.update(headers)
+    return list(entries)
 
 @router.post("/variable", status_code=200, response_model=List[EsvVariableResponse])
 def create_esv_variables(
@@ -69,6 +217,49 @@ def create_esv_variables(
 
     return created_vars
 
+@router.post("/variable/import", status_code=200)
+async def import_esv_variables(
+    request: Request,
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Create or overwrite ESV variables from a streamed request body:
+    - ndjson: one {"name", "description", "expressionType", "values": {env: value}} per line
+    - csv: header name,description,expressionType,<env>...; a \\N cell is null
+      (no description / no value in that env), an empty cell is an empty
+      string, so a literal "\\N" value cannot be imported from CSV
+    The body is parsed as it arrives and upserted in committed chunks.
+    Returns the number of variables and of created/updated rows.
+    """
+    logger.info(f"Importing ESV variables ({format}) for user_id={current_user.id}")
+
+    try:
+        return await import_variables(request.stream(), format, session, current_user)
+    except EsvImportError as e:
+        raise HTTPException(status_code=400, detail={"error": str(e), "imported": e.imported})
+
+@router.get("/variable/export", status_code=200)
+def export_esv_variables(
+    format: Literal["ndjson", "csv"] = Query("ndjson"),
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Stream all ESV variables of the current user, ordered by name, in the
+    format POST /variable/import accepts. Importing the export back changes
+    nothing (CSV writes \\N for nulls).
+    """
+    logger.info(f"Exporting ESV variables ({format}) for user_id={current_user.id}")
+
+    media_type = "text/csv" if format == "csv" else NDJSON_MEDIA_TYPE
+    return StreamingResponse(
+        export_variables(session, current_user, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="esv-variables.{format}"'}
+    )
+
 @router.patch("/variable", status_code=200, response_model=List[EsvVariableResponse])
 def update_esv_variables(
     payload: List[EsvVariableUpdate],
@@ -113,42 +304,119 @@ def delete_esv_variables(
 
     return deleted_vars
 
+def _stream_diff(entries: Iterator[DiffEntry], etag: str, label: str) -> StreamingResponse:
+    """One {"action": ..., **entry} JSON line per diff entry, encoded as they are produced."""
+    def lines():
+        counts = {"create": 0, "update": 0, "delete": 0}
+        for action, entry in entries:
+            counts[action] += 1
+            yield {"action": action, **entry}
+        logger.info(f"{label} diff streamed: {counts}")
+
+    return StreamingResponse(iter_ndjson(lines()), media_type=NDJSON_MEDIA_TYPE, headers={"ETag": etag})
+
 @router.get("/variable/preview-pull", status_code=200)
 def preview_pull_esv_variables(
+    request: Request,
+    response: Response,
+    ref: Optional[str] = Query(None, description="Git ref to read the source from (branch, tag, origin/<branch>, commit)"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one diff entry per line"),
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
     Preview what will change in the DB if you pull variables from the local source.
     Shows create/update/delete actions.
+    With `ref`, the source is read from that git ref without a checkout.
+    With format=ndjson, entries are streamed as JSON lines with an "action" field.
+    Answers 304 when If-None-Match matches the current DB revisions and source state.
     """
-    logger.info(f"Running pull diff for user_id={current_user.id}")
+    logger.info(f"Running pull diff for user_id={current_user.id} ref={ref}")
 
-    diff_result = diff_source_vs_db_all_envs(
-        session=session,
-        current_user=current_user
-    )
+    try:
+        etag = weak_etag(
+            "preview-pull",
+            format,
+            current_user.id,
+            get_revisions(session, current_user),
+            ref,
+            source_fingerprints(session, current_user, ref=ref)
+        )
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+
+        if format == "ndjson":
+            entries = iter_diff_source_vs_db_all_envs(
+                session=session,
+                current_user=current_user,
+                ref=ref
+            )
+            return _stream_diff(entries, etag, "Pull")
 
-    logger.info(f"Pull diff result: {diff_result}")
+        diff_result = diff_source_vs_db_all_envs(
+            session=session,
+            current_user=current_user,
+            ref=ref
+        )
+    except GitPathError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except GitRefError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Pull diff result: {summarize_diff(diff_result)}")
     return diff_result
 
 @router.get("/variable/preview-push", status_code=200)
 def preview_push_esv_variables(
+    request: Request,
+    response: Response,
+    ref: Optional[str] = Query(None, description="Git ref to read the source from (branch, tag, origin/<branch>, commit)"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson streams one diff entry per line"),
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
     Preview what will change in the source if you push variables from the DB.
     Shows create/update/delete actions.
+    With `ref`, the source is read from that git ref without a checkout.
+    With format=ndjson, entries are streamed as JSON lines with an "action" field.
+    Answers 304 when If-None-Match matches the current DB revisions and source state.
     """
-    logger.info(f"Running push diff for user_id={current_user.id}")
+    logger.info(f"Running push diff for user_id={current_user.id} ref={ref}")
 
-    diff_result = diff_db_vs_source_all_envs(
-        session=session,
-        current_user=current_user
-    )
+    try:
+        etag = weak_etag(
+            "preview-push",
+            format,
+            current_user.id,
+            get_revisions(session, current_user),
+            ref,
+            source_fingerprints(session, current_user, ref=ref)
+        )
+        cached = not_modified(request, response, etag)
+        if cached:
+            return cached
+
+        if format == "ndjson":
+            entries = iter_diff_db_vs_source_all_envs(
+                session=session,
+                current_user=current_user,
+                ref=ref
+            )
+            return _stream_diff(entries, etag, "Push")
 
-    logger.info(f"Push diff result: {diff_result}")
+        diff_result = diff_db_vs_source_all_envs(
+            session=session,
+            current_user=current_user,
+            ref=ref
+        )
+    except GitPathError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except GitRefError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    logger.info(f"Push diff result: {summarize_diff(diff_result)}")
     return diff_result
 
 @router.post("/variable/pull", status_code=200)
@@ -157,24 +425,67 @@ def pull_esv_variables(
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
-    Actually perform the pull sync, applying create/update/delete actions.
+    Actually perform the pull sync, applying create/update/delete actions,
+    in a background job. Poll /job/status/{job_id} for progress.
     """
     logger.info(f"Running pull sync for user_id={current_user.id}")
-    return apply_pull_from_source(session, current_user)
+    job_id = run_job_in_background(
+        job_type="pull_esv_variables",
+        job_fn=lambda: apply_pull_from_source(
+            session=session,
+            current_user=current_user
+        ),
+        session=session,
+        current_user=current_user
+    )
+
+    return {"job_id": job_id}
+
+@router.post("/variable/push", status_code=200)
+def push_esv_variables_many(
+    payload: EsvPushMany,
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Push several envs from one DB snapshot, concurrently. Returns the parent
+    job; each env gets a child job, listed in the parent's result.
+    With verify, every tenant is then checked for drift (see /esv/drift).
+    """
+    if not payload.envs:
+        raise HTTPException(status_code=400, detail="At least one env is required.")
+
+    job_id = run_job_in_background(
+        job_type="push_many_esv_variables",
+        job_fn=lambda: apply_push_to_sources(
+            env_names=payload.envs,
+            session=session,
+            current_user=current_user,
+            verify=payload.verify
+        ),
+        session=session,
+        current_user=current_user
+    )
+
+    return {"job_id": job_id}
 
 @router.post("/variable/push/{env_name}", status_code=200)
 def push_esv_variables(
     env_name: str,
+    verify: bool = Query(False),
     session: Session = Depends(db.get_session),
     current_user: db_models.UserProfile = Depends(get_current_user)
 ):
     """
     Actually perform the push sync, applying create/update/delete actions
-    for the given env_name.
+    for the given env_name. With verify, the tenant is then checked for
+    drift and the job result lists whatever did not land; with an async
+    apply the check runs once the tenant restart has completed.
     """
+    push = apply_push_and_verify if verify else apply_push_to_source
     job_id = run_job_in_background(
         job_type="push_esv_variables",
-        job_fn=lambda: apply_push_to_source(
+        job_fn=lambda: push(
             env_name=env_name,
             session=session,
             current_user=current_user
@@ -183,4 +494,39 @@ def push_esv_variables(
         current_user=current_user
     )
 
-    return {"job_id": job_id}
\ No newline at end of file
+    return {"job_id": job_id}
+
+@router.get("/drift", status_code=200)
+def get_esv_drift_many(
+    env: List[str] = Query(..., min_length=1),
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Check several tenants for drift from the DB at once (?env=DEV&env=SBX).
+    An env whose live export failed gets an 'error' entry.
+    """
+    try:
+        return check_drift(env, session=session, current_user=current_user)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/drift/{env_name}", status_code=200)
+def get_esv_drift(
+    env_name: str,
+    session: Session = Depends(db.get_session),
+    current_user: db_models.UserProfile = Depends(get_current_user)
+):
+    """
+    Compare the tenant's live ESV variables with the DB for env_name.
+    'create' / 'update' list what the tenant is missing or holds differently,
+    'delete' what only the tenant has.
+    """
+    try:
+        result = check_drift([env_name], session=session, current_user=current_user)[env_name]
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    if "error" in result:
+        raise HTTPException(status_code=502, detail=f"Could not read live variables: {result['error']}")
+    return result
@@ -5,7 +5,7 @@ from models import db_models
 from core import db
 from core.security import get_current_user
 from core.logger import get_logger
-from core.job import get_job_status, get_job_result
+from core.job import get_job_status, get_job_progress, get_job_result
 
 logger = get_logger(__name__)
 
@@ -24,7 +24,11 @@ def get_job_status_api(
             current_user=current_user,
             job_id=job_id)
         logger.info(f"Status for job_id={job_id}: {status}")
-        return {"job_id": job_id, "status": status}
+        progress = get_job_progress(
+            session=session,
+            current_user=current_user,
+            job_id=job_id)
+        return {"job_id": job_id, "status": status, "progress": progress}
     except ValueError as e:
         logger.warning(f"Job not found or unauthorized for job_id={job_id}")
         raise HTTPException(status_code=404, detail=str(e))
@@ -0,0 +1,183 @@
+# benchmarks/bench_esv_diff.py
+"""
+End-to-end benchmark of the pull diff (source -> DB), DB load included:
+  baseline - the implementation before core/services/esv_diff.py: ORM load of
+             every variable, lazy load of each variable's values, and next()
+             scans over envs and values for every comparison
+  indexed  - load_diff_indexes (hash pre-filter + one joined query for the
+             changed variables) followed by iter_source_vs_db
+
+Seeds an in-memory SQLite DB with N variables x E envs. The source holds the
+same variables with a mix of unchanged, changed, DB-only and source-only
+ones, served from memory so that file parsing is not part of the timing.
+
+Run from backend/ (needs the same settings/.env as the app):
+    python -m benchmarks.bench_esv_diff
+    python -m benchmarks.bench_esv_diff --sizes 1000,5000,10000 --envs 10 --baseline-max 5000
+"""
+import argparse
+import logging
+import random
+import time
+
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine, select
+
+from models import db_models
+from core.frodo.variable_files import make_variable_record
+from core.services import esv_diff
+from core.services.esv_diff import collect_diff, iter_source_vs_db, load_diff_indexes
+
+def seed(session: Session, num_vars: int, num_envs: int, seed: int = 42):
+    """Seed the DB and return (user, envs, source variables by env name)."""
+    rnd = random.Random(seed)
+    identity = db_models.IdentityUser(subject="bench")
+    session.add(identity)
+    session.commit()
+    user = db_models.UserProfile(user_id=identity.id, username="bench")
+    session.add(user)
+    session.commit()
+
+    envs = [
+        db_models.Environment(
+            name=f"ENV{i:02d}", platformUrl="x", serviceAccountID="x",
+            serviceAccountJWK={}, scope="x", user_profile_id=user.id
+        )
+        for i in range(num_envs)
+    ]
+    session.add_all(envs)
+    session.commit()
+    env_names = [env.name for env in envs]
+
+    variables, values = [], []
+    source = {name: {} for name in env_names}
+    for i in range(num_vars):
+        var_id, name = i + 1, f"esv-variable-{i:06d}"
+        env_values = {env: f"value-{i}-{env}" for env in env_names}
+        roll = rnd.random()
+
+        # < 0.05: DB only, 0.05 - 0.10: source only, rest: both, some of them changed
+        if roll >= 0.05:
+            source_values = dict(env_values)
+            if 0.10 <= roll < 0.30:
+                source_values[rnd.choice(env_names)] = "changed"
+            if 0.10 <= roll < 0.35:
+                source_values.pop(rnd.choice(env_names), None)
+            for env_name, value in source_values.items():
+                source[env_name][name] = make_variable_record("d", "string", value)
+        if 0.05 <= roll < 0.10:
+            continue
+
+        variables.append({"id": var_id, "name": name, "description": "d",
+                          "expressionType": "string", "user_profile_id": user.id})
+        values.extend(
+            {"variable_id": var_id, "environment_id": env.id, "value": env_values[env.name]}
+            for env in envs
+        )
+
+    session.exec(insert(db_models.EsvVariable), params=variables)
+    session.exec(insert(db_models.EsvVariableValue), params=values)
+    session.commit()
+    session.refresh(user)
+    return user, envs, source
+
+def baseline_diff(session: Session, user, envs, source):
+    """diff_source_vs_db_all_envs as it was before the indexed engine."""
+    source_lookup = {}
+    for env in envs:
+        for name, var in source[env.name].items():
+            if name not in source_lookup:
+                source_lookup[name] = {"description": var.description, "expressionType": var.expressionType, "values": {}}
+            source_lookup[name]["values"][env.name] = var.value
+
+    db_vars = session.exec(
+        select(db_models.EsvVariable).where(db_models.EsvVariable.user_profile_id == user.id)
+    ).all()
+    db_lookup = {var.name: var for var in db_vars}
+
+    create_list, update_list, delete_list = [], [], []
+    for name, source_var in source_lookup.items():
+        if name not in db_lookup:
+            create_list.append({"name": name, **source_var})
+            continue
+        db_var = db_lookup[name]
+        changed_values, partial_create_values = {}, {}
+        for env_name, source_val in source_var["values"].items():
+            env_obj = next((e for e in envs if e.name == env_name), None)
+            if not env_obj:
+                continue
+            db_val = next((v for v in db_var.values if v.environment_id == env_obj.id), None)
+            db_val_value = db_val.value if db_val else None
+            if db_val_value is None and source_val is not None:
+                partial_create_values[env_name] = source_val
+            elif db_val_value != source_val:
+                changed_values[env_name] = {"old": db_val_value, "new": source_val}
+        if db_var.description != source_var["description"] or changed_values:
+            update_list.append({"name": name, "values": changed_values})
+        if partial_create_values:
+            create_list.append({"name": name, "values": partial_create_values})
+
+    for name, db_var in db_lookup.items():
+        if name not in source_lookup:
+            delete_list.append({"name": name, "values": {
+                env.name: val.value for val in db_var.values for env in envs if env.id == val.environment_id
+            }})
+            continue
+        source_envs = source_lookup[name]["values"].keys()
+        partial_values = {}
+        for db_val in db_var.values:
+            env_obj = next((e for e in envs if e.id == db_val.environment_id), None)
+            if env_obj and env_obj.name not in source_envs:
+                partial_values[env_obj.name] = db_val.value
+        if partial_values:
+            delete_list.append({"name": name, "values": partial_values})
+
+    return {"create": create_list, "update": update_list, "delete": delete_list}
+
+def indexed_diff(session: Session, user, envs, source):
+    db_index, source_index = load_diff_indexes(session, user, envs)
+    return collect_diff(iter_source_vs_db(source_index, db_index))
+
+def best_of(fn, session: Session, user, envs, source, repeat: int):
+    best, result = float("inf"), None
+    user_id, env_ids = user.id, [env.id for env in envs]
+    for _ in range(repeat):
+        # Every run starts from an empty identity map, like a fresh request
+        session.expunge_all()
+        user = session.get(db_models.UserProfile, user_id)
+        envs = [session.get(db_models.Environment, env_id) for env_id in env_ids]
+        start = time.perf_counter()
+        result = fn(session, user, envs, source)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--envs", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline-max", type=int, default=10000, help="Skip the baseline above this many variables")
+    args = parser.parse_args()
+
+    logging.getLogger(esv_diff.__name__).setLevel(logging.WARNING)
+    print(f"{'variables':>10} {'envs':>5} {'baseline (s)':>13} {'indexed (s)':>12} {'speedup':>8} {'us/var (indexed)':>17}")
+
+    for size in [int(n) for n in args.sizes.split(",")]:
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            user, envs, source = seed(session, size, args.envs)
+            esv_diff.pull_variables_from_source = lambda env_name, ref=None: source[env_name]
+
+            indexed_time, indexed = best_of(indexed_diff, session, user, envs, source, args.repeat)
+            if size <= args.baseline_max:
+                baseline_time, baseline = best_of(baseline_diff, session, user, envs, source, 1)
+                assert [len(baseline[key]) for key in baseline] == [len(indexed[key]) for key in indexed]
+                baseline_cell, speedup = f"{baseline_time:>13.3f}", f"{baseline_time / indexed_time:>7.1f}x"
+            else:
+                baseline_cell, speedup = f"{'-':>13}", f"{'-':>8}"
+        engine.dispose()
+        print(f"{size:>10} {args.envs:>5} {baseline_cell} {indexed_time:>12.3f} {speedup} {indexed_time / size * 1e6:>17.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# benchmarks/bench_esv_matrix.py
+"""
+Payload size and build time of the two ESV read formats:
+  variables - GET /esv/variable: build_esv_variable_responses, serialised the
+              way FastAPI does it (jsonable_encoder + json.dumps)
+  matrix    - GET /esv/matrix: get_variable_matrix (one pivot query),
+              serialised with encode_json (orjson when installed)
+
+Seeds an in-memory SQLite DB with N variables x E envs, about 10% of the
+cells left empty.
+
+Run from backend/ (needs the same settings/.env as the app):
+    python -m benchmarks.bench_esv_matrix
+    python -m benchmarks.bench_esv_matrix --sizes 1000,10000 --envs 8
+"""
+import argparse
+import json
+import logging
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine
+
+from models import db_models
+from core.ndjson import encode_json, orjson
+from core.services import sync_esv_service
+from core.services.sync_esv_service import build_esv_variable_responses, get_variable_matrix
+
+def seed(session: Session, num_vars: int, num_envs: int, seed: int = 42):
+    rnd = random.Random(seed)
+    identity = db_models.IdentityUser(subject="bench")
+    session.add(identity)
+    session.commit()
+    user = db_models.UserProfile(user_id=identity.id, username="bench")
+    session.add(user)
+    session.commit()
+
+    envs = [
+        db_models.Environment(
+            name=f"ENV{i:02d}", platformUrl="x", serviceAccountID="x",
+            serviceAccountJWK={}, scope="x", user_profile_id=user.id
+        )
+        for i in range(num_envs)
+    ]
+    session.add_all(envs)
+    session.commit()
+
+    session.exec(insert(db_models.EsvVariable), params=[
+        {"name": f"esv-variable-{i:06d}", "description": f"Synthetic variable {i}",
+         "expressionType": "string", "user_profile_id": user.id}
+        for i in range(num_vars)
+    ])
+    session.exec(insert(db_models.EsvVariableValue), params=[
+        {"variable_id": var_id, "environment_id": env.id, "value": f"value-{var_id}-{env.name}"}
+        for var_id in range(1, num_vars + 1)
+        for env in envs
+        if rnd.random() > 0.1
+    ])
+    session.commit()
+    session.refresh(user)
+    return user
+
+def variables_payload(session: Session, user) -> bytes:
+    return json.dumps(jsonable_encoder(build_esv_variable_responses(session, user))).encode("utf-8")
+
+def matrix_payload(session: Session, user) -> bytes:
+    return encode_json(get_variable_matrix(session, user))
+
+def best_of(fn, session: Session, user, repeat: int):
+    best, payload = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn(session, user)
+        best = min(best, time.perf_counter() - start)
+    return best, payload
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000")
+    parser.add_argument("--envs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logging.getLogger(sync_esv_service.__name__).setLevel(logging.WARNING)
+    print(f"JSON encoder: {'orjson' if orjson is not None else 'json'}")
+    print(f"{'variables':>10} {'envs':>5} {'variables (s)':>14} {'matrix (s)':>11} {'variables (KB)':>15} {'matrix (KB)':>12}")
+
+    for size in [int(n) for n in args.sizes.split(",")]:
+        engine = create_engine("sqlite://")
+        SQLModel.metadata.create_all(engine)
+        with Session(engine) as session:
+            user = seed(session, size, args.envs)
+            list_time, list_payload = best_of(variables_payload, session, user, args.repeat)
+            matrix_time, matrix_bytes = best_of(matrix_payload, session, user, args.repeat)
+        engine.dispose()
+        print(
+            f"{size:>10} {args.envs:>5} {list_time:>14.3f} {matrix_time:>11.3f} "
+            f"{len(list_payload) / 1024:>15.0f} {len(matrix_bytes) / 1024:>12.0f}"
+        )
+
+if __name__ == "__main__":
+    main()
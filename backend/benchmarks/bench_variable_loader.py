@@ -0,0 +1,104 @@
+# benchmarks/bench_variable_loader.py
+"""
+Cold-cache benchmark for loading ESV variable files (core/frodo/variable_files.py).
+
+Writes N synthetic *.variable.json files into a temp PAIC layout and compares:
+  baseline  - the previous loader: one file at a time, stdlib json,
+              one pydantic EsvVariablePerEnv per variable
+  loader    - load_variable_files with the configured worker count, the fast
+              JSON parser when installed, and VariableRecord tuples
+
+The file cache is emptied before every run, so every file is parsed. Per-file
+log lines are switched off on both sides so only reading and parsing are
+measured. Thread workers mostly pay off on slow (network) storage and with
+several cores; on one core expect workers=1 to win.
+
+Run from backend/ (needs the same settings/.env as the app):
+    python -m benchmarks.bench_variable_loader
+    python -m benchmarks.bench_variable_loader --files 500,5000 --workers 1,4,8
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+from models.esv_models import EsvVariablePerEnv
+from core.settings import settings
+from core.frodo import variable_files
+from core.frodo.variable_cache import VariableFileCache
+
+def write_files(variable_dir: str, num_files: int, vars_per_file: int):
+    for i in range(num_files):
+        variables = {
+            f"esv-variable-{i:06d}-{j}": {
+                "_id": f"esv-variable-{i:06d}-{j}",
+                "description": f"Synthetic variable {i}/{j}",
+                "expressionType": "string",
+                "value": "x" * 64
+            }
+            for j in range(vars_per_file)
+        }
+        with open(os.path.join(variable_dir, f"esv-variable-{i:06d}.variable.json"), "w") as f:
+            json.dump({"variable": variables}, f, indent=2)
+
+def baseline_load(variable_dir: str):
+    variables = {}
+    for filename in os.listdir(variable_dir):
+        if not filename.endswith(".variable.json"):
+            continue
+        with open(os.path.join(variable_dir, filename), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for var_name, var_content in data.get("variable", {}).items():
+            variables[var_name] = EsvVariablePerEnv(
+                description=var_content.get("description", ""),
+                expressionType=var_content.get("expressionType", "string"),
+                value=var_content.get("value", "")
+            )
+    return variables
+
+def loader_load(variable_dir: str):
+    variable_files.variable_file_cache = VariableFileCache(max_entries=1_000_000)
+    variables = {}
+    loaded = variable_files.load_variable_files(variable_files.scan_variable_dir(variable_dir))
+    for file_variables in loaded.values():
+        variables.update(file_variables)
+    return variables
+
+def best_of(fn, variable_dir: str, repeat: int):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(variable_dir)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", default="500,2000,10000")
+    parser.add_argument("--vars-per-file", type=int, default=1)
+    parser.add_argument("--workers", default="1,4,8")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    settings.ESV_LOADER_PARALLEL_MIN_FILES = 1
+    logging.getLogger(variable_files.__name__).setLevel(logging.INFO)
+    parser_name = "orjson" if variable_files.orjson is not None else "json"
+    print(f"JSON parser: {parser_name}")
+    print(f"{'files':>8} {'baseline (s)':>13} {'workers':>8} {'loader (s)':>11} {'speedup':>8}")
+
+    for num_files in [int(n) for n in args.files.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            write_files(tmp, num_files, args.vars_per_file)
+            baseline, expected = best_of(baseline_load, tmp, args.repeat)
+
+            for workers in [int(w) for w in args.workers.split(",")]:
+                settings.ESV_LOADER_WORKERS = workers
+                elapsed, result = best_of(loader_load, tmp, args.repeat)
+                assert {name: tuple(var.model_dump().values()) for name, var in expected.items()} == \
+                    {name: tuple(var)[:3] for name, var in result.items()}
+                print(f"{num_files:>8} {baseline:>13.3f} {workers:>8} {elapsed:>11.3f} {baseline / elapsed:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
 # core/db.py
 import json
 import os
-from sqlmodel import SQLModel, Session, create_engine
-from models.db_models import IdentityUser, UserProfile
+from sqlalchemy import inspect, update
+from sqlmodel import SQLModel, Session, create_engine, select
+from models.db_models import IdentityUser, UserProfile, EsvVariable, EsvVariableValue
+from core.esv_hash import metadata_hash, value_hash
 from core.settings import settings
 
 # export environment variables
@@ -26,5 +28,68 @@ engine = create_engine(DATABASE_URL, echo=True)
 def init_db():
     SQLModel.metadata.create_all(engine)
 
+# Columns added to existing tables after their first release.
+# create_all() only creates missing tables, so these are added on startup.
+ADDED_COLUMNS = {
+    "esvvariable": {"content_hash": "VARCHAR"},
+    "esvvariablevalue": {"value_hash": "VARCHAR"},
+    "userrevision": {"env_revision": "INTEGER NOT NULL DEFAULT 0"},
+    "job": {"progress": "JSON", "parent_job_id": "VARCHAR"},
+}
+
+BACKFILL_CHUNK_SIZE = 1000
+
+def upgrade_db(target_engine=None):
+    """Add missing columns and indexes to existing tables, then backfill derived data."""
+    target_engine = target_engine or engine
+    inspector = inspect(target_engine)
+
+    with target_engine.begin() as conn:
+        for table, columns in ADDED_COLUMNS.items():
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for column, ddl_type in columns.items():
+                if column not in existing:
+                    conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}")
+
+        # create_all() does not add indexes to tables that already exist
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+    backfill_esv_hashes(target_engine)
+
+def backfill_esv_hashes(target_engine=None):
+    """Fill content_hash / value_hash on rows written before the columns existed."""
+    target_engine = target_engine or engine
+
+    with Session(target_engine) as session:
+        while True:
+            rows = session.exec(
+                select(EsvVariable.id, EsvVariable.description, EsvVariable.expressionType)
+                .where(EsvVariable.content_hash.is_(None))
+                .limit(BACKFILL_CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            session.exec(update(EsvVariable), params=[
+                {"id": var_id, "content_hash": metadata_hash(description, expression_type)}
+                for var_id, description, expression_type in rows
+            ])
+            session.commit()
+
+        while True:
+            rows = session.exec(
+                select(EsvVariableValue.id, EsvVariableValue.value)
+                .where(EsvVariableValue.value_hash.is_(None))
+                .limit(BACKFILL_CHUNK_SIZE)
+            ).all()
+            if not rows:
+                break
+            session.exec(update(EsvVariableValue), params=[
+                {"id": value_id, "value_hash": value_hash(value)}
+                for value_id, value in rows
+            ])
+            session.commit()
+
 def get_session():
     return Session(engine)
\ No newline at end of file
@@ -0,0 +1,26 @@
+# core/esv_hash.py
+import hashlib
+from typing import Optional
+
+# 128-bit digests, hex encoded: fixed-size stand-ins for ESV metadata and values
+DIGEST_SIZE = 16
+
+def _digest(*parts: Optional[str]) -> str:
+    digest = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in parts:
+        if part is None:
+            # None and "" must not collide: the diff treats them as different
+            digest.update(b"\x00")
+            continue
+        data = part.encode("utf-8")
+        digest.update(b"\x01" + len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+def metadata_hash(description: Optional[str], expression_type: Optional[str]) -> str:
+    """Hash of an ESV variable's metadata (description, expressionType)."""
+    return _digest(description, expression_type)
+
+def value_hash(value: Optional[str]) -> str:
+    """Hash of one env value of an ESV variable."""
+    return _digest(value)
@@ -0,0 +1,124 @@
+# core/frodo/apply_coordinator.py
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional
+
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__)
+
+class _ApplyBatch:
+    """
+    A group of apply requests for one tenant that will be served by a single
+    `frodo esv apply` run.
+    """
+
+    def __init__(self, env_name: str, apply_fn: Callable[[], bool], blocking: bool):
+        self.env_name = env_name
+        self.apply_fn = apply_fn
+        # Whether a contributor waits on the Future for the applied outcome
+        self.blocking = blocking
+        self.future: Future = Future()
+        self.contributors = 0
+        self.opened_at = time.monotonic()
+        self.timer: Optional[threading.Timer] = None
+
+class ApplyCoordinator:
+    """
+    Debounce `esv apply` per tenant.
+
+    Every caller that has finished importing variables asks for an apply and
+    gets back a Future. Requests for the same key arriving within the debounce
+    window join the same batch; the batch fires once the window has been quiet
+    for `debounce_seconds` (or `max_wait_seconds` after it opened), runs the
+    apply once, and resolves every contributor's Future with its outcome.
+    Applies for the same key never run concurrently.
+
+    Callers that block on the Future expect it to resolve once the apply has
+    taken effect; callers that hand the restart over to the status poller only
+    need it triggered. A batch with any blocking contributor runs the apply of
+    a blocking one.
+    """
+
+    def __init__(self, debounce_seconds: float, max_wait_seconds: float):
+        self.debounce_seconds = max(0.0, debounce_seconds)
+        self.max_wait_seconds = max(self.debounce_seconds, max_wait_seconds)
+        self._lock = threading.Lock()
+        self._pending: Dict[Hashable, _ApplyBatch] = {}
+        self._apply_locks: Dict[Hashable, threading.Lock] = {}
+
+    def request_apply(
+        self,
+        key: Hashable,
+        env_name: str,
+        apply_fn: Callable[[], bool],
+        blocking: bool = True
+    ) -> Future:
+        """
+        Join (or open) the pending batch for `key` and return its Future.
+        The Future resolves to the bool returned by the batch's apply_fn.
+        Pass blocking=False when `apply_fn` only triggers the apply.
+        """
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = _ApplyBatch(env_name, apply_fn, blocking)
+                self._pending[key] = batch
+                self._apply_locks.setdefault(key, threading.Lock())
+
+            batch.contributors += 1
+            # Latest caller wins: its env_data (proxy, frodo path) is the freshest.
+            # A non-blocking apply never replaces a blocking one.
+            if blocking or not batch.blocking:
+                batch.apply_fn = apply_fn
+                batch.blocking = blocking
+
+            if batch.timer:
+                batch.timer.cancel()
+
+            elapsed = time.monotonic() - batch.opened_at
+            delay = min(self.debounce_seconds, max(0.0, self.max_wait_seconds - elapsed))
+
+            batch.timer = threading.Timer(delay, self._fire, args=(key, batch))
+            batch.timer.daemon = True
+            batch.timer.start()
+
+            logger.info(
+                f"Queued esv apply for env={env_name} "
+                f"(contributors={batch.contributors}, blocking={batch.blocking}, fires_in={delay:.1f}s)"
+            )
+
+        return batch.future
+
+    def pending_count(self, key: Hashable) -> int:
+        """Number of callers waiting on the not-yet-fired batch for `key`."""
+        with self._lock:
+            batch = self._pending.get(key)
+            return batch.contributors if batch else 0
+
+    def _fire(self, key: Hashable, batch: _ApplyBatch) -> None:
+        with self._lock:
+            if self._pending.get(key) is not batch:
+                # Superseded timer; the batch was already fired
+                return
+            del self._pending[key]
+            apply_lock = self._apply_locks[key]
+
+        with apply_lock:
+            logger.info(
+                f"Running esv apply for env={batch.env_name} "
+                f"on behalf of {batch.contributors} request(s)"
+            )
+            try:
+                success = batch.apply_fn()
+                batch.future.set_result(success)
+            except Exception as e:
+                logger.exception(f"esv apply for env={batch.env_name} raised: {e}")
+                batch.future.set_exception(e)
+
+apply_coordinator = ApplyCoordinator(
+    debounce_seconds=settings.ESV_APPLY_DEBOUNCE_SECONDS,
+    max_wait_seconds=settings.ESV_APPLY_MAX_WAIT_SECONDS
+)
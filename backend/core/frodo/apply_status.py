@@ -0,0 +1,174 @@
+# core/frodo/apply_status.py
+import heapq
+import itertools
+import random
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, Optional
+
+import requests
+
+from core.logger import get_logger
+from core.settings import settings
+from core.frodo.get_token import get_service_account_access_token
+
+logger = get_logger(__name__)
+
+RESTART_READY = "ready"
+RESTART_RESTARTING = "restarting"
+RESTART_FAILED = "restartFailed"
+
+# Polling a restarting tenant fails routinely; those failures get a breaker of
+# their own so they cannot open the tenant's breaker for pushes and pulls
+POLL_BREAKER_SUFFIX = "#restart-status"
+
+def get_restart_status(env_data: Dict) -> str:
+    """
+    Read the tenant restart status (ready, restarting, restartFailed)
+    from the PAIC environment API.
+    """
+    platform_url = env_data["platform_url"].rstrip("/")
+    proxy = env_data.get("proxy")
+
+    token = get_service_account_access_token(
+        platform_url=platform_url,
+        service_account_id=env_data["service_account_id"],
+        jwk_dict=env_data["service_account_jwk"],
+        exp_seconds=env_data.get("exp_seconds", 899),
+        scope=env_data.get("scope", "fr:idc:esv:*"),
+        proxy_url=proxy,
+        breaker_key=platform_url + POLL_BREAKER_SUFFIX
+    )
+
+    response = requests.get(
+        f"{platform_url}/environment/startup",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "Accept-API-Version": "resource=1.0"
+        },
+        proxies={"https": proxy} if proxy else None,
+        verify=False,
+        timeout=30
+    )
+    response.raise_for_status()
+    return response.json().get("restartStatus", "")
+
+class _TrackedApply:
+    def __init__(self, env_name: str, env_data: Dict, started_at: float, delay: float):
+        self.env_name = env_name
+        self.env_data = env_data
+        self.started_at = started_at
+        self.delay = delay
+        self.callbacks: List[Callable[[bool, dict], None]] = []
+
+class ApplyStatusPoller:
+    """
+    Single background thread that follows tenant restarts kicked off with
+    `frodo esv apply --no-wait`.
+
+    Each tracked apply is polled with exponential backoff (plus jitter) until
+    the tenant reports ready, reports a failed restart, or the timeout expires;
+    then every callback registered for it is called with (success, detail).
+    """
+
+    def __init__(
+        self,
+        status_fn: Callable[[Dict], str] = get_restart_status,
+        initial_delay: float = settings.ESV_APPLY_POLL_INITIAL_SECONDS,
+        max_delay: float = settings.ESV_APPLY_POLL_MAX_SECONDS,
+        timeout: float = settings.ESV_APPLY_TIMEOUT_SECONDS
+    ):
+        self.status_fn = status_fn
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._cond = threading.Condition()
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._tracked: Dict[Hashable, _TrackedApply] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def track(
+        self,
+        key: Hashable,
+        env_name: str,
+        env_data: Dict,
+        callback: Callable[[bool, dict], None]
+    ) -> None:
+        """
+        Follow the restart identified by `key` (one per apply run) and call
+        `callback(success, detail)` when it settles. Callers tracking the same
+        key share one poll loop.
+        """
+        with self._cond:
+            tracked = self._tracked.get(key)
+            if tracked is None:
+                tracked = _TrackedApply(env_name, env_data, time.monotonic(), self.initial_delay)
+                self._tracked[key] = tracked
+                heapq.heappush(self._heap, (time.monotonic() + tracked.delay, next(self._seq), key))
+                logger.info(f"Tracking esv apply restart for env={env_name}")
+            tracked.callbacks.append(callback)
+
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="esv-apply-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def tracked_count(self) -> int:
+        with self._cond:
+            return len(self._tracked)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, key = self._heap[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._heap)
+                tracked = self._tracked[key]
+
+            outcome = self._check(tracked)
+
+            with self._cond:
+                if outcome is None:
+                    tracked.delay = min(tracked.delay * 2, self.max_delay)
+                    jitter = random.uniform(0, tracked.delay / 4)
+                    heapq.heappush(self._heap, (time.monotonic() + tracked.delay + jitter, next(self._seq), key))
+                    continue
+                del self._tracked[key]
+                callbacks = list(tracked.callbacks)
+
+            success, detail = outcome
+            for callback in callbacks:
+                try:
+                    callback(success, detail)
+                except Exception as e:
+                    logger.exception(f"Apply status callback failed for env={tracked.env_name}: {e}")
+
+    def _check(self, tracked: _TrackedApply):
+        """Returns (success, detail) once settled, or None to poll again."""
+        elapsed = time.monotonic() - tracked.started_at
+        detail = {"env": tracked.env_name, "elapsed_seconds": round(elapsed, 1)}
+
+        try:
+            status = self.status_fn(tracked.env_data)
+        except Exception as e:
+            # Transient API hiccups during a restart are expected; keep polling
+            logger.warning(f"Restart status check failed for env={tracked.env_name}: {e}")
+            status = None
+
+        logger.info(f"Restart status for env={tracked.env_name}: {status}")
+
+        if status == RESTART_READY:
+            return True, {**detail, "status": status}
+        if status == RESTART_FAILED:
+            return False, {**detail, "status": status}
+        if elapsed >= self.timeout:
+            return False, {**detail, "status": "timeout"}
+        return None
+
+apply_status_poller = ApplyStatusPoller()
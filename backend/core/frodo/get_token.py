@@ -7,6 +7,7 @@ import requests
 import urllib3
 from jwcrypto import jwt, jwk
 from core.logger import get_logger
+from core.frodo.resilience import call_with_resilience, TransientError, TRANSIENT_STATUS_CODES
 
 logger = get_logger(__name__)
 
@@ -46,32 +47,46 @@ def get_service_account_access_token(
     jwk_dict: dict,
     exp_seconds: int = 899,
     scope: str = "fr:am:* fr:idm:*",
-    proxy_url: str | None = None
+    proxy_url: str | None = None,
+    breaker_key: str | None = None
 ) -> str:
     """
     Request a ForgeRock PAIC Access Token using a Service Account JWK.
+    breaker_key defaults to the tenant's own circuit breaker (platform URL).
     """
 
     aud = platform_url.rstrip("/") + "/am/oauth2/access_token"
-    signed_jwt = create_signed_jwt(service_account_id, aud, jwk_dict, exp_seconds)
 
     headers = {"Content-Type": "application/x-www-form-urlencoded"}
-    data = {
-        "client_id": "service-account",
-        "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
-        "assertion": signed_jwt,
-        "scope": scope
-    }
     proxies = {"https": proxy_url} if proxy_url else None
 
-    logger.info(f"Requesting service account access token for SA={service_account_id} at {aud}")
+    def request_token() -> str:
+        # Fresh JWT per attempt: the jti must not be replayed
+        signed_jwt = create_signed_jwt(service_account_id, aud, jwk_dict, exp_seconds)
+        data = {
+            "client_id": "service-account",
+            "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer",
+            "assertion": signed_jwt,
+            "scope": scope
+        }
+
+        logger.info(f"Requesting service account access token for SA={service_account_id} at {aud}")
 
-    response = requests.post(aud, headers=headers, data=data, proxies=proxies, verify=False)
+        response = requests.post(aud, headers=headers, data=data, proxies=proxies, verify=False, timeout=30)
+
+        if response.status_code == 200:
+            token = response.json().get("access_token")
+            logger.info(f"Access token retrieved successfully for SA={service_account_id}")
+            return token
 
-    if response.status_code == 200:
-        token = response.json().get("access_token")
-        logger.info(f"Access token retrieved successfully for SA={service_account_id}")
-        return token
-    else:
         logger.error(f"Failed to retrieve access token: {response.status_code} {response.text}")
-        raise Exception(f"Failed to get token: {response.status_code} {response.text}")
\ No newline at end of file
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            raise TransientError(f"Failed to get token: {response.status_code} {response.text}")
+        raise Exception(f"Failed to get token: {response.status_code} {response.text}")
+
+    return call_with_resilience(
+        request_token,
+        breaker_key=breaker_key or platform_url,
+        idempotent=True,
+        description="access token request"
+    )
\ No newline at end of file
@@ -0,0 +1,203 @@
+# core/frodo/git_source.py
+import subprocess
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from core.logger import get_logger
+from core.settings import settings
+from core.frodo.variable_files import VARIABLE_FILE_SUFFIX, VariableFile, parse_variable_json
+
+logger = get_logger(__name__)
+
+class GitRefError(ValueError):
+    """The requested ref does not exist (or is not a commit) in the PAIC config repo."""
+
+class GitPathError(GitRefError):
+    """The ref exists, but the requested path does not exist at that ref."""
+
+class GitObjectReader:
+    """
+    Read ESV variable files for any ref of the PAIC config repo straight from
+    the git object database, without touching the working tree.
+
+    Trees are listed with `git ls-tree`; blobs are streamed through one
+    long-lived `git cat-file --batch` process. Blobs are immutable, so their
+    parsed variables are cached by blob id and shared across refs.
+    """
+
+    def __init__(self, repo_path: str, cache_size: int = 20000):
+        self.repo_path = repo_path
+        self.cache_size = cache_size
+        self._batch: Optional[subprocess.Popen] = None
+        self._batch_lock = threading.Lock()
+        self._cache: "OrderedDict[str, VariableFile]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # ---- refs & trees ----
+
+    def resolve_ref(self, ref: str) -> str:
+        """Commit id that `ref` (branch, tag, origin/<branch>, sha) points to."""
+        if not ref or ref.startswith("-"):
+            raise GitRefError(f"Invalid git ref: {ref!r}")
+        try:
+            return self._git("rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}").strip()
+        except subprocess.CalledProcessError:
+            raise GitRefError(f"Unknown git ref: {ref}")
+
+    def tree_id(self, commit: str, path: str) -> Optional[str]:
+        """Tree id of `path` at `commit`, or None if it does not exist there."""
+        try:
+            return self._git("rev-parse", "--verify", "--quiet", f"{commit}:{path}").strip()
+        except subprocess.CalledProcessError:
+            return None
+
+    def list_variable_blobs(self, commit: str, env_name: str) -> List[Tuple[str, str]]:
+        """(path, blob id) of every *.variable.json file of env_name at `commit`."""
+        variable_path = f"configs/{env_name}/global/variable/"
+        output = self._git("ls-tree", "-z", commit, "--", variable_path)
+
+        blobs = []
+        for line in output.split("\0"):
+            if not line:
+                continue
+            meta, path = line.split("\t", 1)
+            _, object_type, object_id = meta.split(" ")
+            if object_type == "blob" and path.endswith(VARIABLE_FILE_SUFFIX):
+                blobs.append((path, object_id))
+        return blobs
+
+    # ---- variables ----
+
+    def read_variables(self, env_name: str, ref: str) -> VariableFile:
+        """
+        Variables of env_name as committed at `ref`.
+        Raises GitRefError for unknown refs and GitPathError if the env has
+        no variable folder at that ref.
+        """
+        commit = self.resolve_ref(ref)
+        if self.tree_id(commit, f"configs/{env_name}/global/variable") is None:
+            raise GitPathError(f"Variable folder not found for env {env_name} at {ref}")
+
+        blobs = self.list_variable_blobs(commit, env_name)
+        parsed = self._parse_blobs(blobs)
+
+        variables = {}
+        for _, object_id in blobs:
+            variables.update(parsed[object_id])
+
+        logger.info(f"Read {len(variables)} variables for env {env_name} at {ref} ({commit[:12]})")
+        return variables
+
+    def _parse_blobs(self, blobs: List[Tuple[str, str]]) -> Dict[str, VariableFile]:
+        parsed = {}
+        missing = []
+        with self._cache_lock:
+            for path, object_id in blobs:
+                cached = self._cache.get(object_id)
+                if cached is None:
+                    missing.append((path, object_id))
+                else:
+                    self._cache.move_to_end(object_id)
+                    parsed[object_id] = cached
+
+        if missing:
+            contents = self._cat_blobs([object_id for _, object_id in missing])
+            for path, object_id in missing:
+                parsed[object_id] = parse_variable_json(contents[object_id], path)
+
+            with self._cache_lock:
+                for _, object_id in missing:
+                    self._cache[object_id] = parsed[object_id]
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        logger.debug(f"Parsed {len(missing)} of {len(blobs)} variable blobs (rest cached)")
+        return parsed
+
+    # ---- git plumbing ----
+
+    def _git(self, *args: str) -> str:
+        result = subprocess.run(
+            ["git", *args],
+            cwd=self.repo_path,
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        return result.stdout
+
+    def _cat_blobs(self, object_ids: List[str]) -> Dict[str, bytes]:
+        """Stream blob contents through the shared `git cat-file --batch` process."""
+        with self._batch_lock:
+            try:
+                return self._cat_blobs_locked(object_ids)
+            except (BrokenPipeError, EOFError):
+                # The batch process died (repo gc, killed); start a new one once
+                self._close_batch()
+                return self._cat_blobs_locked(object_ids)
+            except Exception:
+                # Unread responses would desync the next caller
+                self._close_batch()
+                raise
+
+    def _cat_blobs_locked(self, object_ids: List[str]) -> Dict[str, bytes]:
+        batch = self._ensure_batch()
+        # Requests are written up front; fine for a pipe as long as we read
+        # every response, which the loop below does in order.
+        writer = threading.Thread(
+            target=self._write_requests, args=(batch, object_ids), daemon=True
+        )
+        writer.start()
+
+        contents = {}
+        for object_id in object_ids:
+            header = batch.stdout.readline()
+            if not header:
+                raise EOFError("git cat-file --batch exited unexpectedly")
+            parts = header.decode().split()
+            if len(parts) == 2 and parts[1] == "missing":
+                raise LookupError(f"Git object missing: {object_id}")
+            size = int(parts[2])
+            contents[object_id] = batch.stdout.read(size)
+            batch.stdout.read(1)  # trailing newline
+
+        writer.join()
+        return contents
+
+    @staticmethod
+    def _write_requests(batch: subprocess.Popen, object_ids: List[str]) -> None:
+        try:
+            batch.stdin.write("".join(f"{object_id}\n" for object_id in object_ids).encode())
+            batch.stdin.flush()
+        except BrokenPipeError:
+            pass
+
+    def _ensure_batch(self) -> subprocess.Popen:
+        if self._batch is None or self._batch.poll() is not None:
+            self._batch = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.repo_path,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._batch
+
+    def _close_batch(self) -> None:
+        if self._batch is not None:
+            try:
+                self._batch.kill()
+                self._batch.wait(timeout=5)
+            except Exception:
+                pass
+            self._batch = None
+
+    def close(self) -> None:
+        with self._batch_lock:
+            self._close_batch()
+
+git_object_reader = GitObjectReader(
+    repo_path=settings.PAIC_CONFIG_PATH,
+    cache_size=settings.ESV_FILE_CACHE_SIZE
+)
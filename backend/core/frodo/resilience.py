@@ -0,0 +1,217 @@
+# core/frodo/resilience.py
+import random
+import re
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+
+import requests
+
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Markers frodo / node / proxies print for failures worth retrying. Matched
+# against the whole output, which also carries variable ids and values, so
+# status codes and timeouts only count in the shape of an error line.
+TRANSIENT_OUTPUT_PATTERN = re.compile(
+    r"status(?:Code)?[:= ]+(?:429|50[234])\b"
+    r"|Request failed with status code (?:429|50[234])\b"
+    r"|\b(?:429|50[234]) (?:too many requests|bad gateway|service unavailable|gateway time-?out)"
+    r"|\b(?:ETIMEDOUT|ESOCKETTIMEDOUT|ECONNRESET|ECONNREFUSED|EAI_AGAIN)\b|socket hang up"
+    r"|timeout of \d+ ?ms exceeded|(?:request|connection|socket|operation) timed out",
+    re.IGNORECASE
+)
+
+TRANSIENT_STATUS_CODES = {429, 502, 503, 504}
+
+# Allow tests to skip real sleeping
+_sleep = time.sleep
+
+class TransientError(Exception):
+    """A failure that is expected to go away on its own (throttling, gateway errors)."""
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a tenant whose circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Per-tenant circuit breaker.
+
+    closed    -> calls go through; consecutive transient failures are counted
+    open      -> calls fail fast with CircuitOpenError until reset_seconds pass
+    half_open -> one trial call is let through; success closes, failure re-opens
+    """
+
+    def __init__(self, key: str, failure_threshold: int, reset_seconds: float):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_rejections = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "open":
+                if time.monotonic() - self.opened_at < self.reset_seconds:
+                    self.total_rejections += 1
+                    raise CircuitOpenError(
+                        f"Circuit open for {self.key}: {self.last_error}"
+                    )
+                self.state = "half_open"
+                self._trial_in_flight = False
+
+            if self.state == "half_open":
+                if self._trial_in_flight:
+                    self.total_rejections += 1
+                    raise CircuitOpenError(f"Circuit half-open for {self.key}; trial call in flight")
+                self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != "closed":
+                logger.info(f"Circuit for {self.key} closed again")
+            self.state = "closed"
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            self.last_error = str(error)[:500]
+            self._trial_in_flight = False
+
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning(
+                        f"Circuit for {self.key} opened after "
+                        f"{self.consecutive_failures} consecutive failure(s)"
+                    )
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Forget an in-flight trial call that ended with a non-transient error."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+            return {
+                "key": self.key,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "total_rejections": self.total_rejections,
+                "retry_in_seconds": round(retry_in, 1) if retry_in is not None else None,
+                "last_error": self.last_error
+            }
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(key: str) -> CircuitBreaker:
+    """Return the circuit breaker for a tenant (keyed by platform URL)."""
+    key = key.rstrip("/")
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                key,
+                failure_threshold=settings.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                reset_seconds=settings.CIRCUIT_BREAKER_RESET_SECONDS
+            )
+            _breakers[key] = breaker
+        return breaker
+
+def get_breaker_states() -> List[Dict]:
+    """Snapshot of every circuit breaker, for monitoring."""
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
+
+def is_transient_error(error: Exception) -> bool:
+    """Decide whether a failed frodo command or PAIC request is worth retrying."""
+    if isinstance(error, TransientError):
+        return True
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code in TRANSIENT_STATUS_CODES
+    if isinstance(error, subprocess.TimeoutExpired):
+        return True
+    if isinstance(error, subprocess.CalledProcessError):
+        output = f"{error.stdout or ''}\n{error.stderr or ''}"
+        return bool(TRANSIENT_OUTPUT_PATTERN.search(output))
+    return False
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (1-based) retry attempt."""
+    cap = min(
+        settings.RETRY_BACKOFF_MAX_SECONDS,
+        settings.RETRY_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
+    )
+    return random.uniform(0, cap)
+
+def call_with_resilience(
+    fn: Callable[[], T],
+    *,
+    breaker_key: Optional[str] = None,
+    idempotent: bool = False,
+    description: str = "call"
+) -> T:
+    """
+    Run fn() guarded by the tenant's circuit breaker.
+
+    Idempotent calls are retried on transient errors with jittered exponential
+    backoff, up to RETRY_MAX_ATTEMPTS attempts in total. Non-idempotent calls
+    get a single attempt. Only transient errors count against the breaker.
+    """
+    breaker = get_breaker(breaker_key) if breaker_key else None
+    max_attempts = max(1, settings.RETRY_MAX_ATTEMPTS) if idempotent else 1
+
+    attempt = 0
+    while True:
+        attempt += 1
+        if breaker:
+            breaker.before_call()
+
+        try:
+            result = fn()
+        except Exception as e:
+            transient = is_transient_error(e)
+            if breaker:
+                if transient:
+                    breaker.record_failure(e)
+                else:
+                    breaker.release()
+
+            if not transient or attempt >= max_attempts:
+                raise
+
+            delay = backoff_delay(attempt)
+            logger.warning(
+                f"Transient failure in {description} (attempt {attempt}/{max_attempts}), "
+                f"retrying in {delay:.1f}s: {e}"
+            )
+            _sleep(delay)
+            continue
+
+        if breaker:
+            breaker.record_success()
+        return result
@@ -2,7 +2,7 @@
 import os
 
 from core.logger import get_logger
-from core.frodo.utils import run_command, write_tempfile
+from core.frodo.utils import run_frodo_command, write_tempfile
 
 logger = get_logger("__name__")
 
@@ -38,7 +38,12 @@ def save_connection(
     logger.info(f"Running Frodo save connection: {command}")
 
     # Run the Frodo command
-    run_command(command, process_env=frodo_env)
+    run_frodo_command(
+        command,
+        process_env=frodo_env,
+        breaker_key=platform_url,
+        idempotent=True
+    )
 
     logger.info("Frodo connection configuration saved successfully.")
 
@@ -1,35 +1,104 @@
 # core/frodo/sync_esv.py
-from typing import Dict
+from typing import Dict, Hashable, Optional
+import hashlib
 import os
+import tempfile
 
 from models.esv_models import EsvVariablePerEnv
 from core.logger import get_logger
 from core.settings import settings
-from core.frodo.utils import run_command, write_tempfile, load_json
+from core.frodo.utils import run_frodo_command, write_tempfile
+from core.frodo.apply_coordinator import apply_coordinator
+from core.frodo.variable_files import (
+    VariableRecord,
+    variable_dir_for,
+    scan_variable_dir,
+    load_variable_files,
+    parse_variable_file
+)
+from core.frodo.variable_index import variable_index
+from core.frodo.git_source import git_object_reader
+from core.frodo.apply_status import apply_status_poller
+from core.job import defer_current_job, resolve_deferred_job
 
 logger = get_logger("__name__")
 
-def pull_variables_from_source(env_name: str) -> Dict[str, EsvVariablePerEnv]:
-    """Retrieve ESV variables for the given env from the authoritative source."""
+def pull_variables_from_source(env_name: str, ref: Optional[str] = None) -> Dict[str, VariableRecord]:
+    """
+    Retrieve ESV variables for the given env from the authoritative source.
+    With a git ref (branch, tag, origin/<branch>, commit) the variables are
+    read from that commit's objects, leaving the working tree alone.
+    Otherwise, when the source watcher is running the live index is returned
+    as is (read-only); if not, the env folder is scanned.
+    """
+    if ref:
+        return git_object_reader.read_variables(env_name, ref)
+    if variable_index.is_running():
+        indexed = variable_index.get(env_name)
+        if indexed is not None:
+            return indexed
     return pull_variables_from_local(env_name)
 
+def source_fingerprint(
+    env_name: str,
+    ref: Optional[str] = None,
+    paic_config_path: str = settings.PAIC_CONFIG_PATH
+) -> Hashable:
+    """
+    Cheap value that changes whenever pull_variables_from_source(env_name, ref)
+    could return something different:
+    - with a ref: the git tree id of the env's variable folder at that ref
+    - with the source watcher running: the env's index generation
+    - otherwise: a digest of every variable file's (path, mtime, size, inode)
+    """
+    if ref:
+        commit = git_object_reader.resolve_ref(ref)
+        return ("git", git_object_reader.tree_id(commit, f"configs/{env_name}/global/variable"))
+
+    if variable_index.is_running():
+        generation = variable_index.generation(env_name)
+        if generation is not None:
+            return ("index", id(variable_index), generation)
+
+    variable_dir = variable_dir_for(paic_config_path, env_name)
+    try:
+        files = sorted(scan_variable_dir(variable_dir))
+    except FileNotFoundError:
+        return ("missing",)
+
+    digest = hashlib.blake2b(digest_size=16)
+    for path, signature in files:
+        digest.update(f"{path}\0{signature}\0".encode())
+    return ("stat", digest.hexdigest())
+
 def add_variables_to_source(
     env_name: str,
     env_data: Dict,
     variables: Dict[str, EsvVariablePerEnv],
+    apply: bool = True,
 ) -> bool:
     """Wrapper for adding new variables to the cloud for a given env."""
     logger.info(f"Adding variables for env: {env_name}")
-    return import_variables_to_cloud(env_name, env_data, variables)
+    return import_variables_to_cloud(env_name, env_data, variables, apply=apply)
 
 def update_variables_to_source(
     env_name: str,
     env_data: Dict,
     variables: Dict[str, EsvVariablePerEnv],
+    apply: bool = True,
 ) -> bool:
     """Wrapper for updating existing variables to the cloud for a given env."""
     logger.info(f"Updating variables for env: {env_name}")
-    return import_variables_to_cloud(env_name, env_data, variables)
+    return import_variables_to_cloud(env_name, env_data, variables, apply=apply)
+
+def apply_variables_to_source(
+    env_name: str,
+    env_data: Dict,
+    apply_async: bool = True,
+) -> bool:
+    """Wrapper for applying imported variables in the cloud for a given env."""
+    logger.info(f"Applying variables for env: {env_name}")
+    return request_apply_to_cloud(env_name, env_data, apply_async=apply_async)
 
 def delete_variables_to_source(
     env_name: str,
@@ -40,15 +109,62 @@ def delete_variables_to_source(
     logger.info(f"Deleting variables for env: {env_name}")
     return delete_variables_to_cloud(env_name, env_data, variables)
 
+def pull_variables_from_cloud(
+    env_name: str,
+    env_data: Dict,
+    paic_config_path: str = settings.PAIC_CONFIG_PATH
+) -> Dict[str, VariableRecord]:
+    """
+    Read the tenant's live ESV variables with a single
+    `frodo esv variable export` into a temporary folder.
+
+    Args:
+        env_name: Name of the environment (e.g., DEV, SBX)
+        env_data: Dict with keys: frodo_path, platform_url, proxy (optional)
+
+    Raises:
+        The frodo command's error if the export fails.
+    """
+    paic_config_root = os.path.abspath(paic_config_path)
+    frodo_path = env_data["frodo_path"]
+    platform_url = env_data["platform_url"]
+    proxy = env_data.get("proxy")
+
+    frodo_env = os.environ.copy()
+    if proxy:
+        frodo_env["HTTPS_PROXY"] = proxy
+        logger.info(f"Using proxy: {proxy}")
+
+    with tempfile.TemporaryDirectory(prefix=f"esv-{env_name}-") as export_dir:
+        command = f"{frodo_path} esv variable export -A -D {export_dir} {platform_url}"
+        logger.info(f"Running export command: {command}")
+        run_frodo_command(
+            command,
+            cwd=paic_config_root,
+            process_env=frodo_env,
+            breaker_key=platform_url,
+            idempotent=True
+        )
+
+        # Throwaway files: parsed directly, not through the variable file cache
+        variables = {}
+        for path, _ in scan_variable_dir(export_dir):
+            variables.update(parse_variable_file(path))
+
+    logger.info(f"Exported {len(variables)} live variables for env: {env_name}")
+    return variables
+
 def pull_variables_from_local(
     env_name: str,
     paic_config_path: str = settings.PAIC_CONFIG_PATH
-) -> Dict[str, EsvVariablePerEnv]:
+) -> Dict[str, VariableRecord]:
     """
     Pull ESV variable data for given env from local repo.
     Reads JSON files in: configs/<ENV>/global/variable/
+    Parsed files are cached by (path, mtime_ns, size, inode), so unchanged
+    files are not re-read; uncached ones are parsed in parallel.
     """
-    variable_dir = os.path.join(paic_config_path, "configs", env_name, "global", "variable")
+    variable_dir = variable_dir_for(paic_config_path, env_name)
     if not os.path.isdir(variable_dir):
         logger.error(f"Variable folder does not exist: {variable_dir}")
         raise FileNotFoundError(f"Variable folder not found: {variable_dir}")
@@ -56,27 +172,8 @@ def pull_variables_from_local(
     logger.info(f"Reading variables from: {variable_dir}")
 
     variables = {}
-
-    for filename in os.listdir(variable_dir):
-        if filename.endswith(".variable.json"):
-            file_path = os.path.join(variable_dir, filename)
-            logger.info(f"Processing variable file: {file_path}")
-            data = load_json(file_path)
-            if not data:
-                logger.warning(f"Variable file is empty or invalid JSON: {file_path}")
-                continue
-
-            var_data = data.get("variable", {})
-            if not var_data:
-                logger.warning(f"No variables found in file: {filename}")
-                continue
-            logger.info(f"Found {len(var_data)} variables in file: {filename}")
-            for var_name, var_content in var_data.items():
-                variables[var_name] = EsvVariablePerEnv(
-                    description=var_content.get("description", ""),
-                    expressionType=var_content.get("expressionType", "string"),
-                    value=var_content.get("value", "")
-                )
+    for file_variables in load_variable_files(scan_variable_dir(variable_dir)).values():
+        variables.update(file_variables)
 
     logger.info(f"Total variables collected: {len(variables)}")
     return variables
@@ -85,7 +182,8 @@ def import_variables_to_cloud(
     env_name: str,
     env_data: Dict,
     variables: Dict[str, EsvVariablePerEnv],
-    paic_config_path: str = settings.PAIC_CONFIG_PATH
+    paic_config_path: str = settings.PAIC_CONFIG_PATH,
+    apply: bool = True
 ) -> bool:
     """
     Import (create/update) ESV variables for a specific env using frodo CLI.
@@ -94,6 +192,9 @@ def import_variables_to_cloud(
         env_name: Name of the environment (e.g., DEV, SBX)
         env_data: Dict with keys: frodo_path, platform_url, proxy (optional)
         variables: Dict of var_name -> EsvVariablePerEnv        
+        apply: Queue an `esv apply` for the env once the imports are done and
+            wait for it. The apply is debounced per tenant, so concurrent
+            imports share one restart.
 
     Returns:
         True if all commands succeed, False if any fail.
@@ -127,7 +228,13 @@ def import_variables_to_cloud(
         logger.info(f"Running import command: {command}")
 
         try:
-            stdout, stderr = run_command(command, cwd=paic_config_root, process_env=frodo_env)
+            stdout, stderr = run_frodo_command(
+                command,
+                cwd=paic_config_root,
+                process_env=frodo_env,
+                breaker_key=platform_url,
+                idempotent=True
+            )
             logger.info(f"Import stdout: {stdout}")
             if stderr:
                 logger.warning(f"Import stderr: {stderr}")
@@ -138,21 +245,139 @@ def import_variables_to_cloud(
         os.remove(temp_file)
         logger.info(f"Temporary file removed: {temp_file}")
 
+    if apply and not request_apply_to_cloud(env_name, env_data, paic_config_path):
+        success = False
+
+    logger.info(f"Finished import_variables_for_env for {env_name} with success={success}")
+
+    return success
+
+def request_apply_to_cloud(
+    env_name: str,
+    env_data: Dict,
+    paic_config_path: str = settings.PAIC_CONFIG_PATH,
+    apply_async: bool = True
+) -> bool:
+    """
+    Queue an `esv apply` for the env's tenant.
+
+    Requests for the same tenant arriving within the debounce window are
+    served by a single apply (see core.frodo.apply_coordinator).
+
+    Blocks until the apply has run, unless ESV_APPLY_ASYNC is on, apply_async
+    is left on and the caller is a background job: then it returns once the
+    apply is queued and the job is completed by the status poller (see
+    _request_apply_async).
+
+    Returns:
+        True if the apply succeeded (or was queued), False otherwise.
+    """
+    key = (env_data["frodo_path"], env_data["platform_url"])
+
+    if apply_async and settings.ESV_APPLY_ASYNC:
+        job_id = defer_current_job()
+        if job_id is not None:
+            return _request_apply_async(job_id, key, env_name, env_data, paic_config_path)
+
+    future = apply_coordinator.request_apply(
+        key,
+        env_name,
+        lambda: apply_variables_to_cloud(env_name, env_data, paic_config_path)
+    )
+
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error(f"Failed to apply variables for env {env_name}: {str(e)}")
+        return False
+
+def _request_apply_async(
+    job_id: str,
+    key: tuple,
+    env_name: str,
+    env_data: Dict,
+    paic_config_path: str
+) -> bool:
+    """
+    Queue a non-blocking apply and hand the restart over to the status poller.
+    The calling job is completed by the poller, so the worker is freed as soon
+    as the apply has been queued.
+    """
+    future = apply_coordinator.request_apply(
+        key,
+        env_name,
+        lambda: apply_variables_to_cloud(env_name, env_data, paic_config_path, wait=False),
+        blocking=False
+    )
+
+    def on_apply_started(done):
+        try:
+            started = done.result()
+        except Exception as e:
+            started = False
+            logger.error(f"Failed to start apply for env {env_name}: {str(e)}")
+
+        if not started:
+            resolve_deferred_job(job_id, False, {"env": env_name, "status": "apply_failed"})
+            return
+
+        apply_status_poller.track(
+            done,
+            env_name,
+            env_data,
+            lambda success, detail: resolve_deferred_job(job_id, success, detail)
+        )
+
+    future.add_done_callback(on_apply_started)
+    logger.info(f"Apply for env {env_name} queued asynchronously for job_id={job_id}")
+    return True
+
+def apply_variables_to_cloud(
+    env_name: str,
+    env_data: Dict,
+    paic_config_path: str = settings.PAIC_CONFIG_PATH,
+    wait: bool = True
+) -> bool:
+    """
+    Run `frodo esv apply` for a specific env, restarting the tenant services
+    so that imported variables take effect.
+
+    With wait=False the command returns once the restart has been triggered;
+    its progress is then followed by core.frodo.apply_status.
+
+    Returns:
+        True if the apply succeeds, False if it fails.
+    """
+    paic_config_root = os.path.abspath(paic_config_path)
+    frodo_path = env_data["frodo_path"]
+    platform_url = env_data["platform_url"]
+    proxy = env_data.get("proxy")
+
+    frodo_env = os.environ.copy()
+    if proxy:
+        frodo_env["HTTPS_PROXY"] = proxy
+        logger.info(f"Using proxy: {proxy}")
+
     logger.info(f"Applying imported variables for env: {env_name}")
-    apply_command = f"{frodo_path} esv apply -y {platform_url}"
+    no_wait = "" if wait else " --no-wait"
+    apply_command = f"{frodo_path} esv apply -y{no_wait} {platform_url}"
 
     try:
-        stdout, stderr = run_command(apply_command, cwd=paic_config_root, process_env=frodo_env)
+        # Not retried: a retry after a lost response could restart the tenant twice
+        stdout, stderr = run_frodo_command(
+            apply_command,
+            cwd=paic_config_root,
+            process_env=frodo_env,
+            breaker_key=platform_url
+        )
         logger.info(f"Apply stdout: {stdout}")
         if stderr:
             logger.warning(f"Apply stderr: {stderr}")
     except Exception as e:
         logger.error(f"Failed to apply variables for env {env_name}: {str(e)}")
-        success = False
+        return False
 
-    logger.info(f"Finished import_variables_for_env for {env_name} with success={success}")
-
-    return success
+    return True
 
 def delete_variables_to_cloud(
     env_name: str,
@@ -190,7 +415,13 @@ def delete_variables_to_cloud(
         logger.info(f"Running delete command: {command}")
 
         try:
-            stdout, stderr = run_command(command, cwd=paic_config_root, process_env=frodo_env)
+            stdout, stderr = run_frodo_command(
+                command,
+                cwd=paic_config_root,
+                process_env=frodo_env,
+                breaker_key=platform_url,
+                idempotent=True
+            )
             logger.info(f"Delete stdout: {stdout}")
             if stderr:
                 logger.warning(f"Delete stderr: {stderr}")
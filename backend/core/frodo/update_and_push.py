@@ -5,7 +5,9 @@ import shutil
 
 from core.logger import get_logger
 from core.settings import settings
-from core.frodo.utils import run_command
+from core.frodo.utils import run_command, run_frodo_command
+from core.frodo.variable_cache import variable_file_cache
+from core.frodo.variable_index import variable_index
 
 logger = get_logger("__name__")
 
@@ -82,10 +84,12 @@ def update_and_push(
     # Run Frodo config export
     logger.info("Running Frodo config export...")
     try:
-        export_stdout, export_stderr = run_command(
+        export_stdout, export_stderr = run_frodo_command(
             f"{frodo_path} config export -sxoAND {configs_dir} {platform_url}",
             cwd=paic_config_root,
-            process_env=frodo_env
+            process_env=frodo_env,
+            breaker_key=platform_url,
+            idempotent=True
         )
         result["frodo_export_status"] = "success"
         result["stdout"] = export_stdout
@@ -96,6 +100,11 @@ def update_and_push(
         logger.error(f"Frodo export failed: {e}")
         result["overall_status"] = "failed"
         return result
+    finally:
+        # The env's files were rewritten; drop everything parsed from them
+        variable_file_cache.invalidate(configs_dir)
+        if variable_index.is_running():
+            variable_index.refresh_env(env_name)
 
     # Check for changes
     try:
@@ -2,13 +2,15 @@
 import subprocess
 import tempfile
 import json
+from typing import Tuple
 from core.logger import get_logger
+from core.frodo.resilience import call_with_resilience
 
 logger = get_logger("__name__")
 
-def run_command(command: str, cwd: str = ".", process_env: dict = None) -> str:
+def run_command(command: str, cwd: str = ".", process_env: dict = None) -> Tuple[str, str]:
     """
-    Run a shell command and return its stdout output.
+    Run a shell command and return its (stdout, stderr) output.
     Logs stdout, stderr, and errors with your centralized logger.
     """
     try:
@@ -36,6 +38,25 @@ def run_command(command: str, cwd: str = ".", process_env: dict = None) -> str:
         )
         raise
 
+def run_frodo_command(
+    command: str,
+    cwd: str = ".",
+    process_env: dict = None,
+    breaker_key: str = None,
+    idempotent: bool = False
+) -> Tuple[str, str]:
+    """
+    Run a frodo command through the shared resilience layer.
+    breaker_key (the tenant's platform URL) selects the circuit breaker;
+    idempotent commands are retried on transient failures.
+    """
+    return call_with_resilience(
+        lambda: run_command(command, cwd=cwd, process_env=process_env),
+        breaker_key=breaker_key,
+        idempotent=idempotent,
+        description=" ".join(command.split()[1:3]) or command
+    )
+
 def write_tempfile(data: dict, suffix: str = ".tmp") -> str:
     """
     Write dict data to a temporary file with the given suffix and return its path.
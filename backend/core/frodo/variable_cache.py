@@ -0,0 +1,82 @@
+# core/frodo/variable_cache.py
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__)
+
+# (mtime_ns, size, inode): changes whenever a file is rewritten or replaced
+FileSignature = Tuple[int, int, int]
+
+def file_signature(stat_result: os.stat_result) -> FileSignature:
+    return (stat_result.st_mtime_ns, stat_result.st_size, stat_result.st_ino)
+
+class VariableFileCache:
+    """
+    In-process LRU cache of parsed PAIC variable files.
+
+    Entries are keyed by path and only served while the file's
+    (mtime_ns, size, inode) signature is unchanged, so an edited or replaced
+    file is always re-read. Holds at most `max_entries` files.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, Tuple[FileSignature, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, path: str, signature: FileSignature) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, path: str, signature: FileSignature, value: Any) -> None:
+        with self._lock:
+            self._entries[path] = (signature, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, prefix: Optional[str] = None) -> int:
+        """Drop every entry (or every entry under the `prefix` directory)."""
+        with self._lock:
+            if prefix is None:
+                dropped = list(self._entries)
+            else:
+                prefix = os.path.join(os.path.abspath(prefix), "")
+                dropped = [path for path in self._entries if path.startswith(prefix)]
+            for path in dropped:
+                del self._entries[path]
+            self.invalidations += len(dropped)
+
+        logger.info(f"Invalidated {len(dropped)} cached variable file(s) under {prefix or 'all paths'}")
+        return len(dropped)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+variable_file_cache = VariableFileCache(settings.ESV_FILE_CACHE_SIZE)
@@ -0,0 +1,138 @@
+# core/frodo/variable_files.py
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from core.logger import get_logger
+from core.settings import settings
+from core.esv_hash import metadata_hash, value_hash
+from core.frodo.variable_cache import variable_file_cache, file_signature, FileSignature
+
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used instead
+    orjson = None
+
+logger = get_logger(__name__)
+
+VARIABLE_FILE_SUFFIX = ".variable.json"
+
+class VariableRecord(NamedTuple):
+    """
+    One variable as read from the source. Same attributes as EsvVariablePerEnv,
+    without the cost of pydantic validation for every entry of every file,
+    plus the same content hashes the DB stores (see core.esv_hash).
+    """
+    description: Optional[str]
+    expressionType: Optional[str]
+    value: Optional[str]
+    content_hash: Optional[str] = None
+    value_hash: Optional[str] = None
+
+def make_variable_record(
+    description: Optional[str],
+    expression_type: Optional[str],
+    value: Optional[str]
+) -> VariableRecord:
+    """VariableRecord with its content hashes filled in."""
+    return VariableRecord(
+        description,
+        expression_type,
+        value,
+        metadata_hash(description, expression_type),
+        value_hash(value)
+    )
+
+VariableFile = Dict[str, VariableRecord]
+
+def variable_dir_for(paic_config_path: str, env_name: str) -> str:
+    """Absolute path of configs/<ENV>/global/variable in the PAIC config repo."""
+    return os.path.abspath(os.path.join(paic_config_path, "configs", env_name, "global", "variable"))
+
+def scan_variable_dir(variable_dir: str) -> List[Tuple[str, FileSignature]]:
+    """List (path, signature) for every *.variable.json file in variable_dir."""
+    files = []
+    with os.scandir(variable_dir) as entries:
+        for entry in entries:
+            if entry.name.endswith(VARIABLE_FILE_SUFFIX):
+                files.append((entry.path, file_signature(entry.stat())))
+    return files
+
+def load_variable_files(
+    files: List[Tuple[str, FileSignature]],
+    errors: Optional[Dict[str, Exception]] = None
+) -> Dict[str, VariableFile]:
+    """
+    Parsed variables of many files, keyed by path in the order given.
+
+    Cached files are served directly; the rest are parsed on a thread pool
+    once there are at least ESV_LOADER_PARALLEL_MIN_FILES of them. A file
+    that fails to load raises, unless `errors` is given, in which case the
+    failure is recorded there and the file is left out.
+    """
+    loaded: Dict[str, Optional[VariableFile]] = {}
+    missing = []
+    for path, signature in files:
+        loaded[path] = variable_file_cache.get(path, signature)
+        if loaded[path] is None:
+            missing.append((path, signature))
+
+    def parse(item):
+        path, signature = item
+        try:
+            return path, signature, parse_variable_file(path), None
+        except (OSError, ValueError) as e:
+            return path, signature, None, e
+
+    workers = max(1, settings.ESV_LOADER_WORKERS)
+    if workers > 1 and len(missing) >= settings.ESV_LOADER_PARALLEL_MIN_FILES:
+        logger.debug(f"Parsing {len(missing)} variable files with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="esv-loader") as pool:
+            parsed = list(pool.map(parse, missing))
+    else:
+        parsed = [parse(item) for item in missing]
+
+    for path, signature, file_variables, error in parsed:
+        if error is not None:
+            if errors is None:
+                raise error
+            errors[path] = error
+            del loaded[path]
+            continue
+        variable_file_cache.put(path, signature, file_variables)
+        loaded[path] = file_variables
+
+    return loaded
+
+def decode_json(raw: bytes):
+    """Decode a JSON document, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+def parse_variable_file(file_path: str) -> VariableFile:
+    """Parse one PAIC *.variable.json file into var_name -> VariableRecord."""
+    with open(file_path, "rb") as f:
+        return parse_variable_json(f.read(), file_path)
+
+def parse_variable_json(raw: bytes, source_name: str) -> VariableFile:
+    """Parse the content of one *.variable.json file; source_name is used for logging."""
+    data = decode_json(raw)
+    if not data:
+        logger.warning(f"Variable file is empty or invalid JSON: {source_name}")
+        return {}
+
+    var_data = data.get("variable", {})
+    if not var_data:
+        logger.warning(f"No variables found in file: {os.path.basename(source_name)}")
+        return {}
+
+    return {
+        var_name: make_variable_record(
+            var_content.get("description", ""),
+            var_content.get("expressionType", "string"),
+            var_content.get("value", "")
+        )
+        for var_name, var_content in var_data.items()
+    }
@@ -0,0 +1,233 @@
+# core/frodo/variable_index.py
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from core.logger import get_logger
+from core.settings import settings
+from core.frodo.variable_cache import FileSignature
+from core.frodo.variable_files import VariableRecord, variable_dir_for, scan_variable_dir, load_variable_files
+
+try:
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:  # optional dependency, polling is used instead
+    INotify = None
+    inotify_flags = None
+
+logger = get_logger(__name__)
+
+class _EnvIndex:
+    """Variables of one env, kept per file so changes can be applied file by file."""
+
+    def __init__(self):
+        self.files: Dict[str, Tuple[FileSignature, Dict[str, VariableRecord]]] = {}
+        self.snapshot: Dict[str, VariableRecord] = {}
+        self.generation = 0
+
+class VariableIndex:
+    """
+    Live, in-memory index of the ESV variables in PAIC_CONFIG_PATH/configs/*/global/variable.
+
+    A background thread keeps the index up to date: with inotify when
+    inotify_simple is installed (and mode allows it), otherwise by polling the
+    variable folders with os.scandir stat checks. Only files whose signature
+    changed are re-parsed; each env's merged snapshot is swapped in atomically,
+    so readers get a consistent view without locking or copying.
+    """
+
+    def __init__(self, paic_config_path: str, mode: str = "auto", poll_seconds: float = 2.0):
+        self.paic_config_path = paic_config_path
+        self.mode = mode
+        self.poll_seconds = max(0.1, poll_seconds)
+        # Full rescan interval for the inotify backend: picks up new env folders
+        # and folders recreated by an export (inotify watches die with the folder)
+        self.rescan_seconds = max(self.poll_seconds * 15, 30.0)
+        self.backend: Optional[str] = None
+        self._envs: Dict[str, _EnvIndex] = {}
+        # Serialises writers (watcher thread vs. explicit refreshes); readers never lock
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---- lifecycle ----
+
+    def start(self) -> None:
+        if self.is_running():
+            return
+
+        if self.mode in ("auto", "inotify") and INotify is not None:
+            self.backend = "inotify"
+        elif self.mode == "inotify":
+            logger.warning("inotify_simple is not installed; ESV source watcher falls back to polling")
+            self.backend = "poll"
+        else:
+            self.backend = "poll"
+
+        self.refresh_all()
+
+        self._stop.clear()
+        target = self._run_inotify if self.backend == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name="esv-source-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"ESV source watcher started (backend={self.backend}) on {self.paic_config_path}")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # ---- reads ----
+
+    def get(self, env_name: str) -> Optional[Dict[str, VariableRecord]]:
+        """
+        Current variables of env_name, or None if the env is not indexed.
+        The returned dict is shared; treat it as read-only.
+        """
+        env_index = self._envs.get(env_name)
+        return env_index.snapshot if env_index else None
+
+    def generation(self, env_name: str) -> Optional[int]:
+        """Counter bumped every time env_name's indexed variables change."""
+        env_index = self._envs.get(env_name)
+        return env_index.generation if env_index else None
+
+    # ---- updates ----
+
+    def refresh_all(self) -> None:
+        """Rescan every env folder and drop envs whose folder is gone."""
+        present = set(self._discover_envs())
+        for env_name in present:
+            self.refresh_env(env_name)
+        with self._lock:
+            for env_name in set(self._envs) - present:
+                del self._envs[env_name]
+                logger.info(f"ESV source watcher dropped env={env_name}")
+
+    def refresh_env(self, env_name: str) -> bool:
+        """
+        Bring env_name up to date, re-parsing only new or changed files.
+        Returns True if its variables changed.
+        """
+        variable_dir = variable_dir_for(self.paic_config_path, env_name)
+        try:
+            scanned = scan_variable_dir(variable_dir)
+        except FileNotFoundError:
+            scanned = []
+
+        with self._lock:
+            current = self._envs.get(env_name)
+            old_files = current.files if current else {}
+
+            changed = current is None or len(scanned) != len(old_files)
+            files = {}
+            to_load = []
+            for path, signature in scanned:
+                old = old_files.get(path)
+                if old is not None and old[0] == signature:
+                    files[path] = old
+                else:
+                    to_load.append((path, signature))
+
+            errors = {}
+            loaded = load_variable_files(to_load, errors=errors)
+            for path, signature in to_load:
+                if path in errors:
+                    # Half-written file: keep what we had, the next pass retries
+                    logger.warning(f"ESV source watcher could not read {path}: {errors[path]}")
+                    if path in old_files:
+                        files[path] = old_files[path]
+                    continue
+                files[path] = (signature, loaded[path])
+                changed = True
+
+            if not changed:
+                return False
+
+            env_index = _EnvIndex()
+            env_index.files = files
+            for _, file_variables in files.values():
+                env_index.snapshot.update(file_variables)
+            env_index.generation = (current.generation + 1) if current else 1
+            self._envs[env_name] = env_index
+
+        logger.debug(f"ESV source index for env={env_name} updated: {len(env_index.snapshot)} variables")
+        return True
+
+    def _discover_envs(self) -> List[str]:
+        configs_dir = os.path.join(self.paic_config_path, "configs")
+        if not os.path.isdir(configs_dir):
+            return []
+        return [
+            entry.name
+            for entry in os.scandir(configs_dir)
+            if entry.is_dir() and os.path.isdir(variable_dir_for(self.paic_config_path, entry.name))
+        ]
+
+    # ---- backends ----
+
+    def _run_poll(self) -> None:
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh_all()
+            except Exception as e:
+                logger.exception(f"ESV source watcher poll failed: {e}")
+
+    def _run_inotify(self) -> None:
+        inotify = INotify()
+        watch_flags = (
+            inotify_flags.CLOSE_WRITE | inotify_flags.MOVED_TO | inotify_flags.MOVED_FROM
+            | inotify_flags.CREATE | inotify_flags.DELETE | inotify_flags.DELETE_SELF
+        )
+        watches: Dict[int, str] = {}
+        last_rescan = 0.0
+
+        try:
+            while not self._stop.is_set():
+                if time.monotonic() - last_rescan >= self.rescan_seconds:
+                    self.refresh_all()
+                    watched = set(watches.values())
+                    for env_name in self._discover_envs():
+                        if env_name in watched:
+                            continue
+                        try:
+                            wd = inotify.add_watch(variable_dir_for(self.paic_config_path, env_name), watch_flags)
+                            watches[wd] = env_name
+                        except OSError as e:
+                            logger.warning(f"ESV source watcher cannot watch env={env_name}: {e}")
+                    last_rescan = time.monotonic()
+
+                dirty = set()
+                for event in inotify.read(timeout=int(self.poll_seconds * 1000)):
+                    env_name = watches.get(event.wd)
+                    if env_name is None:
+                        continue
+                    if event.mask & (inotify_flags.DELETE_SELF | inotify_flags.IGNORED):
+                        # Folder removed (e.g. export cleanup); re-added on the next rescan
+                        watches.pop(event.wd, None)
+                        last_rescan = 0.0
+                    dirty.add(env_name)
+
+                for env_name in dirty:
+                    try:
+                        self.refresh_env(env_name)
+                    except Exception as e:
+                        logger.exception(f"ESV source watcher refresh failed for env={env_name}: {e}")
+        finally:
+            inotify.close()
+
+variable_index = VariableIndex(
+    paic_config_path=settings.PAIC_CONFIG_PATH,
+    mode=settings.ESV_SOURCE_WATCHER,
+    poll_seconds=settings.ESV_SOURCE_POLL_SECONDS
+)
+
+def start_variable_index() -> None:
+    """Start the background source watcher unless ESV_SOURCE_WATCHER is 'off'."""
+    if settings.ESV_SOURCE_WATCHER == "off":
+        return
+    variable_index.start()
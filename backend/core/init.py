@@ -3,6 +3,7 @@ import os
 import json
 from core import db
 from core.settings import settings
+from core.frodo.variable_index import start_variable_index
 
 # export environment variables
 DATABASE_FOLDER = settings.DATABASE_FOLDER
@@ -14,13 +15,18 @@ def init_database_folder():
 
 def init_db():
     db.init_db()
+    db.upgrade_db()
 
 def init_user_file():
     if not os.path.exists(USER_FILE):
         with open(USER_FILE, "w") as f:
             json.dump({"users": []}, f)
 
+def init_source_watcher():
+    start_variable_index()
+
 def run_all():
     init_database_folder()
     init_db()
-    init_user_file()
\ No newline at end of file
+    init_user_file()
+    init_source_watcher()
\ No newline at end of file
@@ -1,17 +1,27 @@
 # core/services/job_service.py
 import threading
+from contextvars import ContextVar
+from sqlalchemy import update
 from sqlmodel import Session, select
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Dict
+from core import db
 from core.logger import get_logger
 from models import db_models
 from datetime import datetime, UTC
 
 logger = get_logger(__name__)
 
+current_job_id_ctx_var = ContextVar("job_id", default=None)
+
+# job_id -> bookkeeping for work that finishes after job_fn has returned
+_deferred_jobs: Dict[str, dict] = {}
+_deferred_lock = threading.Lock()
+
 def create_job(
     session: Session,
     current_user: db_models.UserProfile,
-    job_type: str
+    job_type: str,
+    parent_job_id: Optional[str] = None
 ) -> db_models.Job:
     """
     Create a new Job record with status 'pending'.
@@ -19,6 +29,7 @@ def create_job(
     job = db_models.Job(
         job_type=job_type,
         status="pending",
+        parent_job_id=parent_job_id,
         user_profile_id=current_user.id,
         created_at=datetime.now(UTC),
         updated_at=datetime.now(UTC)
@@ -81,6 +92,34 @@ def get_job_result(
         raise ValueError(f"Job {job_id} not found or access denied.")
     return job.result
 
+def get_job_progress(
+    session: Session,
+    current_user: db_models.UserProfile,
+    job_id: str
+) -> Optional[dict]:
+    statement = select(db_models.Job.progress).where(
+        db_models.Job.job_id == job_id,
+        db_models.Job.user_profile_id == current_user.id
+    )
+    return session.exec(statement).first()
+
+def update_job_progress(progress: dict) -> None:
+    """
+    Record progress of the job running in the current thread, in a short
+    transaction of its own. Does nothing outside a background job.
+    """
+    job_id = current_job_id_ctx_var.get()
+    if job_id is None:
+        return
+
+    with Session(db.engine) as session:
+        session.exec(
+            update(db_models.Job)
+            .where(db_models.Job.job_id == job_id)
+            .values(progress=progress, updated_at=datetime.now(UTC))
+        )
+        session.commit()
+
 def run_job_in_background(
     *,
     job_type: str,
@@ -101,6 +140,7 @@ def run_job_in_background(
     )
 
     def background_task():
+        current_job_id_ctx_var.set(job.job_id)
         logger.info(f"Job_id={job.job_id} job_type={job_type} user_id={current_user.id} started")
         try:
             update_job_status(
@@ -112,6 +152,20 @@ def run_job_in_background(
 
             result = job_fn()
 
+            if _has_deferred_work(job.job_id):
+                # Record the job_fn result first; the job is finished by
+                # resolve_deferred_job() once the deferred work completes
+                update_job_status(
+                    session=session,
+                    current_user=current_user,
+                    job_id=job.job_id,
+                    status="applying",
+                    result=result
+                )
+                logger.info(f"Job_id={job.job_id} job_type={job_type} waiting for deferred work")
+                _hand_over_deferred_job(job.job_id, result)
+                return
+
             update_job_status(
                 session=session,
                 current_user=current_user,
@@ -122,6 +176,8 @@ def run_job_in_background(
             logger.info(f"Job_id={job.job_id} job_type={job_type} finished successfully")
 
         except Exception as e:
+            with _deferred_lock:
+                _deferred_jobs.pop(job.job_id, None)
             logger.exception(f"Job_id={job.job_id} job_type={job_type} failed: {e}")
             update_job_status(
                 session=session,
@@ -134,4 +190,121 @@ def run_job_in_background(
     thread = threading.Thread(target=background_task)
     thread.start()
 
-    return job.job_id
\ No newline at end of file
+    return job.job_id
+
+def defer_current_job() -> Optional[str]:
+    """
+    Register one piece of deferred work (e.g. a tenant restart) against the job
+    running in the current thread. The job stays in status 'applying' after its
+    job_fn returns until every deferred piece is resolved with
+    resolve_deferred_job().
+    Returns: job_id, or None when not called from inside a background job.
+    """
+    job_id = current_job_id_ctx_var.get()
+    if job_id is None:
+        return None
+
+    with _deferred_lock:
+        entry = _deferred_jobs.setdefault(job_id, {
+            "pending": 0,
+            "running": True,
+            "failed": False,
+            "details": [],
+            "result": None,
+            "callbacks": [],
+        })
+        entry["pending"] += 1
+
+    return job_id
+
+def on_deferred_resolved(callback: Callable[[bool], None]) -> bool:
+    """
+    Run callback(success) once all deferred work of the job running in the
+    current thread is resolved, before the job is finished. Changes the
+    callback makes to the job_fn's result end up in the job result.
+    Returns False, without registering, when the job has no deferred work.
+    """
+    job_id = current_job_id_ctx_var.get()
+    if job_id is None:
+        return False
+
+    with _deferred_lock:
+        entry = _deferred_jobs.get(job_id)
+        if entry is None:
+            return False
+        entry["callbacks"].append(callback)
+
+    return True
+
+def resolve_deferred_job(job_id: str, success: bool, detail: dict) -> None:
+    """
+    Resolve one piece of deferred work for job_id. Once the job_fn has returned
+    and nothing is pending any more, the job is marked 'success' or 'failed'.
+    """
+    with _deferred_lock:
+        entry = _deferred_jobs.get(job_id)
+        if entry is None:
+            logger.warning(f"Job_id={job_id} has no deferred work to resolve")
+            return
+
+        entry["pending"] -= 1
+        entry["failed"] = entry["failed"] or not success
+        entry["details"].append(detail)
+
+        if entry["pending"] > 0 or entry["running"]:
+            return
+        _deferred_jobs.pop(job_id)
+
+    _finish_deferred_job(job_id, entry)
+
+def _has_deferred_work(job_id: str) -> bool:
+    with _deferred_lock:
+        return job_id in _deferred_jobs
+
+def _hand_over_deferred_job(job_id: str, result: Any) -> None:
+    """
+    Called once job_fn has returned. Finishes the job right away if all the
+    deferred work was already resolved while job_fn was still running.
+    """
+    with _deferred_lock:
+        entry = _deferred_jobs.get(job_id)
+        if entry is None:
+            return
+
+        entry["running"] = False
+        entry["result"] = result
+        if entry["pending"] > 0:
+            return
+        _deferred_jobs.pop(job_id)
+
+    _finish_deferred_job(job_id, entry)
+
+def _finish_deferred_job(job_id: str, entry: dict) -> None:
+    for callback in entry["callbacks"]:
+        try:
+            callback(not entry["failed"])
+        except Exception as e:
+            logger.exception(f"Job_id={job_id} deferred callback failed: {e}")
+
+    status = "failed" if entry["failed"] else "success"
+    result = dict(entry["result"] or {})
+    result["deferred"] = entry["details"]
+
+    with Session(db.engine) as session:
+        job = session.exec(
+            select(db_models.Job).where(db_models.Job.job_id == job_id)
+        ).first()
+        if not job:
+            logger.error(f"Job_id={job_id} disappeared before deferred completion")
+            return
+
+        user = session.get(db_models.UserProfile, job.user_profile_id)
+        update_job_status(
+            session=session,
+            current_user=user,
+            job_id=job_id,
+            status=status,
+            result=result
+        )
+
+    logger.info(f"Job_id={job_id} deferred work finished with status={status}")
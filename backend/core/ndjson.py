@@ -0,0 +1,40 @@
+# core/ndjson.py
+import json
+from typing import Any, Iterable, Iterator
+
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used instead
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines are sent in chunks of about this size; the first line goes out alone
+NDJSON_CHUNK_BYTES = 64 * 1024
+
+def encode_json(obj: Any) -> bytes:
+    """Encode a JSON document, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+def iter_ndjson(objects: Iterable[Any], chunk_bytes: int = NDJSON_CHUNK_BYTES) -> Iterator[bytes]:
+    """Encode `objects` as newline-delimited JSON, lazily, for a StreamingResponse."""
+    buffer = []
+    size = 0
+    first = True
+    for obj in objects:
+        line = encode_json(obj) + b"\n"
+        if first:
+            # Get the first byte out as soon as there is one
+            first = False
+            yield line
+            continue
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_bytes:
+            yield b"".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b"".join(buffer)
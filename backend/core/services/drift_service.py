@@ -0,0 +1,111 @@
+# core/services/drift_service.py
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
+from sqlmodel import Session, select
+from core import db
+from core.job import on_deferred_resolved
+from core.logger import get_logger
+from core.settings import settings
+from core.frodo.sync_esv import pull_variables_from_cloud
+from core.services.esv_diff import build_source_index, collect_diff, iter_db_vs_source, load_diff_indexes, summarize_diff
+from core.services.sync_esv_service import apply_push_to_source, frodo_env_data
+from models import db_models
+
+logger = get_logger(__name__)
+
+def check_drift(
+    env_names: List[str],
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Compare what the DB says each env should hold with what its tenant
+    actually has.
+    1. Export every tenant's live variables (one frodo call per env), in parallel
+    2. Diff DB vs live per env with the hash-indexed diff engine
+
+    The diff reads like a push plan: 'create' / 'update' are variables the
+    tenant is missing or holds differently, 'delete' are variables only the
+    tenant has. Raises ValueError for unknown envs.
+    Returns: {env_name: {"in_sync", "summary", "drift"}}, or {"error"} for
+    an env whose export failed.
+    """
+    env_names = list(dict.fromkeys(env_names))
+    envs = session.exec(
+        select(db_models.Environment).where(
+            db_models.Environment.name.in_(env_names),
+            db_models.Environment.user_profile_id == current_user.id
+        )
+    ).all()
+    envs_by_name = {env.name: env for env in envs}
+    unknown = [env_name for env_name in env_names if env_name not in envs_by_name]
+    if unknown:
+        raise ValueError(f"Environment '{unknown[0]}' not found for user.")
+
+    logger.info(f"Checking drift for user_id={current_user.id} envs={env_names}")
+
+    # The session stays on this thread: only the exports run on the pool
+    workers = max(1, min(len(env_names), settings.ESV_DRIFT_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="esv-drift") as pool:
+        futures = {
+            env_name: pool.submit(pull_variables_from_cloud, env_name, frodo_env_data(envs_by_name[env_name]))
+            for env_name in env_names
+        }
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for env_name, future in futures.items():
+            try:
+                live = future.result()
+            except Exception as e:
+                logger.error(f"Live export failed for env={env_name}: {e}")
+                results[env_name] = {"error": str(e)}
+                continue
+
+            env = envs_by_name[env_name]
+            db_index, live_index = load_diff_indexes(
+                session, current_user, [env], scoped=True,
+                source_index=build_source_index({env_name: live})
+            )
+            drift = collect_diff(iter_db_vs_source(db_index, live_index))
+            summary = summarize_diff(drift)
+            results[env_name] = {"in_sync": not any(summary.values()), "summary": summary, "drift": drift}
+            logger.info(f"Drift for env={env_name}: {summary}")
+
+    return results
+
+def apply_push_and_verify(
+    env_name: str,
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, Any]:
+    """
+    apply_push_to_source, then check the tenant for drift. The push result
+    gets a 'verify' entry naming exactly what did not land.
+    When the apply was deferred to the status poller, the check runs once the
+    restart has resolved; until then 'verify' is {"pending": True}.
+    """
+    result = apply_push_to_source(env_name, session, current_user)
+
+    user_id = current_user.id
+    if on_deferred_resolved(lambda applied: _verify_after_apply(result, env_name, user_id, applied)):
+        logger.info(f"Drift check for env={env_name} runs once the apply completes")
+        result["verify"] = {"pending": True}
+        return result
+
+    result["verify"] = check_drift([env_name], session, current_user)[env_name]
+    return result
+
+def _verify_after_apply(
+    result: Dict[str, Any],
+    env_name: str,
+    user_id: int,
+    applied: bool
+) -> None:
+    # Runs on the apply status poller's thread, after the request session is gone
+    if not applied:
+        result["verify"] = {"skipped": "apply failed"}
+        return
+
+    with Session(db.engine) as session:
+        user = session.get(db_models.UserProfile, user_id)
+        result["verify"] = check_drift([env_name], session, user)[env_name]
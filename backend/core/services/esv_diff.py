@@ -0,0 +1,394 @@
+# core/services/esv_diff.py
+from sqlalchemy import and_
+from sqlmodel import Session, select
+from typing import AbstractSet, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from core.logger import get_logger
+from models import db_models
+from core.frodo.sync_esv import pull_variables_from_source
+
+logger = get_logger(__name__)
+
+# name -> {"description": ..., "expressionType": ..., "values": {env_name: value}}
+# Source indexes also carry "content_hash" and "value_hashes": {env_name: hash}
+EsvIndex = Dict[str, Dict[str, Any]]
+DiffEntry = Tuple[str, Dict[str, Any]]
+# name -> (variable id, content_hash, {env_name: value_hash})
+EsvHashIndex = Dict[str, Tuple[int, Optional[str], Dict[str, Optional[str]]]]
+
+# Keeps IN (...) lists well below SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+def chunked(items: List[Any], size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _value_join(env_ids: List[int]):
+    return and_(
+        db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id,
+        db_models.EsvVariableValue.environment_id.in_(env_ids)
+    )
+
+def load_db_index(
+    session: Session,
+    current_user: db_models.UserProfile,
+    envs: List[db_models.Environment],
+    scoped: bool = False,
+    variable_ids: Optional[List[int]] = None
+) -> EsvIndex:
+    """
+    Load the user's ESV variables and their values in a single query
+    (one per IN_CHUNK_SIZE ids when restricted to `variable_ids`).
+
+    With scoped=False every variable is returned, including ones without any
+    value. With scoped=True only variables that have a value in one of `envs`
+    are returned, which is what a diff restricted to those envs needs.
+    """
+    env_names_by_id = {env.id: env.name for env in envs}
+    value_join = _value_join(list(env_names_by_id))
+
+    statement = select(
+        db_models.EsvVariable.name,
+        db_models.EsvVariable.description,
+        db_models.EsvVariable.expressionType,
+        db_models.EsvVariableValue.environment_id,
+        db_models.EsvVariableValue.value
+    )
+    if scoped:
+        statement = statement.join(db_models.EsvVariableValue, value_join)
+    else:
+        statement = statement.outerjoin(db_models.EsvVariableValue, value_join)
+
+    statement = statement.where(
+        db_models.EsvVariable.user_profile_id == current_user.id
+    ).order_by(db_models.EsvVariable.id, db_models.EsvVariableValue.id)
+
+    if variable_ids is None:
+        statements = [statement]
+    else:
+        statements = [
+            statement.where(db_models.EsvVariable.id.in_(chunk))
+            for chunk in chunked(sorted(variable_ids))
+        ]
+
+    index: EsvIndex = {}
+    for chunk_statement in statements:
+        for name, description, expression_type, environment_id, value in session.exec(chunk_statement):
+            entry = index.get(name)
+            if entry is None:
+                entry = index[name] = {
+                    "description": description,
+                    "expressionType": expression_type,
+                    "values": {}
+                }
+            if environment_id is not None:
+                entry["values"][env_names_by_id[environment_id]] = value
+
+    return index
+
+def load_db_hashes(
+    session: Session,
+    current_user: db_models.UserProfile,
+    envs: List[db_models.Environment],
+    scoped: bool = False,
+    names: Optional[AbstractSet[str]] = None
+) -> EsvHashIndex:
+    """
+    Same rows as load_db_index, but only ids and content hashes: fixed-size
+    digests instead of descriptions and (possibly large) values.
+    With `names`, only those variables are loaded.
+    """
+    env_names_by_id = {env.id: env.name for env in envs}
+    value_join = _value_join(list(env_names_by_id))
+
+    statement = select(
+        db_models.EsvVariable.id,
+        db_models.EsvVariable.name,
+        db_models.EsvVariable.content_hash,
+        db_models.EsvVariableValue.environment_id,
+        db_models.EsvVariableValue.value_hash
+    )
+    if scoped:
+        statement = statement.join(db_models.EsvVariableValue, value_join)
+    else:
+        statement = statement.outerjoin(db_models.EsvVariableValue, value_join)
+
+    statement = statement.where(
+        db_models.EsvVariable.user_profile_id == current_user.id
+    ).order_by(db_models.EsvVariable.id, db_models.EsvVariableValue.id)
+
+    if names is None:
+        statements = [statement]
+    else:
+        statements = [
+            statement.where(db_models.EsvVariable.name.in_(chunk))
+            for chunk in chunked(sorted(names))
+        ]
+
+    index: EsvHashIndex = {}
+    for chunk_statement in statements:
+        for var_id, name, content_hash, environment_id, value_hash in session.exec(chunk_statement):
+            entry = index.get(name)
+            if entry is None:
+                entry = index[name] = (var_id, content_hash, {})
+            if environment_id is not None:
+                entry[2][env_names_by_id[environment_id]] = value_hash
+
+    return index
+
+def load_diff_indexes(
+    session: Session,
+    current_user: db_models.UserProfile,
+    envs: List[db_models.Environment],
+    ref: Optional[str] = None,
+    scoped: bool = False,
+    names: Optional[AbstractSet[str]] = None,
+    source_index: Optional[EsvIndex] = None
+) -> Tuple[EsvIndex, EsvIndex]:
+    """
+    Load (db_index, source_index) for a diff over `envs`, leaving out every
+    variable whose metadata and env values are identical on both sides.
+    With `names`, both sides are restricted to those variables. A prebuilt
+    `source_index` (see build_source_index) is used instead of the source.
+
+    Phase 1 compares content hashes: the DB side reads only digests, the
+    source side was hashed when its files were parsed. Phase 2 loads full DB
+    rows for the remaining variables only. Unchanged variables yield no diff
+    entries in either direction, so the diff itself is unaffected.
+    """
+    if source_index is None:
+        source_index = load_source_index(envs, ref=ref)
+    if names is not None:
+        source_index = {name: var for name, var in source_index.items() if name in names}
+    db_hashes = load_db_hashes(session, current_user, envs, scoped=scoped, names=names)
+
+    changed_source: EsvIndex = {}
+    for name, source_var in source_index.items():
+        db_entry = db_hashes.get(name)
+        if db_entry is not None and _same_content(db_entry, source_var):
+            continue
+        changed_source[name] = source_var
+
+    changed_ids = [
+        var_id
+        for name, (var_id, _, _) in db_hashes.items()
+        if name in changed_source or name not in source_index
+    ]
+    db_index = load_db_index(session, current_user, envs, scoped=scoped, variable_ids=changed_ids) if changed_ids else {}
+
+    logger.info(
+        f"Hash diff: {len(source_index) - len(changed_source)} unchanged, "
+        f"{len(changed_source)} changed in source, {len(changed_ids)} loaded from DB"
+    )
+    return db_index, changed_source
+
+def _same_content(db_entry, source_var: Dict[str, Any]) -> bool:
+    _, content_hash, value_hashes = db_entry
+    if content_hash is None or content_hash != source_var.get("content_hash"):
+        return False
+    # A missing hash (row written before hashing existed) never matches
+    return None not in value_hashes.values() and value_hashes == source_var.get("value_hashes")
+
+def load_source_index(envs: List[db_models.Environment], ref: Optional[str] = None) -> EsvIndex:
+    """
+    Load the source variables of every env into one index, from the working
+    tree or, with `ref`, from that git ref.
+    """
+    return build_source_index({env.name: pull_variables_from_source(env.name, ref=ref) for env in envs})
+
+def build_source_index(variables_by_env: Dict[str, Dict[str, Any]]) -> EsvIndex:
+    """
+    Index env_name -> {var_name: VariableRecord} the way load_source_index does.
+    Description and expressionType come from the first env that defines the variable.
+    """
+    index: EsvIndex = {}
+    for env_name, source_data in variables_by_env.items():
+        for name, var in source_data.items():
+            entry = index.get(name)
+            if entry is None:
+                entry = index[name] = {
+                    "description": var.description,
+                    "expressionType": var.expressionType,
+                    "values": {},
+                    "content_hash": getattr(var, "content_hash", None),
+                    "value_hashes": {}
+                }
+            entry["values"][env_name] = var.value
+            entry["value_hashes"][env_name] = getattr(var, "value_hash", None)
+
+    return index
+
+def _diff_field(target: Dict[str, Any], other: Dict[str, Any], field: str, target_is_new: bool):
+    if target[field] == other[field]:
+        return None
+    if target_is_new:
+        return {"old": other[field], "new": target[field]}
+    return {"old": target[field], "new": other[field]}
+
+def iter_source_vs_db(source_index: EsvIndex, db_index: EsvIndex) -> Iterator[DiffEntry]:
+    """
+    Yield ("create" | "update" | "delete", entry) pairs describing what a pull
+    would change in the DB so that it matches the source.
+    """
+    # Source → DB
+    for name, source_var in source_index.items():
+        db_var = db_index.get(name)
+        if db_var is None:
+            yield "create", {
+                "name": name,
+                "description": source_var["description"],
+                "expressionType": source_var["expressionType"],
+                "values": source_var["values"]
+            }
+            continue
+
+        diff_description = _diff_field(db_var, source_var, "description", target_is_new=False)
+        diff_expressionType = _diff_field(db_var, source_var, "expressionType", target_is_new=False)
+
+        db_values = db_var["values"]
+        changed_values = {}
+        partial_create_values = {}
+
+        for env_name, source_val in source_var["values"].items():
+            db_val_value = db_values.get(env_name)
+
+            if db_val_value is None and source_val is not None:
+                # New env value that didn't exist in DB → partial create
+                partial_create_values[env_name] = source_val
+            elif db_val_value != source_val:
+                # Value exists but changed → update
+                changed_values[env_name] = {"old": db_val_value, "new": source_val}
+
+        if diff_description or diff_expressionType or changed_values:
+            yield "update", {
+                "name": name,
+                "description": diff_description if diff_description else source_var["description"],
+                "expressionType": diff_expressionType if diff_expressionType else source_var["expressionType"],
+                # Without value changes, include all (unchanged) env values
+                "values": changed_values if changed_values else dict(source_var["values"])
+            }
+
+        if partial_create_values:
+            yield "create", {
+                "name": name,
+                "description": source_var["description"],
+                "expressionType": source_var["expressionType"],
+                "values": partial_create_values
+            }
+
+    # Vars in DB but not in source → delete (including partial deletes)
+    for name, db_var in db_index.items():
+        source_var = source_index.get(name)
+        if source_var is None:
+            yield "delete", {
+                "name": name,
+                "description": db_var["description"],
+                "expressionType": db_var["expressionType"],
+                "values": dict(db_var["values"])
+            }
+            continue
+
+        source_values = source_var["values"]
+        partial_values = {
+            env_name: value
+            for env_name, value in db_var["values"].items()
+            if env_name not in source_values
+        }
+        if partial_values:
+            yield "delete", {
+                "name": name,
+                "description": db_var["description"],
+                "expressionType": db_var["expressionType"],
+                "values": partial_values
+            }
+
+def iter_db_vs_source(db_index: EsvIndex, source_index: EsvIndex) -> Iterator[DiffEntry]:
+    """
+    Yield ("create" | "update" | "delete", entry) pairs describing what a push
+    would change in the source so that it matches the DB.
+    """
+    # DB → source
+    for name, db_var in db_index.items():
+        source_var = source_index.get(name)
+        if source_var is None:
+            yield "create", {
+                "name": name,
+                "description": db_var["description"],
+                "expressionType": db_var["expressionType"],
+                "values": db_var["values"]
+            }
+            continue
+
+        diff_description = _diff_field(db_var, source_var, "description", target_is_new=True)
+        diff_expressionType = _diff_field(db_var, source_var, "expressionType", target_is_new=True)
+
+        source_values = source_var["values"]
+        changed_values = {}
+        partial_create_values = {}
+
+        for env_name, db_val in db_var["values"].items():
+            source_val = source_values.get(env_name)
+
+            if source_val is None:
+                partial_create_values[env_name] = db_val
+            elif source_val != db_val:
+                changed_values[env_name] = {"old": source_val, "new": db_val}
+
+        if diff_description or diff_expressionType or changed_values:
+            yield "update", {
+                "name": name,
+                "description": diff_description if diff_description else db_var["description"],
+                "expressionType": diff_expressionType if diff_expressionType else db_var["expressionType"],
+                # Without value changes, include all (unchanged) env values
+                "values": changed_values if changed_values else dict(db_var["values"])
+            }
+
+        if partial_create_values:
+            yield "create", {
+                "name": name,
+                "description": db_var["description"],
+                "expressionType": db_var["expressionType"],
+                "values": partial_create_values
+            }
+
+    # Vars in source but not in DB → delete (including partial env deletes)
+    for name, source_var in source_index.items():
+        db_var = db_index.get(name)
+        if db_var is None:
+            yield "delete", {
+                "name": name,
+                "description": source_var["description"],
+                "expressionType": source_var["expressionType"],
+                "values": source_var["values"]
+            }
+            continue
+
+        db_values = db_var["values"]
+        partial_values = {
+            env_name: value
+            for env_name, value in source_var["values"].items()
+            if env_name not in db_values
+        }
+        if partial_values:
+            yield "delete", {
+                "name": name,
+                "description": source_var["description"],
+                "expressionType": source_var["expressionType"],
+                "values": partial_values
+            }
+
+def collect_diff(entries: Iterable[DiffEntry]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group diff entries into the {'create', 'update', 'delete'} structure."""
+    result = {"create": [], "update": [], "delete": []}
+    for action, entry in entries:
+        result[action].append(entry)
+    return result
+
+def iter_collected(diff_result: Dict[str, List[Dict[str, Any]]]) -> Iterator[DiffEntry]:
+    """Inverse of collect_diff: yield the entries of a grouped diff result."""
+    for action, entries in diff_result.items():
+        for entry in entries:
+            yield action, entry
+
+def summarize_diff(diff_result: Dict[str, List[Dict[str, Any]]]) -> Dict[str, int]:
+    """Entry counts per action, for logging."""
+    return {action: len(entries) for action, entries in diff_result.items()}
@@ -0,0 +1,80 @@
+# core/services/esv_plan_cache.py
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from core.logger import get_logger
+from core.settings import settings
+
+logger = get_logger(__name__)
+
+class PlanCache:
+    """
+    Computed ESV diffs ("plans"), one per scope (user, direction, envs, ref),
+    stored with the fingerprint of the inputs they were computed from: the
+    user's ESV revision, their envs and each env's source fingerprint.
+
+    A lookup with the same fingerprint returns the stored plan without
+    touching the DB or the source. Plans are shared between callers and
+    must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, scope: Hashable, fingerprint: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is None or entry[0] != fingerprint:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(scope)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, scope: Hashable, fingerprint: Hashable, plan: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[scope] = (fingerprint, plan)
+            self._entries.move_to_end(scope)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(
+        self,
+        scope: Hashable,
+        fingerprint: Hashable,
+        compute: Callable[[], Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Cached plan for (scope, fingerprint), computing and storing it on a miss.
+        The fingerprint must be taken before `compute` reads its inputs, so a
+        concurrent change can only cause a miss later, never a stale hit.
+        """
+        plan = self.get(scope, fingerprint)
+        if plan is not None:
+            logger.info(f"ESV plan cache hit for scope={scope}")
+            return plan
+
+        plan = compute()
+        self.put(scope, fingerprint, plan)
+        return plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0
+            }
+
+esv_plan_cache = PlanCache(max_entries=settings.ESV_PLAN_CACHE_SIZE)
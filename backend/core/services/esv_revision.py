@@ -0,0 +1,147 @@
+# core/services/esv_revision.py
+from datetime import datetime, UTC
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select
+from typing import Iterable, Optional, Set, Tuple
+from models import db_models
+
+# (action, variable name, environment id or None)
+EsvChange = Tuple[str, str, Optional[int]]
+
+def get_esv_revision(session: Session, current_user: db_models.UserProfile) -> int:
+    """Current ESV revision of the user; 0 until the first write."""
+    return get_revisions(session, current_user)[0]
+
+def get_revisions(session: Session, current_user: db_models.UserProfile) -> Tuple[int, int]:
+    """(ESV revision, environment revision) of the user, in one query."""
+    row = session.exec(
+        select(db_models.UserRevision.esv_revision, db_models.UserRevision.env_revision).where(
+            db_models.UserRevision.user_profile_id == current_user.id
+        )
+    ).first()
+    return (row[0] or 0, row[1] or 0) if row else (0, 0)
+
+def _bump_revision(session: Session, current_user: db_models.UserProfile, column) -> int:
+    now = datetime.now(UTC)
+    revision = session.exec(
+        update(db_models.UserRevision)
+        .where(db_models.UserRevision.user_profile_id == current_user.id)
+        .values({column: column + 1, "updated_at": now})
+        .returning(column)
+        .execution_options(synchronize_session=False)
+    ).scalar()
+
+    if revision is None:
+        session.exec(insert(db_models.UserRevision).values({
+            "user_profile_id": current_user.id,
+            "esv_revision": 0,
+            "env_revision": 0,
+            column.key: 1,
+            "updated_at": now
+        }))
+        revision = 1
+
+    return revision
+
+def bump_esv_revision(session: Session, current_user: db_models.UserProfile) -> int:
+    """
+    Increment the user's ESV revision as part of the caller's transaction
+    and return the new value.
+    """
+    return _bump_revision(session, current_user, db_models.UserRevision.esv_revision)
+
+def bump_env_revision(session: Session, current_user: db_models.UserProfile) -> int:
+    """
+    Increment the user's environment revision as part of the caller's
+    transaction and return the new value. Must be called by every env write.
+    """
+    return _bump_revision(session, current_user, db_models.UserRevision.env_revision)
+
+def record_esv_changes(
+    session: Session,
+    current_user: db_models.UserProfile,
+    changes: Iterable[EsvChange]
+) -> Optional[int]:
+    """
+    Bump the user's ESV revision and append `changes` to the change log, in
+    the caller's transaction. Must be called by every write to the user's
+    ESV variables or values. Returns the new revision (None if no changes).
+    """
+    changes = list(dict.fromkeys(changes))
+    if not changes:
+        return None
+
+    revision = bump_esv_revision(session, current_user)
+    now = datetime.now(UTC)
+    # render_nulls keeps rows with and without environment_id in one statement
+    session.exec(insert(db_models.EsvChangeLog).execution_options(render_nulls=True), params=[
+        {
+            "revision": revision,
+            "action": action,
+            "variable_name": name,
+            "environment_id": environment_id,
+            "user_profile_id": current_user.id,
+            "created_at": now
+        }
+        for action, name, environment_id in changes
+    ])
+    return revision
+
+def changed_names_since(
+    session: Session,
+    current_user: db_models.UserProfile,
+    env: db_models.Environment,
+    revision: int
+) -> Set[str]:
+    """Names of variables written after `revision` in env, or in their metadata."""
+    return set(session.exec(
+        select(db_models.EsvChangeLog.variable_name).where(
+            db_models.EsvChangeLog.user_profile_id == current_user.id,
+            db_models.EsvChangeLog.revision > revision,
+            (db_models.EsvChangeLog.environment_id == env.id)
+            | db_models.EsvChangeLog.environment_id.is_(None)
+        ).distinct()
+    ).all())
+
+def get_push_watermark(
+    session: Session,
+    current_user: db_models.UserProfile,
+    env: db_models.Environment
+) -> Optional[db_models.EsvPushWatermark]:
+    return session.exec(
+        select(db_models.EsvPushWatermark).where(
+            db_models.EsvPushWatermark.user_profile_id == current_user.id,
+            db_models.EsvPushWatermark.environment_id == env.id
+        )
+    ).first()
+
+def set_push_watermark(
+    session: Session,
+    current_user: db_models.UserProfile,
+    env: db_models.Environment,
+    revision: int,
+    source_fingerprint: str
+) -> None:
+    """Record that env was fully pushed as of `revision` against `source_fingerprint`."""
+    watermark = get_push_watermark(session, current_user, env)
+    if watermark is None:
+        watermark = db_models.EsvPushWatermark(
+            user_profile_id=current_user.id,
+            environment_id=env.id,
+            revision=revision,
+            source_fingerprint=source_fingerprint
+        )
+    else:
+        watermark.revision = revision
+        watermark.source_fingerprint = source_fingerprint
+        watermark.updated_at = datetime.now(UTC)
+    session.add(watermark)
+    session.commit()
+
+def clear_push_watermark(session: Session, env: db_models.Environment) -> None:
+    """Forget env's watermark in the caller's transaction; its next push is a full one."""
+    session.exec(
+        delete(db_models.EsvPushWatermark)
+        .where(db_models.EsvPushWatermark.environment_id == env.id)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,219 @@
+# core/services/esv_transfer.py
+import csv
+import io
+from typing import Any, AsyncIterator, Dict, Iterator, List
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_
+from sqlmodel import Session, select
+from core.logger import get_logger
+from core.settings import settings
+from core.ndjson import iter_ndjson
+from core.frodo.variable_files import decode_json
+from core.services.sync_esv_service import upsert_variables_in_db
+from models import db_models
+from models.esv_models import EsvVariableCreate
+
+logger = get_logger(__name__)
+
+# CSV columns besides these are env names, one value per cell
+CSV_FIXED_COLUMNS = ("name", "description", "expressionType")
+# CSV cell for None (no description, no value in that env); an empty cell is ""
+CSV_NULL = "\\N"
+EXPORT_BATCH_SIZE = 1000
+
+class EsvImportError(ValueError):
+    """Malformed import input; `imported` counts what was committed before it."""
+    def __init__(self, message: str, imported: Dict[str, int]):
+        super().__init__(message)
+        self.imported = imported
+
+# ---- IMPORT ----
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8").rstrip("\r")
+    if buffer:
+        yield buffer.decode("utf-8").rstrip("\r")
+
+def _to_variable(data: Dict[str, Any]) -> EsvVariableCreate:
+    if not data.get("name"):
+        raise ValueError("missing variable name")
+    if not data.get("expressionType"):
+        data["expressionType"] = "string"
+    data.setdefault("values", {})
+    return EsvVariableCreate.model_validate(data)
+
+async def _iter_ndjson_records(lines: AsyncIterator[str]) -> AsyncIterator[EsvVariableCreate]:
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            data = decode_json(line)
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            yield _to_variable(data)
+        except ValueError as e:  # includes pydantic's ValidationError
+            raise ValueError(f"line {line_number}: {e}")
+
+async def _iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[EsvVariableCreate]:
+    header = None
+    pending: List[str] = []
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            # Inside a quoted field that spans lines
+            continue
+        pending = []
+        if not text.strip():
+            continue
+
+        row = next(csv.reader([text]))
+        if header is None:
+            header = row
+            if "name" not in header:
+                raise ValueError("CSV header must have a 'name' column")
+            continue
+
+        cells = {column: None if cell == CSV_NULL else cell for column, cell in zip(header, row)}
+        try:
+            yield _to_variable({
+                "name": cells.get("name"),
+                "description": cells.get("description", ""),
+                "expressionType": cells.get("expressionType"),
+                "values": {
+                    column: value
+                    for column, value in cells.items()
+                    if column not in CSV_FIXED_COLUMNS and value is not None
+                }
+            })
+        except ValueError as e:
+            raise ValueError(f"line {line_number}: {e}")
+
+    if pending:
+        raise ValueError("CSV input ends inside a quoted field")
+
+async def import_variables(
+    stream: AsyncIterator[bytes],
+    fmt: str,
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, int]:
+    """
+    Upsert variables from a streamed NDJSON (one EsvVariableCreate object per
+    line) or CSV body (name, description, expressionType and one column per
+    env), ESV_IMPORT_CHUNK_SIZE variables per committed transaction.
+    Input is parsed as it arrives; only one chunk is held in memory.
+    Raises EsvImportError on malformed input (earlier chunks stay imported).
+    """
+    lines = _iter_lines(stream)
+    records = _iter_csv_records(lines) if fmt == "csv" else _iter_ndjson_records(lines)
+
+    totals = {"variables": 0, "variables_created": 0, "variables_updated": 0, "values_created": 0, "values_updated": 0}
+    batch: List[EsvVariableCreate] = []
+
+    async def flush():
+        counts = await run_in_threadpool(upsert_variables_in_db, batch, session, current_user)
+        totals["variables"] += len(batch)
+        for key, count in counts.items():
+            totals[key] += count
+        batch.clear()
+
+    try:
+        async for record in records:
+            batch.append(record)
+            if len(batch) >= settings.ESV_IMPORT_CHUNK_SIZE:
+                await flush()
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.warning(f"ESV import for user_id={current_user.id} stopped: {e}")
+        raise EsvImportError(str(e), dict(totals))
+
+    if batch:
+        await flush()
+
+    logger.info(f"ESV import for user_id={current_user.id} done: {totals}")
+    return totals
+
+# ---- EXPORT ----
+
+def _iter_export_records(
+    session: Session,
+    current_user: db_models.UserProfile,
+    env_names_by_id: Dict[int, str]
+) -> Iterator[Dict[str, Any]]:
+    statement = select(
+        db_models.EsvVariable.id,
+        db_models.EsvVariable.name,
+        db_models.EsvVariable.description,
+        db_models.EsvVariable.expressionType,
+        db_models.EsvVariableValue.environment_id,
+        db_models.EsvVariableValue.value
+    ).outerjoin(
+        db_models.EsvVariableValue,
+        and_(
+            db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id,
+            db_models.EsvVariableValue.environment_id.in_(list(env_names_by_id))
+        )
+    ).where(
+        db_models.EsvVariable.user_profile_id == current_user.id
+    ).order_by(
+        db_models.EsvVariable.name, db_models.EsvVariableValue.environment_id
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    record, record_id = None, None
+    for var_id, name, description, expression_type, environment_id, value in session.exec(statement):
+        if var_id != record_id:
+            if record is not None:
+                yield record
+            record_id = var_id
+            record = {"name": name, "description": description, "expressionType": expression_type, "values": {}}
+        if environment_id is not None:
+            record["values"][env_names_by_id[environment_id]] = value
+    if record is not None:
+        yield record
+
+def _iter_csv(records: Iterator[Dict[str, Any]], env_names: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow([*CSV_FIXED_COLUMNS, *env_names])
+    for count, record in enumerate(records, start=1):
+        writer.writerow([
+            record["name"],
+            CSV_NULL if record["description"] is None else record["description"],
+            CSV_NULL if record["expressionType"] is None else record["expressionType"],
+            *(record["values"].get(env_name, CSV_NULL) for env_name in env_names)
+        ])
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+def export_variables(
+    session: Session,
+    current_user: db_models.UserProfile,
+    fmt: str
+) -> Iterator[bytes]:
+    """
+    Stream all of the user's variables in the import formats, ordered by name,
+    reading rows from a server-side cursor in batches of EXPORT_BATCH_SIZE.
+    """
+    env_rows = session.exec(
+        select(db_models.Environment.id, db_models.Environment.name).where(
+            db_models.Environment.user_profile_id == current_user.id
+        )
+    ).all()
+    env_names_by_id = {env_id: name for env_id, name in env_rows}
+    records = _iter_export_records(session, current_user, env_names_by_id)
+
+    if fmt == "csv":
+        return _iter_csv(records, sorted(env_names_by_id.values()))
+    return iter_ndjson(records)
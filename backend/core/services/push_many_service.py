@@ -0,0 +1,135 @@
+# core/services/push_many_service.py
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+from sqlmodel import Session
+from core.logger import get_logger
+from core.settings import settings
+from core.job import create_job, current_job_id_ctx_var, update_job_progress, update_job_status
+from core.services.esv_revision import get_esv_revision
+from core.services.drift_service import check_drift
+from core.services.sync_esv_service import plan_push_to_source, execute_push_plan, finish_push
+from models import db_models
+
+logger = get_logger(__name__)
+
+# Planning is redone when an ESV write lands while the envs are being planned
+SNAPSHOT_ATTEMPTS = 3
+
+# Shared by every push-many job in the process
+_push_slots = threading.BoundedSemaphore(max(1, settings.ESV_PUSH_MAX_WORKERS))
+_tenant_slots: Dict[str, threading.BoundedSemaphore] = {}
+_tenant_slots_lock = threading.Lock()
+
+def _tenant_slot(platform_url: str) -> threading.BoundedSemaphore:
+    """Concurrency slot of a tenant (keyed by platform URL)."""
+    key = platform_url.rstrip("/")
+    with _tenant_slots_lock:
+        slot = _tenant_slots.get(key)
+        if slot is None:
+            slot = threading.BoundedSemaphore(max(1, settings.ESV_PUSH_PER_TENANT))
+            _tenant_slots[key] = slot
+        return slot
+
+def plan_pushes(
+    env_names: List[str],
+    session: Session,
+    current_user: db_models.UserProfile
+) -> List[Dict[str, Any]]:
+    """
+    Plan a push for every env against one ESV revision, so that all of them
+    are diffed against the same DB state. Raises ValueError for unknown envs
+    before anything is pushed.
+    """
+    for attempt in range(1, SNAPSHOT_ATTEMPTS + 1):
+        revision = get_esv_revision(session, current_user)
+        plans = [
+            plan_push_to_source(env_name, session, current_user, revision=revision)
+            for env_name in env_names
+        ]
+        if get_esv_revision(session, current_user) == revision:
+            return plans
+        logger.info(f"ESV revision moved while planning push for user_id={current_user.id}, attempt {attempt}")
+
+    # Writes that landed meanwhile stay above the watermarks and go out with the next push
+    return plans
+
+def _run_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    # Tenant first: a push waiting for its tenant does not hold a global slot
+    with _tenant_slot(plan["env_data"]["platform_url"]), _push_slots:
+        logger.info(f"Pushing env={plan['env_name']} ({plan['mode']})")
+        # Child jobs are finished here, not by the job runner, so the apply is
+        # always waited for: watermarks only move on a completed restart
+        return execute_push_plan(plan, apply_async=False)
+
+def apply_push_to_sources(
+    env_names: List[str],
+    session: Session,
+    current_user: db_models.UserProfile,
+    verify: bool = False
+) -> Dict[str, Any]:
+    """
+    Push several envs in one job.
+    1. Plan every env against the same DB snapshot
+    2. Create a child job per env under the current job
+    3. Run the per-env pushes concurrently, at most ESV_PUSH_MAX_WORKERS at
+       once and ESV_PUSH_PER_TENANT per tenant; applies are always waited for
+       in the worker threads, also with ESV_APPLY_ASYNC on
+    4. Finish each child (and move its watermark) as its push completes
+    5. With verify, check every tenant for drift (see check_drift), in parallel;
+       each env's result gets a 'verify' entry
+    Returns: {"envs": {env_name: {"job_id", "status", "result"}}, "failed": [env_name]}
+    """
+    env_names = list(dict.fromkeys(env_names))
+    logger.info(f"Starting apply_push_to_sources for user_id={current_user.id} envs={env_names}")
+
+    plans = plan_pushes(env_names, session, current_user)
+
+    parent_job_id = current_job_id_ctx_var.get()
+    children = {
+        plan["env_name"]: create_job(
+            session=session,
+            current_user=current_user,
+            job_type="push_esv_variables",
+            parent_job_id=parent_job_id
+        ).job_id
+        for plan in plans
+    }
+
+    envs: Dict[str, Dict[str, Any]] = {}
+    progress = {"envs_total": len(plans), "envs_done": 0, "envs_failed": 0}
+    update_job_progress(progress)
+
+    workers = max(1, min(len(plans), settings.ESV_PUSH_MAX_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="esv-push") as pool:
+        futures = {pool.submit(_run_plan, plan): plan for plan in plans}
+        for plan in plans:
+            update_job_status(session, current_user, children[plan["env_name"]], "running")
+
+        for future in as_completed(futures):
+            plan = futures[future]
+            env_name = plan["env_name"]
+            try:
+                result = future.result()
+                status = "success" if finish_push(plan, result, session, current_user) else "failed"
+            except Exception as e:
+                logger.exception(f"Push to env={env_name} failed: {e}")
+                result, status = {"error": str(e)}, "failed"
+
+            update_job_status(session, current_user, children[env_name], status, result=result)
+            envs[env_name] = {"job_id": children[env_name], "status": status, "result": result}
+
+            progress["envs_done"] += 1
+            progress["envs_failed"] += status == "failed"
+            update_job_progress(dict(progress))
+
+    if verify:
+        for env_name, drift in check_drift(env_names, session, current_user).items():
+            envs[env_name]["result"]["verify"] = drift
+
+    failed = [env_name for env_name in env_names if envs[env_name]["status"] == "failed"]
+    logger.info(f"Finished apply_push_to_sources for user_id={current_user.id}: {len(failed)} of {len(plans)} envs failed")
+    return {
+        "envs": {env_name: envs[env_name] for env_name in env_names},
+        "failed": failed
+    }
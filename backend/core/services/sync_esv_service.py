@@ -1,7 +1,13 @@
 # core/services/sync_esv_service.py
+from datetime import datetime, UTC
+from sqlalchemy import and_, case, delete, exists, func, insert, literal, or_, tuple_, update
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
-from typing import List, Dict, Any
+from typing import AbstractSet, List, Dict, Any, Iterator, Optional, Tuple
 from core.logger import get_logger
+from core.settings import settings
+from core import db
+from core.job import on_deferred_resolved, update_job_progress
 from models import db_models
 from models.esv_models import (
     EsvVariableResponse,
@@ -10,46 +16,159 @@ from models.esv_models import (
     EsvVariableDelete,
     EsvVariablePerEnv
 )
+from core.services.esv_diff import (
+    IN_CHUNK_SIZE,
+    chunked as _chunked,
+    load_diff_indexes,
+    iter_source_vs_db,
+    iter_db_vs_source,
+    collect_diff,
+    iter_collected,
+    summarize_diff,
+    DiffEntry
+)
+from core.esv_hash import metadata_hash, value_hash
+from core.services.esv_revision import (
+    get_esv_revision,
+    record_esv_changes,
+    changed_names_since,
+    get_push_watermark,
+    set_push_watermark
+)
+from core.services.esv_plan_cache import esv_plan_cache
 from core.frodo.sync_esv import (
-    pull_variables_from_source,
+    source_fingerprint,
     add_variables_to_source,
     update_variables_to_source,
-    delete_variables_to_source
+    delete_variables_to_source,
+    apply_variables_to_source
     )
 
 logger = get_logger(__name__)
 
-def build_esv_variable_response(
-    var: db_models.EsvVariable,
-    session: Session
-) -> EsvVariableResponse:
-    """
-    Build a single EsvVariableResponse for the given EsvVariable,
-    collecting its values per environment.
-    """
-    values_lookup = {}
-    for val in var.values:
-        env = session.get(db_models.Environment, val.environment_id)
-        if env:
-            values_lookup[env.name] = val.value
-
-    return EsvVariableResponse(
-        name=var.name,
-        description=var.description,
-        expressionType=var.expressionType,
-        values=values_lookup
+def build_esv_variable_responses(
+    session: Session,
+    current_user: db_models.UserProfile,
+    variable_ids: Optional[List[int]] = None
+) -> List[EsvVariableResponse]:
+    """
+    Build EsvVariableResponse objects for the user's variables (optionally only
+    `variable_ids`) from one flat variable x environment query.
+    """
+    return list(_build_responses_by_id(session, current_user, variable_ids).values())
+
+def _build_responses_by_id(
+    session: Session,
+    current_user: db_models.UserProfile,
+    variable_ids: Optional[List[int]] = None
+) -> Dict[int, EsvVariableResponse]:
+    statement = select(
+        db_models.EsvVariable.id,
+        db_models.EsvVariable.name,
+        db_models.EsvVariable.description,
+        db_models.EsvVariable.expressionType,
+        db_models.Environment.name,
+        db_models.EsvVariableValue.value
+    ).outerjoin(
+        db_models.EsvVariableValue,
+        db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id
+    ).outerjoin(
+        db_models.Environment,
+        db_models.Environment.id == db_models.EsvVariableValue.environment_id
+    ).where(
+        db_models.EsvVariable.user_profile_id == current_user.id
     )
 
-def diff_source_vs_db_all_envs(
+    if variable_ids is not None:
+        if not variable_ids:
+            return {}
+        statement = statement.where(db_models.EsvVariable.id.in_(variable_ids))
+
+    statement = statement.order_by(db_models.EsvVariable.id, db_models.EsvVariableValue.id)
+
+    responses: Dict[int, EsvVariableResponse] = {}
+    for var_id, name, description, expression_type, env_name, value in session.exec(statement):
+        response = responses.get(var_id)
+        if response is None:
+            response = responses[var_id] = EsvVariableResponse(
+                name=name,
+                description=description,
+                expressionType=expression_type,
+                values={}
+            )
+        if env_name is not None:
+            response.values[env_name] = value
+
+    return responses
+
+def _get_env_ids_by_name(
     session: Session,
     current_user: db_models.UserProfile
-) -> Dict[str, Any]:
-    """
-    Diff all envs in local source vs DB for the user.
-    Returns dict with 'create', 'update', 'delete' lists.
-    """
+) -> Dict[str, int]:
+    rows = session.exec(
+        select(db_models.Environment.name, db_models.Environment.id).where(
+            db_models.Environment.user_profile_id == current_user.id
+        )
+    ).all()
+    return {name: env_id for name, env_id in rows}
+
+def _load_variables_by_name(
+    session: Session,
+    current_user: db_models.UserProfile,
+    names: List[str]
+) -> Dict[str, tuple]:
+    """Returns name -> (id, description, expressionType), in chunked IN queries."""
+    variables = {}
+    for chunk in _chunked(names):
+        rows = session.exec(
+            select(
+                db_models.EsvVariable.name,
+                db_models.EsvVariable.id,
+                db_models.EsvVariable.description,
+                db_models.EsvVariable.expressionType
+            ).where(
+                db_models.EsvVariable.user_profile_id == current_user.id,
+                db_models.EsvVariable.name.in_(chunk)
+            )
+        ).all()
+        for name, var_id, description, expression_type in rows:
+            variables[name] = (var_id, description, expression_type)
+    return variables
+
+def _load_values(
+    session: Session,
+    variable_ids: List[int]
+) -> Dict[tuple, tuple]:
+    """Returns (variable_id, environment_id) -> (value_id, value), in chunked IN queries."""
+    values = {}
+    for chunk in _chunked(variable_ids):
+        rows = session.exec(
+            select(
+                db_models.EsvVariableValue.variable_id,
+                db_models.EsvVariableValue.environment_id,
+                db_models.EsvVariableValue.id,
+                db_models.EsvVariableValue.value
+            ).where(db_models.EsvVariableValue.variable_id.in_(chunk))
+        ).all()
+        for var_id, env_id, value_id, value in rows:
+            values[(var_id, env_id)] = (value_id, value)
+    return values
+
+def _responses_in_order(
+    session: Session,
+    current_user: db_models.UserProfile,
+    variable_ids: List[int]
+) -> List[EsvVariableResponse]:
+    """Responses for variable_ids, in that order (duplicates repeated)."""
+    by_id = {}
+    for chunk in _chunked(list(dict.fromkeys(variable_ids))):
+        by_id.update(_build_responses_by_id(session, current_user, variable_ids=chunk))
+    return [by_id[var_id] for var_id in variable_ids if var_id in by_id]
 
-    # Gather all envs for this user
+def _get_user_envs(
+    session: Session,
+    current_user: db_models.UserProfile
+) -> List[db_models.Environment]:
     envs = session.exec(
         select(db_models.Environment).where(
             db_models.Environment.user_profile_id == current_user.id
@@ -59,286 +178,146 @@ def diff_source_vs_db_all_envs(
     if not envs:
         raise ValueError("No environments found for current user.")
 
-    # Build source_lookup
-    source_lookup = {}
-    for env in envs:
-        source_data = pull_variables_from_source(env.name)
-        for name, var in source_data.items():
-            if name not in source_lookup:
-                source_lookup[name] = {
-                    "description": var.description,
-                    "expressionType": var.expressionType,
-                    "values": {}
-                }
-            source_lookup[name]["values"][env.name] = var.value
-
-    # Build db_lookup
-    db_vars = session.exec(
-        select(db_models.EsvVariable).where(
-            db_models.EsvVariable.user_profile_id == current_user.id
-        )
-    ).all()
-
-    db_lookup = { var.name: var for var in db_vars }
-
-    create_list = []
-    update_list = []
-    delete_list = []
+    return envs
 
-    # Compare source → DB
-    for name, source_var in source_lookup.items():
-        if name not in db_lookup:
-            # Variable does not exist in DB → create
-            create_list.append({
-                "name": name,
-                "description": source_var["description"],
-                "expressionType": source_var["expressionType"],
-                "values": source_var["values"]
-            })
-        else:
-            db_var = db_lookup[name]
-            diff_description = None
-            diff_expressionType = None
-
-            if db_var.description != source_var["description"]:
-                diff_description = {"old": db_var.description, "new": source_var["description"]}
-
-            if db_var.expressionType != source_var["expressionType"]:
-                diff_expressionType = {"old": db_var.expressionType, "new": source_var["expressionType"]}
+def _plan_fingerprint(
+    session: Session,
+    current_user: db_models.UserProfile,
+    envs: List[db_models.Environment],
+    ref: Optional[str]
+) -> tuple:
+    """Everything a diff over `envs` depends on: DB revision, env set and source state."""
+    return (
+        get_esv_revision(session, current_user),
+        tuple((env.id, env.name) for env in envs),
+        tuple(source_fingerprint(env.name, ref=ref) for env in envs)
+    )
 
-            changed_values = {}
-            partial_create_values = {}
+def source_fingerprints(
+    session: Session,
+    current_user: db_models.UserProfile,
+    ref: Optional[str] = None
+) -> tuple:
+    """Source fingerprint of each of the user's envs, without reading any variable."""
+    env_names = sorted(_get_env_ids_by_name(session, current_user))
+    return tuple((name, source_fingerprint(name, ref=ref)) for name in env_names)
 
-            for env_name, source_val in source_var["values"].items():
-                env_obj = next((e for e in envs if e.name == env_name), None)
-                if not env_obj:
-                    continue
+def diff_source_vs_db_all_envs(
+    session: Session,
+    current_user: db_models.UserProfile,
+    ref: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Diff all envs in local source vs DB for the user.
+    With `ref`, the source is read from that git ref instead of the working tree.
+    The result is cached until the DB revision or the source changes; treat it as read-only.
+    Returns dict with 'create', 'update', 'delete' lists.
+    """
+    envs = _get_user_envs(session, current_user)
 
-                db_val = next(
-                    (v for v in db_var.values if v.environment_id == env_obj.id),
-                    None
-                )
-                db_val_value = db_val.value if db_val else None
-
-                if db_val_value is None and source_val is not None:
-                    # New env value that didn't exist in DB → partial create
-                    partial_create_values[env_name] = source_val
-                elif db_val_value != source_val:
-                    # Value exists but changed → update
-                    changed_values[env_name] = {"old": db_val_value, "new": source_val}
-
-            if diff_description or diff_expressionType or changed_values:
-                if not changed_values:
-                    # Include all unchanged env values
-                    unchanged_values = {
-                        env_name: source_var["values"].get(env_name)
-                        for env_name in source_var["values"].keys()
-                    }
-                    update_list.append({
-                        "name": name,
-                        "description": diff_description if diff_description else source_var["description"],
-                        "expressionType": diff_expressionType if diff_expressionType else source_var["expressionType"],
-                        "values": unchanged_values
-                    })
-                else:
-                    update_list.append({
-                        "name": name,
-                        "description": diff_description if diff_description else source_var["description"],
-                        "expressionType": diff_expressionType if diff_expressionType else source_var["expressionType"],
-                        "values": changed_values
-                    })
-
-            if partial_create_values:
-                create_list.append({
-                    "name": name,
-                    "description": source_var["description"],
-                    "expressionType": source_var["expressionType"],
-                    "values": partial_create_values
-                })
-
-    # Vars in DB but not in source → delete (including partial deletes)
-    for name, db_var in db_lookup.items():
-        if name not in source_lookup:
-            delete_list.append({
-                "name": db_var.name,
-                "description": db_var.description,
-                "expressionType": db_var.expressionType,
-                "values": {
-                    env.name: val.value for val in db_var.values
-                    for env in envs if env.id == val.environment_id
-                }
-            })
-        else:
-            source_envs = source_lookup[name]["values"].keys()
-            partial_values = {}
-            for db_val in db_var.values:
-                env_obj = next((e for e in envs if e.id == db_val.environment_id), None)
-                if env_obj and env_obj.name not in source_envs:
-                    partial_values[env_obj.name] = db_val.value
-
-            if partial_values:
-                delete_list.append({
-                    "name": db_var.name,
-                    "description": db_var.description,
-                    "expressionType": db_var.expressionType,
-                    "values": partial_values
-                })
+    def compute():
+        db_index, source_index = load_diff_indexes(session, current_user, envs, ref=ref)
+        return collect_diff(iter_source_vs_db(source_index, db_index))
 
-    return {
-        "create": create_list,
-        "update": update_list,
-        "delete": delete_list
-    }
+    return esv_plan_cache.get_or_compute(
+        (current_user.id, "pull", None, ref),
+        _plan_fingerprint(session, current_user, envs, ref),
+        compute
+    )
 
 def diff_db_vs_source_all_envs(
     session: Session,
-    current_user: db_models.UserProfile
+    current_user: db_models.UserProfile,
+    ref: Optional[str] = None
 ) -> Dict[str, Any]:
     """
     Diff DB (source of truth) vs local source for all envs.
+    With `ref`, the source is read from that git ref instead of the working tree.
+    The result is cached until the DB revision or the source changes; treat it as read-only.
     Returns dict with 'create', 'update', 'delete' lists.
     """
+    envs = _get_user_envs(session, current_user)
 
-    envs = session.exec(
-        select(db_models.Environment).where(
-            db_models.Environment.user_profile_id == current_user.id
-        )
-    ).all()
+    def compute():
+        db_index, source_index = load_diff_indexes(session, current_user, envs, ref=ref)
+        return collect_diff(iter_db_vs_source(db_index, source_index))
 
-    if not envs:
-        raise ValueError("No environments found for current user.")
+    return esv_plan_cache.get_or_compute(
+        (current_user.id, "push", None, ref),
+        _plan_fingerprint(session, current_user, envs, ref),
+        compute
+    )
 
-    # Build DB lookup
-    db_vars = session.exec(
-        select(db_models.EsvVariable).where(
-            db_models.EsvVariable.user_profile_id == current_user.id
-        )
-    ).all()
+def iter_diff_source_vs_db_all_envs(
+    session: Session,
+    current_user: db_models.UserProfile,
+    ref: Optional[str] = None
+) -> Iterator[DiffEntry]:
+    """
+    The entries of diff_source_vs_db_all_envs as ("create" | "update" | "delete", entry)
+    pairs, produced one at a time instead of grouped in memory. Served from the
+    plan cache when it holds the current plan. Source and DB are read before
+    returning, so their errors are raised here rather than while iterating.
+    """
+    envs = _get_user_envs(session, current_user)
+    cached = esv_plan_cache.get(
+        (current_user.id, "pull", None, ref),
+        _plan_fingerprint(session, current_user, envs, ref)
+    )
+    if cached is not None:
+        return iter_collected(cached)
 
-    db_lookup = {}
-    for var in db_vars:
-        db_lookup[var.name] = {
-            "description": var.description,
-            "expressionType": var.expressionType,
-            "values": {}
-        }
-        for val in var.values:
-            env_name = next((e.name for e in envs if e.id == val.environment_id), None)
-            if env_name:
-                db_lookup[var.name]["values"][env_name] = val.value
-
-    # Build source lookup
-    source_lookup = {}
-    for env in envs:
-        source_data = pull_variables_from_source(env.name)
-        for name, var in source_data.items():
-            if name not in source_lookup:
-                source_lookup[name] = {
-                    "description": var.description,
-                    "expressionType": var.expressionType,
-                    "values": {}
-                }
-            source_lookup[name]["values"][env.name] = var.value
-
-    create_list = []
-    update_list = []
-    delete_list = []
-
-    # DB → source
-    for name, db_var in db_lookup.items():
-        if name not in source_lookup:
-            create_list.append({
-                "name": name,
-                "description": db_var["description"],
-                "expressionType": db_var["expressionType"],
-                "values": db_var["values"]
-            })
-        else:
-            source_var = source_lookup[name]
-            diff_description = None
-            diff_expressionType = None
-
-            if db_var["description"] != source_var["description"]:
-                diff_description = {
-                    "old": source_var["description"],
-                    "new": db_var["description"]
-                }
-
-            if db_var["expressionType"] != source_var["expressionType"]:
-                diff_expressionType = {
-                    "old": source_var["expressionType"],
-                    "new": db_var["expressionType"]
-                }
-
-            changed_values = {}
-            partial_create_values = {}
-
-            for env_name, db_val in db_var["values"].items():
-                source_val = source_var["values"].get(env_name)
-
-                if source_val is None:
-                    partial_create_values[env_name] = db_val
-                elif source_val != db_val:
-                    changed_values[env_name] = {"old": source_val, "new": db_val}
-
-            if diff_description or diff_expressionType or changed_values:
-                if not changed_values:
-                    # Include all unchanged env values
-                    unchanged_values = {
-                        env_name: db_var["values"].get(env_name)
-                        for env_name in db_var["values"].keys()
-                    }
-                    update_list.append({
-                        "name": name,
-                        "description": diff_description if diff_description else db_var["description"],
-                        "expressionType": diff_expressionType if diff_expressionType else db_var["expressionType"],
-                        "values": unchanged_values
-                    })
-                else:
-                    update_list.append({
-                        "name": name,
-                        "description": diff_description if diff_description else db_var["description"],
-                        "expressionType": diff_expressionType if diff_expressionType else db_var["expressionType"],
-                        "values": changed_values
-                    })
-
-            if partial_create_values:
-                create_list.append({
-                    "name": name,
-                    "description": db_var["description"],
-                    "expressionType": db_var["expressionType"],
-                    "values": partial_create_values
-                })
-
-    # Vars in source but not in DB → delete (including partial env deletes)
-    for name, source_var in source_lookup.items():
-        if name not in db_lookup:
-            delete_list.append({
-                "name": name,
-                "description": source_var["description"],
-                "expressionType": source_var["expressionType"],
-                "values": source_var["values"]
-            })
-        else:
-            db_envs = db_lookup[name]["values"].keys()
-            partial_values = {}
-            for env_name, source_val in source_var["values"].items():
-                if env_name not in db_envs:
-                    partial_values[env_name] = source_val
-
-            if partial_values:
-                delete_list.append({
-                    "name": name,
-                    "description": source_var["description"],
-                    "expressionType": source_var["expressionType"],
-                    "values": partial_values
-                })
+    db_index, source_index = load_diff_indexes(session, current_user, envs, ref=ref)
+    return iter_source_vs_db(source_index, db_index)
 
-    return {
-        "create": create_list,
-        "update": update_list,
-        "delete": delete_list
-    }
+def iter_diff_db_vs_source_all_envs(
+    session: Session,
+    current_user: db_models.UserProfile,
+    ref: Optional[str] = None
+) -> Iterator[DiffEntry]:
+    """
+    The entries of diff_db_vs_source_all_envs, one at a time; see
+    iter_diff_source_vs_db_all_envs.
+    """
+    envs = _get_user_envs(session, current_user)
+    cached = esv_plan_cache.get(
+        (current_user.id, "push", None, ref),
+        _plan_fingerprint(session, current_user, envs, ref)
+    )
+    if cached is not None:
+        return iter_collected(cached)
+
+    db_index, source_index = load_diff_indexes(session, current_user, envs, ref=ref)
+    return iter_db_vs_source(db_index, source_index)
+
+def diff_db_vs_source_for_env(
+    session: Session,
+    current_user: db_models.UserProfile,
+    env: db_models.Environment,
+    names: Optional[AbstractSet[str]] = None
+) -> Dict[str, Any]:
+    """
+    Diff DB (source of truth) vs local source for a single env.
+    Only that env's source files and value rows are loaded, and every entry
+    only carries values for that env.
+    With `names`, only those variables are diffed and nothing is cached.
+    Otherwise the result is cached until the DB revision or the source changes; treat it as read-only.
+    Returns dict with 'create', 'update', 'delete' lists.
+    """
+    def compute():
+        db_index, source_index = load_diff_indexes(session, current_user, [env], scoped=True, names=names)
+        return collect_diff(iter_db_vs_source(db_index, source_index))
+
+    if names is not None:
+        if not names:
+            return {"create": [], "update": [], "delete": []}
+        return compute()
+
+    return esv_plan_cache.get_or_compute(
+        (current_user.id, "push", env.id, None),
+        _plan_fingerprint(session, current_user, [env], None),
+        compute
+    )
 
 def get_variables_in_db(
     session: Session,
@@ -348,137 +327,561 @@ def get_variables_in_db(
     Get all ESV variables for the current user, grouped with values per environment.
     """
     logger.info(f"Fetching ESV variables for user_id={current_user.id}")
-    variables = session.exec(
-        select(db_models.EsvVariable).where(
-            db_models.EsvVariable.user_profile_id == current_user.id
-        )
-    ).all()
-
-    response = [build_esv_variable_response(var, session) for var in variables]
+    response = build_esv_variable_responses(session, current_user)
 
     logger.info(f"Found {len(response)} ESV variables for user_id={current_user.id}")
     return response
 
+ESV_VARIABLE_FIELDS = ("description", "expressionType", "values")
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """Smallest string greater than every string starting with `prefix` (None if unbounded)."""
+    while prefix:
+        last = ord(prefix[-1])
+        if last == 0xD7FF:
+            # Surrogates cannot be encoded; U+E000 is the next code point that can
+            return prefix[:-1] + chr(0xE000)
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+def list_variables_in_db(
+    session: Session,
+    current_user: db_models.UserProfile,
+    limit: Optional[int] = None,
+    after: Optional[str] = None,
+    prefix: Optional[str] = None,
+    env_name: Optional[str] = None,
+    expression_type: Optional[str] = None,
+    fields: AbstractSet[str] = frozenset(ESV_VARIABLE_FIELDS)
+) -> Tuple[List[EsvVariableResponse], Optional[str]]:
+    """
+    One page of the user's ESV variables, ordered by name (keyset pagination).
+    - after: only variables whose name sorts after it (the previous page's last name)
+    - prefix: name prefix, as a range on the (user_profile_id, name) index
+    - env_name: only variables with a value in that env, and only that value
+    - fields: response fields besides name; leaving out "values" skips the value query
+    Returns (responses, last name of the page if there may be more, else None).
+    """
+    statement = select(
+        db_models.EsvVariable.id,
+        db_models.EsvVariable.name,
+        db_models.EsvVariable.description,
+        db_models.EsvVariable.expressionType
+    ).where(
+        db_models.EsvVariable.user_profile_id == current_user.id
+    ).order_by(db_models.EsvVariable.name)
+
+    if after is not None:
+        statement = statement.where(db_models.EsvVariable.name > after)
+    if prefix:
+        statement = statement.where(db_models.EsvVariable.name >= prefix)
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            statement = statement.where(db_models.EsvVariable.name < upper)
+    if expression_type is not None:
+        statement = statement.where(db_models.EsvVariable.expressionType == expression_type)
+
+    env_ids_by_name = _get_env_ids_by_name(session, current_user)
+    if env_name is not None:
+        if env_name not in env_ids_by_name:
+            raise ValueError(f"Environment '{env_name}' not found for user.")
+        env_ids_by_name = {env_name: env_ids_by_name[env_name]}
+        statement = statement.where(exists().where(
+            db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id,
+            db_models.EsvVariableValue.environment_id == env_ids_by_name[env_name]
+        ))
+    if limit is not None:
+        # One extra row tells whether there is a next page
+        statement = statement.limit(limit + 1)
+
+    rows = session.exec(statement).all()
+    next_after = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_after = rows[-1][1]
+
+    values_by_id: Dict[int, Dict[str, str]] = {var_id: {} for var_id, _, _, _ in rows}
+    if "values" in fields and rows:
+        env_names_by_id = {env_id: name for name, env_id in env_ids_by_name.items()}
+        for chunk in _chunked(list(values_by_id)):
+            value_rows = session.exec(
+                select(
+                    db_models.EsvVariableValue.variable_id,
+                    db_models.EsvVariableValue.environment_id,
+                    db_models.EsvVariableValue.value
+                ).where(
+                    db_models.EsvVariableValue.variable_id.in_(chunk),
+                    db_models.EsvVariableValue.environment_id.in_(list(env_names_by_id))
+                ).order_by(db_models.EsvVariableValue.id)
+            ).all()
+            for var_id, env_id, value in value_rows:
+                values_by_id[var_id][env_names_by_id[env_id]] = value
+
+    responses = []
+    for var_id, name, description, expression_type in rows:
+        selected = {"description": description, "expressionType": expression_type, "values": values_by_id[var_id]}
+        # Only the selected fields are set, so the endpoint can leave the others out
+        responses.append(EsvVariableResponse(
+            name=name,
+            **{field: value for field, value in selected.items() if field in fields}
+        ))
+
+    logger.info(f"Listed {len(responses)} ESV variables for user_id={current_user.id} (more={next_after is not None})")
+    return responses, next_after
+
+def get_variable_matrix(
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, Any]:
+    """
+    The user's variables x environments values in columnar form:
+    {"envs": [env names], "names": [variable names, sorted],
+     "values": [one column per env, aligned with names, None for gaps]}.
+    Built from a single pivot query (one aggregate column per env).
+    """
+    env_ids_by_name = _get_env_ids_by_name(session, current_user)
+    env_names = sorted(env_ids_by_name)
+
+    # At most one value per (variable, env), so MAX() just picks it
+    columns = [
+        func.max(case(
+            (db_models.EsvVariableValue.environment_id == env_ids_by_name[env_name], db_models.EsvVariableValue.value)
+        ))
+        for env_name in env_names
+    ]
+    rows = session.exec(
+        select(db_models.EsvVariable.name, *columns)
+        .outerjoin(db_models.EsvVariableValue, db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id)
+        .where(db_models.EsvVariable.user_profile_id == current_user.id)
+        .group_by(db_models.EsvVariable.id)
+        .order_by(db_models.EsvVariable.name)
+    ).all()
+
+    if rows:
+        names, *values = (list(column) for column in zip(*rows))
+    else:
+        names, values = [], [[] for _ in env_names]
+
+    logger.info(f"Built ESV matrix of {len(names)} variables x {len(env_names)} envs for user_id={current_user.id}")
+    return {"envs": env_names, "names": names, "values": values}
+
 def create_variables_in_db(
     payload: List[EsvVariableCreate],
     session: Session,
     current_user: db_models.UserProfile
 ) -> List[EsvVariableResponse]:
+    """
+    Create ESV variables and their env values in bulk.
+    - Missing variables are created; existing ones keep their metadata.
+    - Values are only added for envs that have none yet.
+    - Unknown envs are skipped.
+    Returns the resulting state of every item that came with values.
+    """
     logger.info(f"Starting create_variables_in_db with {len(payload)} items for user_id={current_user.id}")
-    response = []
 
+    env_ids = _get_env_ids_by_name(session, current_user)
+    names = list(dict.fromkeys(item.name for item in payload))
+    var_ids = {name: row[0] for name, row in _load_variables_by_name(session, current_user, names).items()}
+
+    # ---- VARIABLES ----
+    now = datetime.now(UTC)
+    new_vars: Dict[str, Dict[str, Any]] = {}
     for item in payload:
-        var = session.exec(
-            select(db_models.EsvVariable).where(
-                db_models.EsvVariable.name == item.name,
-                db_models.EsvVariable.user_profile_id == current_user.id
-            )
-        ).first()
-
-        if not var:
-            logger.info(f"Creating new variable: {item.name}")
-            var = db_models.EsvVariable(
-                name=item.name,
-                description=item.description,
-                expressionType=item.expressionType,
-                user_profile_id=current_user.id
-            )
-            session.add(var)
-            session.flush()
+        if item.name not in var_ids and item.name not in new_vars:
+            new_vars[item.name] = {
+                "name": item.name,
+                "description": item.description,
+                "expressionType": item.expressionType,
+                "user_profile_id": current_user.id,
+                "created_at": now,
+                "updated_at": now
+            }
+
+    if new_vars:
+        session.exec(insert(db_models.EsvVariable), params=list(new_vars.values()))
+        created_rows = _load_variables_by_name(session, current_user, list(new_vars))
+        var_ids.update({name: row[0] for name, row in created_rows.items()})
+        logger.info(f"Created {len(new_vars)} new variables")
+
+    # ---- VALUES ----
+    existing_values = _load_values(session, list(var_ids.values()))
+    new_values = []
+    response_ids = []
+    changes = [("create", name, None) for name in new_vars]
 
+    for item in payload:
         if not item.values:
             logger.warning(f"Skipping variable {item.name}: no values provided.")
             continue
 
+        var_id = var_ids[item.name]
         for env_name, value in item.values.items():
-            env = session.exec(
-                select(db_models.Environment).where(
-                    db_models.Environment.name == env_name,
-                    db_models.Environment.user_profile_id == current_user.id
-                )
-            ).first()
-
-            if not env:
+            env_id = env_ids.get(env_name)
+            if env_id is None or (var_id, env_id) in existing_values:
                 continue
 
-            val_obj = session.exec(
-                select(db_models.EsvVariableValue).where(
-                    db_models.EsvVariableValue.variable_id == var.id,
-                    db_models.EsvVariableValue.environment_id == env.id
-                )
-            ).first()
+            new_values.append({"variable_id": var_id, "environment_id": env_id, "value": value})
+            existing_values[(var_id, env_id)] = (None, value)
+            changes.append(("create", item.name, env_id))
 
-            if not val_obj:
-                val_obj = db_models.EsvVariableValue(
-                    variable_id=var.id,
-                    environment_id=env.id,
-                    value=value
-                )
-                session.add(val_obj)
+        response_ids.append(var_id)
 
-        logger.info(f"Finished processing variable: {item.name}")
+    if new_values:
+        session.exec(insert(db_models.EsvVariableValue), params=new_values)
+    logger.info(f"Inserted {len(new_values)} new values")
 
-        response.append(build_esv_variable_response(var, session))
+    record_esv_changes(session, current_user, changes)
+
+    response = _responses_in_order(session, current_user, response_ids)
 
     session.commit()
     logger.info(f"Committed {len(response)} ESV variables for user_id={current_user.id}")
     return response
 
+def clone_env_values_in_db(
+    session: Session,
+    current_user: db_models.UserProfile,
+    source_env_name: str,
+    target_env_name: str,
+    prefix: Optional[str] = None,
+    names: Optional[List[str]] = None,
+    overrides: Optional[Dict[str, str]] = None,
+    overwrite: bool = False
+) -> Dict[str, int]:
+    """
+    Copy the source env's values to the target env, in one transaction.
+    - prefix / names restrict which variables are copied.
+    - overrides (name -> value) are written instead of the source value, also
+      for variables without a source value.
+    - Values the target already has are kept unless overwrite=True.
+    Values are copied server-side: one INSERT ... SELECT (and, with overwrite,
+    one UPDATE) per IN_CHUNK_SIZE variables.
+    Returns counts of copied, overwritten and overridden values.
+    """
+    env_ids = _get_env_ids_by_name(session, current_user)
+    for env_name in (source_env_name, target_env_name):
+        if env_name not in env_ids:
+            raise ValueError(f"Environment '{env_name}' not found for user.")
+    if source_env_name == target_env_name:
+        raise ValueError("Source and target environments must differ.")
+    source_id, target_id = env_ids[source_env_name], env_ids[target_env_name]
+    overrides = overrides or {}
+
+    # ---- PLAN ----
+    source = aliased(db_models.EsvVariableValue)
+    target = aliased(db_models.EsvVariableValue)
+    statement = select(
+        db_models.EsvVariable.id,
+        db_models.EsvVariable.name,
+        target.id,
+        source.value != target.value
+    ).join(
+        source, and_(source.variable_id == db_models.EsvVariable.id, source.environment_id == source_id)
+    ).outerjoin(
+        target, and_(target.variable_id == db_models.EsvVariable.id, target.environment_id == target_id)
+    ).where(db_models.EsvVariable.user_profile_id == current_user.id)
+
+    if prefix:
+        statement = statement.where(db_models.EsvVariable.name.startswith(prefix, autoescape=True))
+    if names is not None:
+        name_chunks = list(_chunked(list(dict.fromkeys(names))))
+        statements = [statement.where(db_models.EsvVariable.name.in_(chunk)) for chunk in name_chunks]
+    else:
+        statements = [statement]
+
+    to_insert, to_overwrite, changes = [], [], []
+    for chunk_statement in statements:
+        for var_id, name, target_value_id, differs in session.exec(chunk_statement):
+            if name in overrides:
+                continue
+            if target_value_id is None:
+                to_insert.append(var_id)
+                changes.append(("create", name, target_id))
+            elif overwrite and differs:
+                to_overwrite.append(var_id)
+                changes.append(("update", name, target_id))
+
+    # ---- COPY ----
+    source_values = select(
+        db_models.EsvVariableValue.variable_id,
+        literal(target_id),
+        db_models.EsvVariableValue.value,
+        db_models.EsvVariableValue.value_hash
+    ).where(db_models.EsvVariableValue.environment_id == source_id)
+    for chunk in _chunked(to_insert):
+        session.exec(insert(db_models.EsvVariableValue).from_select(
+            ["variable_id", "environment_id", "value", "value_hash"],
+            source_values.where(db_models.EsvVariableValue.variable_id.in_(chunk))
+        ))
+
+    source_value = aliased(db_models.EsvVariableValue)
+
+    def from_source(column):
+        return select(column).where(
+            source_value.variable_id == db_models.EsvVariableValue.variable_id,
+            source_value.environment_id == source_id
+        ).scalar_subquery()
+
+    for chunk in _chunked(to_overwrite):
+        session.exec(
+            update(db_models.EsvVariableValue)
+            .where(
+                db_models.EsvVariableValue.environment_id == target_id,
+                db_models.EsvVariableValue.variable_id.in_(chunk)
+            )
+            .values(value=from_source(source_value.value), value_hash=from_source(source_value.value_hash))
+            .execution_options(synchronize_session=False)
+        )
+
+    # ---- OVERRIDES ----
+    overridden = 0
+    if overrides:
+        variables = _load_variables_by_name(session, current_user, list(overrides))
+        existing_values = _load_values(session, [row[0] for row in variables.values()])
+        new_values, value_updates = [], []
+        for name, value in overrides.items():
+            row = variables.get(name)
+            if row is None:
+                logger.warning(f"Override for unknown variable {name}. Skipping.")
+                continue
+            existing = existing_values.get((row[0], target_id))
+            if existing is None:
+                new_values.append({"variable_id": row[0], "environment_id": target_id, "value": value})
+                changes.append(("create", name, target_id))
+            elif overwrite and existing[1] != value:
+                value_updates.append({"id": existing[0], "value": value, "value_hash": value_hash(value)})
+                changes.append(("update", name, target_id))
+        if new_values:
+            session.exec(insert(db_models.EsvVariableValue), params=new_values)
+        if value_updates:
+            session.exec(update(db_models.EsvVariableValue), params=value_updates)
+        overridden = len(new_values) + len(value_updates)
+
+    record_esv_changes(session, current_user, changes)
+    session.commit()
+
+    counts = {"copied": len(to_insert), "overwritten": len(to_overwrite), "overridden": overridden}
+    logger.info(f"Cloned values {source_env_name} -> {target_env_name} for user_id={current_user.id}: {counts}")
+    return counts
+
+def compare_envs_in_db(
+    session: Session,
+    current_user: db_models.UserProfile,
+    left_env_name: str,
+    right_env_name: str,
+    limit: Optional[int] = None,
+    after: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Variables whose values differ between two envs, ordered by name:
+    {"name", "status": "missing_left" | "missing_right" | "different", "left", "right"}.
+    Computed in the DB by joining the two envs' value rows on the variable,
+    so identical values never leave it. With `limit`, at most limit + 1 rows
+    are read (the extra one tells whether there is a next page).
+    Env lookup happens right away; rows are fetched while iterating.
+    """
+    env_ids = _get_env_ids_by_name(session, current_user)
+    for env_name in (left_env_name, right_env_name):
+        if env_name not in env_ids:
+            raise ValueError(f"Environment '{env_name}' not found for user.")
+
+    left = aliased(db_models.EsvVariableValue)
+    right = aliased(db_models.EsvVariableValue)
+    statement = select(
+        db_models.EsvVariable.name,
+        left.id,
+        left.value,
+        right.id,
+        right.value
+    ).outerjoin(
+        left, and_(left.variable_id == db_models.EsvVariable.id, left.environment_id == env_ids[left_env_name])
+    ).outerjoin(
+        right, and_(right.variable_id == db_models.EsvVariable.id, right.environment_id == env_ids[right_env_name])
+    ).where(
+        db_models.EsvVariable.user_profile_id == current_user.id,
+        or_(
+            and_(left.id.is_(None), right.id.is_not(None)),
+            and_(left.id.is_not(None), right.id.is_(None)),
+            left.value != right.value
+        )
+    ).order_by(db_models.EsvVariable.name)
+
+    if after is not None:
+        statement = statement.where(db_models.EsvVariable.name > after)
+    if limit is not None:
+        statement = statement.limit(limit + 1)
+
+    def rows():
+        for name, left_id, left_value, right_id, right_value in session.exec(statement.execution_options(yield_per=1000)):
+            if left_id is None:
+                status = "missing_left"
+            elif right_id is None:
+                status = "missing_right"
+            else:
+                status = "different"
+            yield {"name": name, "status": status, "left": left_value, "right": right_value}
+
+    return rows()
+
+def upsert_variables_in_db(
+    payload: List[EsvVariableCreate],
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, int]:
+    """
+    Create or overwrite ESV variables and their env values in bulk, in one
+    transaction: the bulk write path behind imports.
+    - Metadata and values are set to the payload's; nothing is deleted.
+    - Only rows that actually change are written (and logged as changes).
+    - Unknown envs are skipped; for repeated names the last item wins.
+    Returns counts of written variables and values.
+    """
+    items = {item.name: item for item in payload}
+    env_ids = _get_env_ids_by_name(session, current_user)
+    variables = _load_variables_by_name(session, current_user, list(items))
+    existing_values = _load_values(session, [row[0] for row in variables.values()])
+
+    # ---- VARIABLES ----
+    now = datetime.now(UTC)
+    new_vars, var_updates, changes = [], [], []
+    for name, item in items.items():
+        row = variables.get(name)
+        if row is None:
+            new_vars.append({
+                "name": name,
+                "description": item.description,
+                "expressionType": item.expressionType,
+                "user_profile_id": current_user.id,
+                "created_at": now,
+                "updated_at": now
+            })
+            changes.append(("create", name, None))
+        elif (row[1], row[2]) != (item.description, item.expressionType):
+            var_updates.append({
+                "id": row[0],
+                "description": item.description,
+                "expressionType": item.expressionType,
+                "content_hash": metadata_hash(item.description, item.expressionType),
+                "updated_at": now
+            })
+            changes.append(("update", name, None))
+
+    if new_vars:
+        session.exec(insert(db_models.EsvVariable), params=new_vars)
+        variables.update(_load_variables_by_name(session, current_user, [var["name"] for var in new_vars]))
+    if var_updates:
+        session.exec(update(db_models.EsvVariable), params=var_updates)
+
+    # ---- VALUES ----
+    new_values, value_updates = [], []
+    for name, item in items.items():
+        var_id = variables[name][0]
+        for env_name, value in (item.values or {}).items():
+            env_id = env_ids.get(env_name)
+            if env_id is None:
+                continue
+            existing = existing_values.get((var_id, env_id))
+            if existing is None:
+                new_values.append({"variable_id": var_id, "environment_id": env_id, "value": value})
+                changes.append(("create", name, env_id))
+            elif existing[1] != value:
+                value_updates.append({"id": existing[0], "value": value, "value_hash": value_hash(value)})
+                changes.append(("update", name, env_id))
+
+    if new_values:
+        session.exec(insert(db_models.EsvVariableValue), params=new_values)
+    if value_updates:
+        session.exec(update(db_models.EsvVariableValue), params=value_updates)
+
+    record_esv_changes(session, current_user, changes)
+    session.commit()
+
+    counts = {
+        "variables_created": len(new_vars),
+        "variables_updated": len(var_updates),
+        "values_created": len(new_values),
+        "values_updated": len(value_updates)
+    }
+    logger.info(f"Upserted {len(items)} ESV variables for user_id={current_user.id}: {counts}")
+    return counts
+
 def update_variables_in_db(
     payload: List[EsvVariableUpdate],
     session: Session,
     current_user: db_models.UserProfile
 ) -> List[EsvVariableResponse]:
+    """
+    Update ESV variables and their existing env values in bulk.
+    - Unknown variables and envs are skipped.
+    - Values are only updated, never created (use create instead).
+    Returns the resulting state of every variable found.
+    """
     logger.info(f"Starting update_variables_in_db with {len(payload)} items for user_id={current_user.id}")
-    response = []
 
-    for item in payload:
-        var = session.exec(
-            select(db_models.EsvVariable).where(
-                db_models.EsvVariable.name == item.name,
-                db_models.EsvVariable.user_profile_id == current_user.id
-            )
-        ).first()
+    env_ids = _get_env_ids_by_name(session, current_user)
+    names = list(dict.fromkeys(item.name for item in payload))
+    variables = _load_variables_by_name(session, current_user, names)
+    existing_values = _load_values(session, [row[0] for row in variables.values()])
 
-        if not var:
+    var_updates: Dict[int, Dict[str, Any]] = {}
+    value_updates: Dict[int, Dict[str, Any]] = {}
+    response_ids = []
+    changes = []
+
+    for item in payload:
+        row = variables.get(item.name)
+        if not row:
             logger.warning(f"Variable {item.name} not found. Skipping.")
             continue
 
+        var_id = row[0]
+
         # Update base fields
+        fields = {}
         if item.description is not None:
-            var.description = item.description
+            fields["description"] = item.description
         if item.expressionType is not None:
-            var.expressionType = item.expressionType
+            fields["expressionType"] = item.expressionType
+        if fields:
+            var_updates.setdefault(var_id, {"id": var_id}).update(fields)
+            changes.append(("update", item.name, None))
+
+        for env_name, new_value in (item.values or {}).items():
+            env_id = env_ids.get(env_name)
+            if env_id is None:
+                logger.warning(f"Environment {env_name} not found for user. Skipping value.")
+                continue
 
-        if item.values:
-            for env_name, new_value in item.values.items():
-                env = session.exec(
-                    select(db_models.Environment).where(
-                        db_models.Environment.name == env_name,
-                        db_models.Environment.user_profile_id == current_user.id
-                    )
-                ).first()
-
-                if not env:
-                    logger.warning(f"Environment {env_name} not found for user. Skipping value.")
-                    continue
+            existing = existing_values.get((var_id, env_id))
+            if existing is None:
+                logger.warning(f"Value for env {env_name} does not exist for variable {item.name}. Skipping. Please use create instead.")
+                continue
 
-                val_obj = session.exec(
-                    select(db_models.EsvVariableValue).where(
-                        db_models.EsvVariableValue.variable_id == var.id,
-                        db_models.EsvVariableValue.environment_id == env.id
-                    )
-                ).first()
-
-                if val_obj:
-                    val_obj.value = new_value
-                else:
-                    logger.warning(f"Value for env {env_name} does not exist for variable {item.name}. Skipping. Please use create instead.")
-                    continue
+            value_updates[existing[0]] = {"id": existing[0], "value": new_value, "value_hash": value_hash(new_value)}
+            changes.append(("update", item.name, env_id))
+
+        response_ids.append(var_id)
 
-        logger.info(f"Updated variable: {item.name}")
+    # Stored hashes cover the merged metadata, not just the fields sent
+    rows_by_id = {row[0]: row for row in variables.values()}
+    for var_id, fields in var_updates.items():
+        _, description, expression_type = rows_by_id[var_id]
+        fields["content_hash"] = metadata_hash(
+            fields.get("description", description),
+            fields.get("expressionType", expression_type)
+        )
+
+    if var_updates:
+        session.exec(update(db_models.EsvVariable), params=list(var_updates.values()))
+    if value_updates:
+        session.exec(update(db_models.EsvVariableValue), params=list(value_updates.values()))
+    logger.info(f"Updated {len(var_updates)} variables and {len(value_updates)} values")
 
-        response.append(build_esv_variable_response(var, session))
+    record_esv_changes(session, current_user, changes)
+
+    response = _responses_in_order(session, current_user, response_ids)
 
     session.commit()
     logger.info(f"Committed {len(response)} updated ESV variables for user_id={current_user.id}")
@@ -494,69 +897,79 @@ def delete_variables_in_db(
     - If 'values' is provided, delete only those env values.
     - If no remaining values, delete the variable too.
     - If no 'values', delete the entire variable.
+    Deletes are set-based: one DELETE per chunk of (variable, env) pairs,
+    then one DELETE of the touched variables left without values.
     """
     logger.info(f"Starting delete_variables_in_db with {len(payload)} items for user_id={current_user.id}")
-    response = []
 
-    for item in payload:
-        var = session.exec(
-            select(db_models.EsvVariable).where(
-                db_models.EsvVariable.name == item.name,
-                db_models.EsvVariable.user_profile_id == current_user.id
-            )
-        ).first()
+    env_ids = _get_env_ids_by_name(session, current_user)
+    names = list(dict.fromkeys(item.name for item in payload))
+    variables = _load_variables_by_name(session, current_user, names)
+
+    value_pairs = set()
+    whole_var_ids = set()
+    touched_ids = []
+    changes = []
 
-        if not var:
+    for item in payload:
+        row = variables.get(item.name)
+        if not row:
             logger.warning(f"Variable {item.name} not found. Skipping.")
             continue
 
-        # Delete only specified env values if provided
+        var_id = row[0]
         if item.values:
+            # Delete only specified env values
             for env_name in item.values.keys():
-                env = session.exec(
-                    select(db_models.Environment).where(
-                        db_models.Environment.name == env_name,
-                        db_models.Environment.user_profile_id == current_user.id
-                    )
-                ).first()
-
-                if not env:
+                env_id = env_ids.get(env_name)
+                if env_id is None:
                     logger.warning(f"Environment {env_name} not found. Skipping.")
                     continue
-
-                val_obj = session.exec(
-                    select(db_models.EsvVariableValue).where(
-                        db_models.EsvVariableValue.variable_id == var.id,
-                        db_models.EsvVariableValue.environment_id == env.id
-                    )
-                ).first()
-
-                if val_obj:
-                    session.delete(val_obj)
-                    logger.info(f"Deleted value for variable {item.name} in env {env_name}.")
-                else:
-                    logger.info(f"No value to delete for variable {item.name} in env {env_name}.")
-
+                value_pairs.add((var_id, env_id))
+                changes.append(("delete", item.name, env_id))
         else:
             # No envs specified → delete entire variable + its values
-            for val in var.values:
-                session.delete(val)
-                logger.info(f"Deleted value for variable {item.name} in env_id={val.environment_id}.")
-
-        # After value deletes, check if variable has any remaining values
-        remaining_values = session.exec(
-            select(db_models.EsvVariableValue).where(
-                db_models.EsvVariableValue.variable_id == var.id
-            )
-        ).all()
-
-        if not remaining_values:
-            session.delete(var)
-            logger.info(f"Deleted variable {item.name} because no remaining values.")
-
-        # Prepare response with what remains (if any)
-        if remaining_values:
-            response.append(build_esv_variable_response(var, session))
+            whole_var_ids.add(var_id)
+            changes.append(("delete", item.name, None))
+
+        touched_ids.append(var_id)
+
+    deleted_values = 0
+    # Two bound parameters per pair
+    for chunk in _chunked(sorted(value_pairs), IN_CHUNK_SIZE // 2):
+        deleted_values += session.exec(
+            delete(db_models.EsvVariableValue).where(
+                tuple_(
+                    db_models.EsvVariableValue.variable_id,
+                    db_models.EsvVariableValue.environment_id
+                ).in_(chunk)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+
+    for chunk in _chunked(sorted(whole_var_ids)):
+        deleted_values += session.exec(
+            delete(db_models.EsvVariableValue).where(
+                db_models.EsvVariableValue.variable_id.in_(chunk)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+
+    # Variables with no remaining values go too
+    deleted_vars = 0
+    for chunk in _chunked(list(dict.fromkeys(touched_ids))):
+        deleted_vars += session.exec(
+            delete(db_models.EsvVariable).where(
+                db_models.EsvVariable.id.in_(chunk),
+                ~exists().where(db_models.EsvVariableValue.variable_id == db_models.EsvVariable.id)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+
+    logger.info(f"Deleted {deleted_values} values and {deleted_vars} variables with no remaining values")
+
+    if deleted_values or deleted_vars:
+        record_esv_changes(session, current_user, changes)
+
+    # Prepare response with what remains (if any)
+    response = _responses_in_order(session, current_user, touched_ids)
 
     session.commit()
     logger.info(f"Committed ESV deletes for user_id={current_user.id}")
@@ -569,22 +982,37 @@ def apply_pull_from_source(
     """
     Sync DB to match local source for all envs.
     1. Diff source vs DB
-    2. Apply create, update, delete actions
+    2. Apply create, update, delete actions in chunks of ESV_PULL_CHUNK_SIZE
+       variables, each committed on its own so other writes can interleave
+       (a failed pull leaves the earlier chunks applied; pulling again
+       picks up the rest)
     3. Return summary
+    Progress is reported to the job running the pull, if any.
     """
     logger.info(f"Starting apply_pull_from_source for user_id={current_user.id}")
 
     diff_result = diff_source_vs_db_all_envs(session, current_user)
-    logger.info(f"Diff result: {diff_result}")
+    logger.info(f"Diff result: {summarize_diff(diff_result)}")
 
-    created, updated, deleted = [], [], []
+    progress = {
+        action: {"done": 0, "total": count}
+        for action, count in summarize_diff(diff_result).items()
+    }
+    update_job_progress(progress)
+
+    def apply_in_chunks(action, payload, writer):
+        applied = []
+        for chunk in _chunked(payload, settings.ESV_PULL_CHUNK_SIZE):
+            applied.extend(writer(chunk, session, current_user))
+            progress[action]["done"] += len(chunk)
+            update_job_progress(progress)
+        return applied
 
     # ---- CREATE ----
     create_payload = [
         EsvVariableCreate(**item) for item in diff_result.get("create", [])
     ]
-    if create_payload:
-        created = create_variables_in_db(create_payload, session, current_user)
+    created = apply_in_chunks("create", create_payload, create_variables_in_db)
 
     # ---- UPDATE ----
     update_payload = []
@@ -618,15 +1046,13 @@ def apply_pull_from_source(
             values=cleaned_values or None
         ))
 
-    if update_payload:
-        updated = update_variables_in_db(update_payload, session, current_user)
+    updated = apply_in_chunks("update", update_payload, update_variables_in_db)
 
     # ---- DELETE ----
     delete_payload = [
         EsvVariableDelete(**item) for item in diff_result.get("delete", [])
     ]
-    if delete_payload:
-        deleted = delete_variables_in_db(delete_payload, session, current_user)
+    deleted = apply_in_chunks("delete", delete_payload, delete_variables_in_db)
 
     result = {
         "created": [v.model_dump() for v in created],
@@ -637,22 +1063,33 @@ def apply_pull_from_source(
     logger.info(f"apply_pull_from_source done for user_id={current_user.id}")
     return result
 
-def apply_push_to_source(
+def frodo_env_data(env: db_models.Environment) -> Dict[str, Any]:
+    """Connection details the core.frodo.sync_esv cloud functions take as env_data."""
+    return {
+        "frodo_path": env.frodo,
+        "platform_url": env.platformUrl,
+        "proxy": env.proxy,
+        # Used to follow the tenant restart when applies run asynchronously
+        "service_account_id": env.serviceAccountID,
+        "service_account_jwk": env.serviceAccountJWK,
+        "scope": env.scope,
+        "exp_seconds": env.expSeconds
+    }
+
+def plan_push_to_source(
     env_name: str,
     session: Session,
-    current_user: db_models.UserProfile
+    current_user: db_models.UserProfile,
+    revision: Optional[int] = None
 ) -> Dict[str, Any]:
     """
-    Sync the source (local repo/cloud) to match the DB for the specified env.
-    1. Diff DB vs Source
-    2. Apply create, update, delete actions for the given env
-    3. Return summary of actions
+    Diff DB vs Source for the env and return what a push has to do: the
+    variables to create, update and delete, and the revision and source
+    fingerprint the watermark moves to once they are all applied.
+    Only the variables changed since the env's push watermark are diffed when
+    the source is unchanged since then, otherwise the whole env.
+    Reads only; pass `revision` to plan several envs against the same one.
     """
-    logger.info(f"Starting apply_push_to_source for user_id={current_user.id} for env={env_name}")
-
-    diff_result = diff_db_vs_source_all_envs(session, current_user)
-    logger.info(f"Diff result: {diff_result}")
-
     env = session.exec(
         select(db_models.Environment).where(
             db_models.Environment.name == env_name,
@@ -663,14 +1100,21 @@ def apply_push_to_source(
     if not env:
         raise ValueError(f"Environment '{env_name}' not found for user.")
 
-    # Build env_data
-    env_data = {
-        "frodo_path": env.frodo,
-        "platform_url": env.platformUrl,
-        "proxy": env.proxy
-    }
-
-    created, updated, deleted = [], [], []
+    # Read before planning: writes made while the push runs stay above the watermark
+    if revision is None:
+        revision = get_esv_revision(session, current_user)
+    fingerprint = str(source_fingerprint(env.name))
+    watermark = get_push_watermark(session, current_user, env)
+
+    if watermark is not None and watermark.source_fingerprint == fingerprint:
+        # Variables untouched since the watermark already match the source
+        mode = "incremental"
+        names = changed_names_since(session, current_user, env, watermark.revision)
+        diff_result = diff_db_vs_source_for_env(session, current_user, env, names=names)
+    else:
+        mode = "full"
+        diff_result = diff_db_vs_source_for_env(session, current_user, env)
+    logger.info(f"Diff result ({mode}) for env={env_name}: {summarize_diff(diff_result)}")
 
     # ---- CREATE ----
     create_dict: Dict[str, EsvVariablePerEnv] = {}
@@ -682,9 +1126,6 @@ def apply_push_to_source(
                 expressionType=item.get("expressionType", "string"),
                 value=values[env.name]
             )
-    if create_dict:
-        success = add_variables_to_source(env.name, env_data, create_dict)
-        created.append({"env": env.name, "success": success, "count": len(create_dict)})
 
     # ---- UPDATE ----
     update_dict: Dict[str, EsvVariablePerEnv] = {}
@@ -699,9 +1140,6 @@ def apply_push_to_source(
                 else item["expressionType"].get("new", "string"),
                 value=values[env.name]["new"] if isinstance(values[env.name], dict) else values[env.name]
             )
-    if update_dict:
-        success = update_variables_to_source(env.name, env_data, update_dict)
-        updated.append({"env": env.name, "success": success, "count": len(update_dict)})
 
     # ---- DELETE ----
     delete_dict: Dict[str, EsvVariablePerEnv] = {}
@@ -709,15 +1147,118 @@ def apply_push_to_source(
         values = item.get("values", {})
         if not values or env.name in values:
             delete_dict[item["name"]] = EsvVariablePerEnv()
+
+    return {
+        "env": env,
+        "env_name": env.name,
+        "env_data": frodo_env_data(env),
+        "mode": mode,
+        "revision": revision,
+        "fingerprint": fingerprint,
+        "watermark_revision": watermark.revision if watermark else None,
+        "create": create_dict,
+        "update": update_dict,
+        "delete": delete_dict
+    }
+
+def execute_push_plan(plan: Dict[str, Any], apply_async: bool = True) -> Dict[str, Any]:
+    """
+    Apply a push plan to the source: create, update, one apply, delete.
+    Uses no DB session, so plans for different envs can run concurrently.
+    With apply_async=False the apply is waited for even when ESV_APPLY_ASYNC is on.
+    """
+    env_name, env_data = plan["env_name"], plan["env_data"]
+    create_dict, update_dict, delete_dict = plan["create"], plan["update"], plan["delete"]
+    created, updated, deleted = [], [], []
+
+    if create_dict:
+        success = add_variables_to_source(env_name, env_data, create_dict, apply=False)
+        created.append({"env": env_name, "success": success, "count": len(create_dict)})
+
+    if update_dict:
+        success = update_variables_to_source(env_name, env_data, update_dict, apply=False)
+        updated.append({"env": env_name, "success": success, "count": len(update_dict)})
+
+    # ---- APPLY ----
+    # One (debounced) apply covers both the creates and the updates
+    applied = []
+    if create_dict or update_dict:
+        success = apply_variables_to_source(env_name, env_data, apply_async=apply_async)
+        applied.append({"env": env_name, "success": success})
+
     if delete_dict:
-        success = delete_variables_to_source(env.name, env_data, delete_dict)
-        deleted.append({"env": env.name, "success": success, "count": len(delete_dict)})
+        success = delete_variables_to_source(env_name, env_data, delete_dict)
+        deleted.append({"env": env_name, "success": success, "count": len(delete_dict)})
 
-    result = {
+    return {
+        "mode": plan["mode"],
         "created": created,
         "updated": updated,
-        "deleted": deleted
+        "deleted": deleted,
+        "applied": applied
     }
 
+def finish_push(
+    plan: Dict[str, Any],
+    result: Dict[str, Any],
+    session: Session,
+    current_user: db_models.UserProfile
+) -> bool:
+    """
+    Move the env's watermark if every step of the push succeeded. With the
+    apply still running asynchronously, it only moves once the restart has
+    succeeded; until then the next push stays a full or wider incremental one.
+    """
+    steps = result["created"] + result["updated"] + result["applied"] + result["deleted"]
+    if all(step["success"] for step in steps):
+        env_id, user_id = plan["env"].id, current_user.id
+        if on_deferred_resolved(
+            lambda applied: _set_watermark_after_apply(user_id, env_id, plan["revision"], plan["fingerprint"], applied)
+        ):
+            logger.info(f"Watermark for env={plan['env_name']} moves once the apply completes")
+        else:
+            set_push_watermark(session, current_user, plan["env"], plan["revision"], plan["fingerprint"])
+        return True
+
+    logger.warning(f"Push to env={plan['env_name']} incomplete, watermark stays at {plan['watermark_revision']}")
+    return False
+
+def _set_watermark_after_apply(
+    user_id: int,
+    env_id: int,
+    revision: int,
+    fingerprint: str,
+    applied: bool
+) -> None:
+    # Runs on the apply status poller's thread, after the request session is gone
+    if not applied:
+        logger.warning(f"Apply failed for env_id={env_id}, watermark not moved")
+        return
+
+    with Session(db.engine) as session:
+        env = session.get(db_models.Environment, env_id)
+        user = session.get(db_models.UserProfile, user_id)
+        if env is None or user is None:
+            return
+        set_push_watermark(session, user, env, revision, fingerprint)
+
+def apply_push_to_source(
+    env_name: str,
+    session: Session,
+    current_user: db_models.UserProfile
+) -> Dict[str, Any]:
+    """
+    Sync the source (local repo/cloud) to match the DB for the specified env.
+    1. Diff DB vs Source (see plan_push_to_source)
+    2. Apply create, update, delete actions for the given env
+    3. Move the watermark once every action succeeded
+    4. Return summary of actions
+    """
+    logger.info(f"Starting apply_push_to_source for user_id={current_user.id} for env={env_name}")
+
+    plan = plan_push_to_source(env_name, session, current_user)
+    result = execute_push_plan(plan)
+    finish_push(plan, result, session, current_user)
+
     logger.info(f"Finished apply_push_to_source for user_id={current_user.id} env={env_name}")
-    return result
\ No newline at end of file
+    return result
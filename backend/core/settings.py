@@ -1,6 +1,7 @@
 # core/settings.py
 from pydantic_settings import BaseSettings
 from pathlib import Path
+import os
 
 class Settings(BaseSettings):
     # Frontend
@@ -23,6 +24,32 @@ class Settings(BaseSettings):
     # PAIC repository
     PAIC_CONFIG_PATH: str
     PAIC_CONFIG_BRANCH_NAME: str
+    ESV_FILE_CACHE_SIZE: int = 20000
+    ESV_LOADER_WORKERS: int = min(8, os.cpu_count() or 1)
+    ESV_LOADER_PARALLEL_MIN_FILES: int = 256
+    ESV_SOURCE_WATCHER: str = "off"  # off, auto, inotify, poll
+    ESV_SOURCE_POLL_SECONDS: float = 2.0
+    ESV_PLAN_CACHE_SIZE: int = 256
+    ESV_PULL_CHUNK_SIZE: int = 500  # variables per committed transaction during a pull
+    ESV_IMPORT_CHUNK_SIZE: int = 1000  # variables per committed transaction during an import
+    ESV_PUSH_MAX_WORKERS: int = 4  # env pushes running at once, across all push-many jobs
+    ESV_PUSH_PER_TENANT: int = 1  # env pushes running at once against one tenant
+    ESV_DRIFT_WORKERS: int = 4  # live tenant exports running at once during a drift check
+
+    # ESV apply
+    ESV_APPLY_DEBOUNCE_SECONDS: float = 5.0
+    ESV_APPLY_MAX_WAIT_SECONDS: float = 60.0
+    ESV_APPLY_ASYNC: bool = False
+    ESV_APPLY_POLL_INITIAL_SECONDS: float = 15.0
+    ESV_APPLY_POLL_MAX_SECONDS: float = 120.0
+    ESV_APPLY_TIMEOUT_SECONDS: float = 1800.0
+
+    # Retries & circuit breaker for frodo / PAIC calls
+    RETRY_MAX_ATTEMPTS: int = 4
+    RETRY_BACKOFF_BASE_SECONDS: float = 1.0
+    RETRY_BACKOFF_MAX_SECONDS: float = 30.0
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_BREAKER_RESET_SECONDS: float = 60.0
 
     class Config:
         env_file = Path(__file__).resolve().parent.parent / ".env"
@@ -64,4 +64,6 @@ else:
         allow_credentials=True,
         allow_methods=["*"], 
         allow_headers=["*"],
+        # Paging cursor and ETag (for If-None-Match) are read by the client
+        expose_headers=["X-Next-Cursor", "ETag"],
     )
@@ -3,7 +3,17 @@ import uuid
 from sqlmodel import SQLModel, Field, Relationship, UniqueConstraint
 from typing import Optional, List
 from datetime import datetime, UTC
-from sqlalchemy import Column, JSON, String
+from sqlalchemy import Column, Index, JSON, String
+from core.esv_hash import metadata_hash, value_hash
+
+# Insert defaults for the content hashes, computed from the row being inserted
+# (ORM adds and bulk insert() alike). Updates must set the hash explicitly.
+def _default_content_hash(context) -> str:
+    params = context.get_current_parameters()
+    return metadata_hash(params.get("description"), params.get("expressionType"))
+
+def _default_value_hash(context) -> str:
+    return value_hash(context.get_current_parameters().get("value"))
 
 class IdentityUser(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -51,6 +61,7 @@ class EsvVariable(SQLModel, table=True):
     name: str = Field(index=True)
     description: Optional[str] = None
     expressionType: str
+    content_hash: Optional[str] = Field(default=None, sa_column=Column(String, default=_default_content_hash))
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
@@ -59,11 +70,16 @@ class EsvVariable(SQLModel, table=True):
     user_profile: Optional[UserProfile] = Relationship(back_populates="esv_variables")
     values: List["EsvVariableValue"] = Relationship(back_populates="variable")
 
-    __table_args__ = (UniqueConstraint("name", "user_profile_id"),)
+    __table_args__ = (
+        UniqueConstraint("name", "user_profile_id"),
+        # Keyset pagination / prefix ranges on name within a user
+        Index("ix_esvvariable_user_name", "user_profile_id", "name"),
+    )
 
 class EsvVariableValue(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     value: str
+    value_hash: Optional[str] = Field(default=None, sa_column=Column(String, default=_default_value_hash))
 
     variable_id: int = Field(foreign_key="esvvariable.id")
     environment_id: int = Field(foreign_key="environment.id")
@@ -73,6 +89,39 @@ class EsvVariableValue(SQLModel, table=True):
 
     __table_args__ = (UniqueConstraint("variable_id", "environment_id"),)
 
+class UserRevision(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    esv_revision: int = 0  # bumped on every ESV variable/value write
+    env_revision: int = 0  # bumped on every environment write
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    user_profile_id: int = Field(foreign_key="userprofile.id", unique=True)
+
+# Append-only record of ESV writes; revision is the user's esv_revision after the write
+class EsvChangeLog(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    revision: int
+    action: str  # create, update, delete
+    variable_name: str
+    environment_id: Optional[int] = None  # None: variable metadata / whole variable
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    user_profile_id: int = Field(foreign_key="userprofile.id")
+
+    __table_args__ = (Index("ix_esvchangelog_user_revision", "user_profile_id", "revision"),)
+
+# ESV revision and source fingerprint an env was last successfully pushed at
+class EsvPushWatermark(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    revision: int
+    source_fingerprint: str
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+    user_profile_id: int = Field(foreign_key="userprofile.id")
+    environment_id: int = Field(foreign_key="environment.id")
+
+    __table_args__ = (UniqueConstraint("user_profile_id", "environment_id"),)
+
 class Job(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     job_id: str = Field(
@@ -80,8 +129,10 @@ class Job(SQLModel, table=True):
         sa_column=Column("job_id", String, unique=True, nullable=False)
     )
     job_type: str  # e.g., 'push', 'pull'
-    status: str = Field(default="pending")  # pending, running, success, failed
+    status: str = Field(default="pending")  # pending, running, applying, success, failed
     result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    progress: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    parent_job_id: Optional[str] = Field(default=None, index=True)  # set on the per-env jobs of a fan-out
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
@@ -1,5 +1,5 @@
 # models/env_models.py
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 
 class EnvironmentCreate(BaseModel):
@@ -19,4 +19,10 @@ class EnvironmentUpdate(BaseModel):
     serviceAccountJWK: Optional[dict] = None
     expSeconds: Optional[int] = None
     scope: Optional[str] = None
-    proxy: Optional[str] = None
\ No newline at end of file
+    proxy: Optional[str] = None
+
+class EnvironmentCloneValues(BaseModel):
+    prefix: Optional[str] = None  # only variables whose name starts with this
+    names: Optional[List[str]] = None  # only these variables
+    overrides: Optional[Dict[str, str]] = None  # variable name -> value to use instead of the source's
+    overwrite: bool = False  # replace values the target env already has
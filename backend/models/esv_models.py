@@ -1,12 +1,12 @@
 # models/esv.models.py
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 class EsvVariableResponse(BaseModel):
     name: str
-    description: Optional[str]
-    expressionType: Optional[str]
-    values: Optional[Dict[str, str]]
+    description: Optional[str] = None
+    expressionType: Optional[str] = None
+    values: Optional[Dict[str, str]] = None
 
 class EsvVariableCreate(BaseModel):
     name: str
@@ -29,4 +29,8 @@ class EsvVariableDelete(BaseModel):
 class EsvVariablePerEnv(BaseModel):
     description: Optional[str] = None
     expressionType: Optional[str] = None
-    value: Optional[str] = None
\ No newline at end of file
+    value: Optional[str] = None
+
+class EsvPushMany(BaseModel):
+    envs: List[str]  # pushed concurrently from one DB snapshot
+    verify: bool = False  # check every tenant for drift afterwards
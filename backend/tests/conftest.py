@@ -4,9 +4,38 @@ This adds your backend root folder to sys.path so your tests can
 import core.*, api.*, models.* etc. cleanly without ModuleNotFoundError.
 """
 
+import os
 import sys
+import tempfile
 from pathlib import Path
 
 # Resolve backend/ folder and add it to sys.path
 BACKEND_DIR = Path(__file__).resolve().parent.parent
-sys.path.insert(0, str(BACKEND_DIR))
\ No newline at end of file
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Fallback settings so unit tests can import core.settings without a .env file.
+# Values from the environment or backend/.env still take precedence.
+_TEST_DIR = tempfile.mkdtemp(prefix="frodo-web-tests-")
+for _key, _value in {
+    "FRONTEND_ORIGIN": "http://localhost:3000",
+    "FRONTEND_BUILD_DIR": _TEST_DIR,
+    "UVICORN_MODE": "development",
+    "USER_FILE": os.path.join(_TEST_DIR, "users.json"),
+    "DATABASE_FOLDER": _TEST_DIR,
+    "DATABASE_URL": "sqlite:///" + os.path.join(_TEST_DIR, "test.db"),
+    "TOKEN_ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "15",
+    "ACCESS_TOKEN_SECRET_KEY": "test-access-secret",
+    "REFRESH_TOKEN_EXPIRE_MINUTES": "60",
+    "REFRESH_TOKEN_SECRET_KEY": "test-refresh-secret",
+    "PAIC_CONFIG_PATH": os.path.join(_TEST_DIR, "paic-config"),
+    "PAIC_CONFIG_BRANCH_NAME": "main",
+    # Otherwise core.security writes a .fernet.key into the working directory
+    "FERNET_KEY": "dGVzdC1mZXJuZXQta2V5LTMyLWJ5dGVzLWxvbmchISE=",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+# Keep test log output out of the repo's logs/ folder
+from core import logger as _app_logger
+_app_logger.LOG_DIR = os.path.join(_TEST_DIR, "logs")
+_app_logger.LOG_FILE = os.path.join(_app_logger.LOG_DIR, "app.log")
@@ -0,0 +1,136 @@
+# tests/frodo/test_apply_coordinator.py
+import threading
+import time
+
+import pytest
+
+from core.frodo import sync_esv
+from core.frodo.apply_coordinator import ApplyCoordinator
+from core import job
+from core.job import current_job_id_ctx_var
+from core.settings import settings
+
+def test_requests_within_window_share_one_apply():
+    coordinator = ApplyCoordinator(debounce_seconds=0.2, max_wait_seconds=5)
+    runs = []
+
+    def apply_fn():
+        runs.append(time.monotonic())
+        return True
+
+    futures = [coordinator.request_apply("tenant", "SBX", apply_fn) for _ in range(5)]
+
+    assert all(f.result(timeout=5) is True for f in futures)
+    assert len(runs) == 1
+
+def test_different_tenants_apply_independently():
+    coordinator = ApplyCoordinator(debounce_seconds=0.05, max_wait_seconds=1)
+    runs = []
+
+    sbx = coordinator.request_apply("sbx", "SBX", lambda: runs.append("SBX") or True)
+    prod = coordinator.request_apply("prod", "PROD", lambda: runs.append("PROD") or False)
+
+    assert sbx.result(timeout=5) is True
+    assert prod.result(timeout=5) is False
+    assert sorted(runs) == ["PROD", "SBX"]
+
+def test_request_during_running_apply_gets_a_new_batch():
+    coordinator = ApplyCoordinator(debounce_seconds=0.05, max_wait_seconds=1)
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def slow_apply():
+        runs.append("slow")
+        started.set()
+        release.wait(5)
+        return True
+
+    first = coordinator.request_apply("tenant", "SBX", slow_apply)
+    assert started.wait(5)
+
+    second = coordinator.request_apply("tenant", "SBX", lambda: runs.append("fast") or True)
+    release.set()
+
+    assert first.result(timeout=5) is True
+    assert second.result(timeout=5) is True
+    assert runs == ["slow", "fast"]
+
+def test_apply_exception_propagates_to_every_contributor():
+    coordinator = ApplyCoordinator(debounce_seconds=0.05, max_wait_seconds=1)
+
+    def boom():
+        raise RuntimeError("tenant unreachable")
+
+    futures = [coordinator.request_apply("tenant", "SBX", boom) for _ in range(3)]
+
+    for future in futures:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+
+def test_blocking_contributor_keeps_the_blocking_apply():
+    coordinator = ApplyCoordinator(debounce_seconds=0.1, max_wait_seconds=5)
+    runs = []
+
+    blocking = coordinator.request_apply("tenant", "SBX", lambda: runs.append("wait") or True)
+    deferred = coordinator.request_apply("tenant", "SBX", lambda: runs.append("trigger") or True, blocking=False)
+
+    assert blocking.result(timeout=5) is True
+    assert deferred.result(timeout=5) is True
+    assert runs == ["wait"]
+
+def test_mixed_blocking_and_deferred_callers_wait_for_the_apply(monkeypatch):
+    coordinator = ApplyCoordinator(debounce_seconds=0.2, max_wait_seconds=5)
+    waits, resolved = [], []
+    env_data = {"frodo_path": "frodo", "platform_url": "https://tenant"}
+
+    monkeypatch.setattr(settings, "ESV_APPLY_ASYNC", True)
+    monkeypatch.setattr(sync_esv, "apply_coordinator", coordinator)
+    monkeypatch.setattr(
+        sync_esv, "apply_variables_to_cloud",
+        lambda env_name, env_data, paic_config_path, wait=True: waits.append(wait) or True
+    )
+    monkeypatch.setattr(
+        sync_esv.apply_status_poller, "track",
+        lambda key, env_name, env_data, callback: callback(True, {"status": "ready"})
+    )
+    monkeypatch.setattr(sync_esv, "resolve_deferred_job", lambda job_id, success, detail: resolved.append((job_id, success)))
+
+    # A push-many worker thread has no job id, so it blocks on the apply
+    blocking = {}
+    thread = threading.Thread(target=lambda: blocking.setdefault("ok", sync_esv.request_apply_to_cloud("SBX", env_data)))
+    thread.start()
+    while coordinator.pending_count(("frodo", "https://tenant")) == 0:
+        time.sleep(0.01)
+
+    # A deferred job joins the same window last
+    token = current_job_id_ctx_var.set("job-1")
+    try:
+        assert sync_esv.request_apply_to_cloud("SBX", env_data) is True
+    finally:
+        current_job_id_ctx_var.reset(token)
+        job._deferred_jobs.pop("job-1", None)
+
+    thread.join(5)
+    assert blocking["ok"] is True
+    assert waits == [True]
+    assert resolved == [("job-1", True)]
+
+def test_apply_async_off_blocks_inside_a_job(monkeypatch):
+    waits = []
+    monkeypatch.setattr(settings, "ESV_APPLY_ASYNC", True)
+    monkeypatch.setattr(sync_esv, "apply_coordinator", ApplyCoordinator(debounce_seconds=0, max_wait_seconds=1))
+    monkeypatch.setattr(
+        sync_esv, "apply_variables_to_cloud",
+        lambda env_name, env_data, paic_config_path, wait=True: waits.append(wait) or True
+    )
+
+    token = current_job_id_ctx_var.set("job-1")
+    try:
+        env_data = {"frodo_path": "frodo", "platform_url": "https://tenant"}
+        assert sync_esv.request_apply_to_cloud("SBX", env_data, apply_async=False) is True
+    finally:
+        current_job_id_ctx_var.reset(token)
+
+    assert waits == [True]
+    assert "job-1" not in job._deferred_jobs
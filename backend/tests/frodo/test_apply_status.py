@@ -0,0 +1,81 @@
+# tests/frodo/test_apply_status.py
+import threading
+
+from core.frodo import apply_status, get_token, resilience
+from core.frodo.apply_status import ApplyStatusPoller, get_restart_status
+
+def _poller(statuses, timeout=5):
+    it = iter(statuses)
+    return ApplyStatusPoller(
+        status_fn=lambda env_data: next(it),
+        initial_delay=0.01,
+        max_delay=0.05,
+        timeout=timeout
+    )
+
+def _track(poller, key="apply-1"):
+    done = threading.Event()
+    outcome = {}
+
+    def callback(success, detail):
+        outcome["success"] = success
+        outcome["detail"] = detail
+        done.set()
+
+    poller.track(key, "SBX", {"platform_url": "https://tenant"}, callback)
+    assert done.wait(5)
+    return outcome
+
+def test_poller_reports_success_once_tenant_is_ready():
+    outcome = _track(_poller(["restarting", "restarting", "ready"]))
+
+    assert outcome["success"] is True
+    assert outcome["detail"]["status"] == "ready"
+
+def test_poller_reports_failed_restart():
+    outcome = _track(_poller(["restarting", "restartFailed"]))
+
+    assert outcome["success"] is False
+    assert outcome["detail"]["status"] == "restartFailed"
+
+def test_poller_keeps_polling_through_status_errors():
+    calls = iter([lambda: "restarting", lambda: (_ for _ in ()).throw(ConnectionError()), lambda: "ready"])
+    poller = ApplyStatusPoller(
+        status_fn=lambda env_data: next(calls)(),
+        initial_delay=0.01,
+        max_delay=0.05,
+        timeout=5
+    )
+
+    assert _track(poller)["success"] is True
+
+def test_poller_times_out():
+    outcome = _track(_poller(iter(lambda: "restarting", None), timeout=0.05))
+
+    assert outcome["success"] is False
+    assert outcome["detail"]["status"] == "timeout"
+
+def test_status_polling_does_not_trip_the_tenant_breaker(monkeypatch):
+    monkeypatch.setattr(resilience, "_sleep", lambda seconds: None)
+    monkeypatch.setattr(get_token, "create_signed_jwt", lambda *args: "jwt")
+
+    class Unavailable:
+        status_code = 503
+        text = "Service Unavailable"
+
+    monkeypatch.setattr(get_token.requests, "post", lambda *args, **kwargs: Unavailable())
+    env_data = {
+        "platform_url": "https://restarting.example.com",
+        "service_account_id": "sa",
+        "service_account_jwk": {}
+    }
+
+    for _ in range(3):
+        try:
+            get_restart_status(env_data)
+        except Exception:
+            pass
+
+    assert resilience.get_breaker("https://restarting.example.com").consecutive_failures == 0
+    poll_breaker = resilience.get_breaker("https://restarting.example.com" + apply_status.POLL_BREAKER_SUFFIX)
+    assert poll_breaker.total_failures > 0
@@ -0,0 +1,73 @@
+# tests/frodo/test_git_source.py
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from core.frodo.git_source import GitObjectReader, GitPathError, GitRefError
+from core.frodo.variable_files import make_variable_record
+
+pytestmark = pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+
+def _git(repo, *args):
+    subprocess.run(["git", *args], cwd=repo, check=True, capture_output=True)
+
+def _write_variable(repo, env_name, name, value):
+    variable_dir = repo / "configs" / env_name / "global" / "variable"
+    variable_dir.mkdir(parents=True, exist_ok=True)
+    (variable_dir / f"{name}.variable.json").write_text(json.dumps({
+        "variable": {name: {"description": "d", "expressionType": "string", "value": value}}
+    }))
+
+@pytest.fixture
+def repo(tmp_path):
+    _git(tmp_path, "init", "-q", "-b", "main")
+    _git(tmp_path, "config", "user.email", "test@example.com")
+    _git(tmp_path, "config", "user.name", "test")
+    return tmp_path
+
+def _commit(repo, message):
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", message)
+
+def test_reads_any_ref_without_touching_the_working_tree(repo):
+    _write_variable(repo, "SBX", "esv-a", "v1")
+    _commit(repo, "first")
+    _git(repo, "tag", "v1")
+
+    _write_variable(repo, "SBX", "esv-a", "v2")
+    _write_variable(repo, "SBX", "esv-b", "new")
+    _commit(repo, "second")
+
+    # Uncommitted edits are not visible through git objects
+    _write_variable(repo, "SBX", "esv-a", "dirty")
+
+    reader = GitObjectReader(str(repo))
+    try:
+        assert reader.read_variables("SBX", "v1") == {"esv-a": make_variable_record("d", "string", "v1")}
+        assert reader.read_variables("SBX", "main") == {
+            "esv-a": make_variable_record("d", "string", "v2"),
+            "esv-b": make_variable_record("d", "string", "new"),
+        }
+        # Three distinct blobs were parsed; reading again hits the blob cache
+        assert len(reader._cache) == 3
+        reader.read_variables("SBX", "HEAD")
+        assert len(reader._cache) == 3
+    finally:
+        reader.close()
+
+def test_unknown_ref_and_missing_env(repo):
+    _write_variable(repo, "SBX", "esv-a", "v1")
+    _commit(repo, "first")
+
+    reader = GitObjectReader(str(repo))
+    try:
+        with pytest.raises(GitRefError):
+            reader.read_variables("SBX", "no-such-branch")
+        with pytest.raises(GitRefError):
+            reader.read_variables("SBX", "--output=/tmp/x")
+        with pytest.raises(GitPathError):
+            reader.read_variables("PROD", "main")
+    finally:
+        reader.close()
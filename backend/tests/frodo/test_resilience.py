@@ -0,0 +1,110 @@
+# tests/frodo/test_resilience.py
+import subprocess
+
+import pytest
+
+from core.frodo import resilience
+from core.frodo.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    TransientError,
+    call_with_resilience,
+    get_breaker,
+    get_breaker_states,
+    is_transient_error
+)
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(resilience, "_sleep", lambda seconds: None)
+
+def _flaky(failures, error=None):
+    calls = {"count": 0}
+
+    def fn():
+        calls["count"] += 1
+        if calls["count"] <= failures:
+            raise error or TransientError("502 Bad Gateway")
+        return "ok"
+
+    return fn, calls
+
+def test_idempotent_call_is_retried_until_success():
+    fn, calls = _flaky(2)
+
+    assert call_with_resilience(fn, idempotent=True) == "ok"
+    assert calls["count"] == 3
+
+def test_non_idempotent_call_is_not_retried():
+    fn, calls = _flaky(1)
+
+    with pytest.raises(TransientError):
+        call_with_resilience(fn, idempotent=False)
+    assert calls["count"] == 1
+
+def test_non_transient_error_is_not_retried():
+    fn, calls = _flaky(1, error=ValueError("bad variable name"))
+
+    with pytest.raises(ValueError):
+        call_with_resilience(fn, idempotent=True)
+    assert calls["count"] == 1
+
+def test_frodo_output_classification():
+    throttled = subprocess.CalledProcessError(1, "frodo", output="", stderr="Request failed with status code 429")
+    invalid = subprocess.CalledProcessError(1, "frodo", output="", stderr="Error: invalid ESV name")
+
+    assert is_transient_error(throttled)
+    assert not is_transient_error(invalid)
+
+def test_status_codes_and_timeouts_in_variable_output_are_not_transient():
+    for stderr in (
+        "Error importing esv-port-503: invalid value",
+        "Error: esv-timeout-seconds must be a string",
+        "Error: value 'timed out after 429 tries' rejected",
+    ):
+        assert not is_transient_error(subprocess.CalledProcessError(1, "frodo", output="", stderr=stderr))
+
+    for stderr in (
+        "AxiosError: statusCode: 503",
+        "Error: 502 Bad Gateway",
+        "Error: timeout of 30000ms exceeded",
+        "Error: connect ECONNRESET 10.0.0.1:443",
+    ):
+        assert is_transient_error(subprocess.CalledProcessError(1, "frodo", output="", stderr=stderr))
+
+def test_breaker_opens_and_fails_fast():
+    breaker = CircuitBreaker("https://tenant.example", failure_threshold=2, reset_seconds=60)
+
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure(TransientError("503"))
+
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.snapshot()["total_rejections"] == 1
+
+def test_breaker_half_open_trial_closes_on_success():
+    breaker = CircuitBreaker("https://tenant.example", failure_threshold=1, reset_seconds=0)
+    breaker.before_call()
+    breaker.record_failure(TransientError("503"))
+    assert breaker.state == "open"
+
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+def test_breaker_state_is_exposed_per_tenant():
+    fn, _ = _flaky(100)
+    key = "https://down-tenant.example/"
+
+    with pytest.raises((TransientError, CircuitOpenError)):
+        call_with_resilience(fn, breaker_key=key, idempotent=True)
+
+    states = {state["key"]: state for state in get_breaker_states()}
+    assert get_breaker(key).key in states
+    assert states["https://down-tenant.example"]["total_failures"] >= 1
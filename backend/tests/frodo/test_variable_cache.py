@@ -0,0 +1,77 @@
+# tests/frodo/test_variable_cache.py
+import json
+import os
+
+import pytest
+
+from core.frodo import variable_files
+from core.frodo.sync_esv import pull_variables_from_local
+from core.frodo.variable_cache import VariableFileCache
+
+def _write_variable(variable_dir, name, value):
+    path = variable_dir / f"{name}.variable.json"
+    path.write_text(json.dumps({
+        "variable": {name: {"description": "", "expressionType": "string", "value": value}}
+    }))
+    return path
+
+@pytest.fixture
+def paic_repo(tmp_path, monkeypatch):
+    variable_dir = tmp_path / "configs" / "SBX" / "global" / "variable"
+    variable_dir.mkdir(parents=True)
+    monkeypatch.setattr(variable_files, "variable_file_cache", VariableFileCache(max_entries=100))
+    return tmp_path, variable_dir
+
+def test_unchanged_files_are_served_from_cache(paic_repo):
+    root, variable_dir = paic_repo
+    for i in range(3):
+        _write_variable(variable_dir, f"esv-{i}", str(i))
+
+    first = pull_variables_from_local("SBX", paic_config_path=str(root))
+    second = pull_variables_from_local("SBX", paic_config_path=str(root))
+
+    assert first == second
+    stats = variable_files.variable_file_cache.stats()
+    assert stats["misses"] == 3
+    assert stats["hits"] == 3
+
+def test_modified_file_is_reparsed(paic_repo):
+    root, variable_dir = paic_repo
+    path = _write_variable(variable_dir, "esv-a", "old")
+    pull_variables_from_local("SBX", paic_config_path=str(root))
+
+    _write_variable(variable_dir, "esv-a", "newer")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert pull_variables_from_local("SBX", paic_config_path=str(root))["esv-a"].value == "newer"
+
+def test_lru_bound_and_invalidation(tmp_path):
+    cache = VariableFileCache(max_entries=2)
+    for i in range(3):
+        cache.put(str(tmp_path / "SBX" / f"{i}.variable.json"), (i, i, i), {"esv": i})
+    cache.put(str(tmp_path / "PROD" / "x.variable.json"), (9, 9, 9), {})
+
+    assert cache.stats()["entries"] == 2
+    assert cache.stats()["evictions"] == 2
+    assert cache.invalidate(str(tmp_path / "SBX")) == 1
+    assert cache.get(str(tmp_path / "PROD" / "x.variable.json"), (9, 9, 9)) == {}
+
+def test_parallel_loader_matches_sequential_and_collects_errors(paic_repo, monkeypatch):
+    root, variable_dir = paic_repo
+    for i in range(20):
+        _write_variable(variable_dir, f"esv-{i}", str(i))
+    (variable_dir / "broken.variable.json").write_text("{not json")
+    files = variable_files.scan_variable_dir(str(variable_dir))
+
+    monkeypatch.setattr(variable_files.settings, "ESV_LOADER_WORKERS", 4)
+    monkeypatch.setattr(variable_files.settings, "ESV_LOADER_PARALLEL_MIN_FILES", 1)
+    errors = {}
+    loaded = variable_files.load_variable_files(files, errors=errors)
+
+    assert [os.path.basename(path) for path in errors] == ["broken.variable.json"]
+    assert len(loaded) == 20
+    assert loaded[str(variable_dir / "esv-7.variable.json")]["esv-7"] == variable_files.make_variable_record("", "string", "7")
+
+    with pytest.raises(ValueError):
+        pull_variables_from_local("SBX", paic_config_path=str(root))
@@ -0,0 +1,106 @@
+# tests/frodo/test_variable_index.py
+import json
+import os
+import time
+
+import pytest
+
+from core.frodo import sync_esv, variable_files
+from core.frodo.variable_cache import VariableFileCache
+from core.frodo.variable_index import VariableIndex
+
+def _write_variable(variable_dir, name, value):
+    path = variable_dir / f"{name}.variable.json"
+    path.write_text(json.dumps({
+        "variable": {name: {"description": "", "expressionType": "string", "value": value}}
+    }))
+    stat = path.stat()
+    # Make sure the signature changes even on coarse-mtime filesystems
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    return path
+
+@pytest.fixture
+def paic_repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(variable_files, "variable_file_cache", VariableFileCache(max_entries=100))
+    for env_name in ("SBX", "PROD"):
+        (tmp_path / "configs" / env_name / "global" / "variable").mkdir(parents=True)
+    return tmp_path
+
+def _variable_dir(root, env_name):
+    return root / "configs" / env_name / "global" / "variable"
+
+def test_refresh_reparses_only_changed_files(paic_repo, monkeypatch):
+    sbx = _variable_dir(paic_repo, "SBX")
+    _write_variable(sbx, "esv-a", "1")
+    _write_variable(sbx, "esv-b", "2")
+
+    index = VariableIndex(str(paic_repo), mode="poll")
+    index.refresh_all()
+    assert set(index.get("SBX")) == {"esv-a", "esv-b"}
+    assert index.get("PROD") == {}
+    assert index.generation("SBX") == 1
+
+    parsed = []
+    real_parse = variable_files.parse_variable_file
+    monkeypatch.setattr(variable_files, "parse_variable_file", lambda path: parsed.append(path) or real_parse(path))
+
+    assert index.refresh_env("SBX") is False
+    assert index.generation("SBX") == 1
+
+    _write_variable(sbx, "esv-b", "22")
+    (sbx / "esv-a.variable.json").unlink()
+    assert index.refresh_env("SBX") is True
+
+    assert [os.path.basename(p) for p in parsed] == ["esv-b.variable.json"]
+    assert {name: var.value for name, var in index.get("SBX").items()} == {"esv-b": "22"}
+    assert index.generation("SBX") == 2
+
+def test_removed_env_is_dropped(paic_repo):
+    index = VariableIndex(str(paic_repo), mode="poll")
+    index.refresh_all()
+    assert index.get("PROD") is not None
+
+    os.rmdir(_variable_dir(paic_repo, "PROD"))
+    index.refresh_all()
+    assert index.get("PROD") is None
+
+def test_watcher_serves_pull_variables_from_source(paic_repo, monkeypatch):
+    sbx = _variable_dir(paic_repo, "SBX")
+    _write_variable(sbx, "esv-a", "1")
+
+    index = VariableIndex(str(paic_repo), mode="poll", poll_seconds=0.1)
+    monkeypatch.setattr(sync_esv, "variable_index", index)
+    index.start()
+    try:
+        assert index.backend == "poll"
+        assert sync_esv.pull_variables_from_source("SBX") is index.get("SBX")
+
+        _write_variable(sbx, "esv-b", "2")
+        deadline = time.monotonic() + 5
+        while "esv-b" not in sync_esv.pull_variables_from_source("SBX"):
+            assert time.monotonic() < deadline, "watcher did not pick up the new file"
+            time.sleep(0.05)
+    finally:
+        index.stop()
+
+    assert not index.is_running()
+
+def test_source_fingerprint_follows_file_changes(paic_repo, monkeypatch):
+    sbx = _variable_dir(paic_repo, "SBX")
+    _write_variable(sbx, "esv-a", "1")
+    root = str(paic_repo)
+
+    before = sync_esv.source_fingerprint("SBX", paic_config_path=root)
+    assert sync_esv.source_fingerprint("SBX", paic_config_path=root) == before
+
+    _write_variable(sbx, "esv-a", "2")
+    assert sync_esv.source_fingerprint("SBX", paic_config_path=root) != before
+    assert sync_esv.source_fingerprint("NOPE", paic_config_path=root) == ("missing",)
+
+    index = VariableIndex(root, mode="poll", poll_seconds=60)
+    monkeypatch.setattr(sync_esv, "variable_index", index)
+    index.start()
+    try:
+        assert sync_esv.source_fingerprint("SBX") == ("index", id(index), 1)
+    finally:
+        index.stop()
@@ -0,0 +1,95 @@
+# tests/services/conftest.py
+import pytest
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine
+
+from models import db_models
+from core.services.esv_plan_cache import esv_plan_cache
+
+ENV_NAMES = ["DEV", "SBX", "PROD"]
+
+@pytest.fixture(autouse=True)
+def clear_plan_cache():
+    esv_plan_cache.clear()
+    yield
+    esv_plan_cache.clear()
+
+@pytest.fixture
+def engine():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+@pytest.fixture
+def user(session):
+    identity = db_models.IdentityUser(subject="esv-tester")
+    session.add(identity)
+    session.commit()
+    session.refresh(identity)
+
+    profile = db_models.UserProfile(user_id=identity.id, username="esv-tester")
+    session.add(profile)
+    session.commit()
+    session.refresh(profile)
+    return profile
+
+@pytest.fixture
+def envs(session, user):
+    envs = []
+    for name in ENV_NAMES:
+        env = db_models.Environment(
+            name=name,
+            platformUrl=f"https://{name.lower()}.example.com",
+            serviceAccountID="sa",
+            serviceAccountJWK={},
+            scope="fr:idc:esv:*",
+            user_profile_id=user.id
+        )
+        session.add(env)
+        envs.append(env)
+    session.commit()
+    for env in envs:
+        session.refresh(env)
+    return envs
+
+@pytest.fixture
+def query_counter(engine):
+    """Counts SQL statements executed against the test engine."""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def seed_variables(session, user, envs, count, prefix="esv-var"):
+    """Insert `count` variables with a value in every env."""
+    for i in range(count):
+        var = db_models.EsvVariable(
+            name=f"{prefix}-{i:04d}",
+            description=f"variable {i}",
+            expressionType="string",
+            user_profile_id=user.id
+        )
+        session.add(var)
+        session.flush()
+        for env in envs:
+            session.add(db_models.EsvVariableValue(
+                variable_id=var.id,
+                environment_id=env.id,
+                value=f"{env.name}-{i}"
+            ))
+    session.commit()
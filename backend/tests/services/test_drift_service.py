@@ -0,0 +1,85 @@
+# tests/services/test_drift_service.py
+import json
+import os
+
+import pytest
+
+from core.frodo import sync_esv
+from core.services import drift_service
+from core.services.drift_service import apply_push_and_verify, check_drift
+
+from tests.services.conftest import seed_variables
+
+def _live_variable(name, value, description):
+    return {"variable": {name: {"_id": name, "description": description, "expressionType": "string", "value": value}}}
+
+def test_check_drift_diffs_one_export_per_env(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=3)
+    live = {
+        # esv-var-0001 did not land, esv-var-0002 holds an old value, esv-extra is unknown to the DB
+        "https://dev.example.com": {
+            "esv-var-0000": ("DEV-0", "variable 0"),
+            "esv-var-0002": ("old", "variable 2"),
+            "esv-extra": ("x", ""),
+        },
+        "https://sbx.example.com": {
+            f"esv-var-{i:04d}": (f"SBX-{i}", f"variable {i}") for i in range(3)
+        },
+    }
+    commands = []
+
+    def fake_run_frodo_command(command, cwd=".", process_env=None, breaker_key=None, idempotent=False):
+        commands.append(command)
+        args = command.split()
+        if breaker_key not in live:
+            raise RuntimeError("tenant unreachable")
+        export_dir = args[args.index("-D") + 1]
+        for name, (value, description) in live[breaker_key].items():
+            with open(os.path.join(export_dir, f"{name}.variable.json"), "w") as f:
+                json.dump(_live_variable(name, value, description), f)
+        return "", ""
+
+    monkeypatch.setattr(sync_esv, "run_frodo_command", fake_run_frodo_command)
+
+    result = check_drift(["DEV", "SBX", "PROD"], session=session, current_user=user)
+
+    assert len(commands) == 3
+    assert all(" esv variable export " in command for command in commands)
+    assert result["SBX"]["in_sync"] is True
+    assert result["PROD"] == {"error": "tenant unreachable"}
+
+    dev = result["DEV"]
+    assert dev["in_sync"] is False
+    assert dev["summary"] == {"create": 1, "update": 1, "delete": 1}
+    assert [item["name"] for item in dev["drift"]["create"]] == ["esv-var-0001"]
+    assert dev["drift"]["update"][0]["values"]["DEV"] == {"old": "old", "new": "DEV-2"}
+    assert [item["name"] for item in dev["drift"]["delete"]] == ["esv-extra"]
+
+def test_check_drift_rejects_unknown_env(session, user, envs):
+    with pytest.raises(ValueError, match="QA"):
+        check_drift(["DEV", "QA"], session=session, current_user=user)
+
+def test_verify_waits_for_deferred_apply(session, engine, user, envs, monkeypatch):
+    callbacks, checked = [], []
+
+    monkeypatch.setattr(drift_service, "apply_push_to_source", lambda env_name, session, current_user: {"mode": "full"})
+    monkeypatch.setattr(drift_service, "on_deferred_resolved", lambda callback: callbacks.append(callback) or True)
+    monkeypatch.setattr(
+        drift_service, "check_drift",
+        lambda env_names, session, current_user: checked.append(env_names) or {"SBX": {"in_sync": True}}
+    )
+    monkeypatch.setattr(drift_service.db, "engine", engine)
+
+    result = apply_push_and_verify("SBX", session=session, current_user=user)
+    assert result["verify"] == {"pending": True}
+    assert checked == []
+
+    # The restart settled: the tenant is checked, not before
+    callbacks.pop()(True)
+    assert checked == [["SBX"]]
+    assert result["verify"] == {"in_sync": True}
+
+    result = apply_push_and_verify("SBX", session=session, current_user=user)
+    callbacks.pop()(False)
+    assert result["verify"] == {"skipped": "apply failed"}
+    assert checked == [["SBX"]]
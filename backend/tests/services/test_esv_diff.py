@@ -0,0 +1,130 @@
+# tests/services/test_esv_diff.py
+from core.services import esv_diff
+from core.services.esv_diff import (
+    iter_source_vs_db,
+    iter_db_vs_source,
+    collect_diff,
+    load_db_index,
+    load_source_index,
+    load_diff_indexes
+)
+from core import db
+from core.esv_hash import metadata_hash, value_hash
+from core.frodo.variable_files import make_variable_record
+
+from tests.services.conftest import seed_variables
+
+def _var(values, description="desc", expressionType="string"):
+    return {"description": description, "expressionType": expressionType, "values": values}
+
+def test_pull_diff_create_update_delete():
+    source = {
+        "esv-new": _var({"DEV": "1"}),
+        "esv-changed": _var({"DEV": "new", "SBX": "same"}),
+        "esv-partial": _var({"DEV": "x", "SBX": "y"}),
+    }
+    db = {
+        "esv-changed": _var({"DEV": "old", "SBX": "same"}),
+        "esv-partial": _var({"DEV": "x", "PROD": "z"}),
+        "esv-gone": _var({"DEV": "bye"}),
+    }
+
+    diff = collect_diff(iter_source_vs_db(source, db))
+
+    assert diff["create"] == [
+        _var({"DEV": "1"}) | {"name": "esv-new"},
+        _var({"SBX": "y"}) | {"name": "esv-partial"},
+    ]
+    assert diff["update"] == [
+        _var({"DEV": {"old": "old", "new": "new"}}) | {"name": "esv-changed"},
+    ]
+    assert diff["delete"] == [
+        _var({"PROD": "z"}) | {"name": "esv-partial"},
+        _var({"DEV": "bye"}) | {"name": "esv-gone"},
+    ]
+
+def test_pull_diff_metadata_only_update_keeps_all_values():
+    source = {"esv-a": _var({"DEV": "1", "SBX": "2"}, description="new")}
+    db = {"esv-a": _var({"DEV": "1", "SBX": "2"}, description="old")}
+
+    diff = collect_diff(iter_source_vs_db(source, db))
+
+    assert diff["update"] == [{
+        "name": "esv-a",
+        "description": {"old": "old", "new": "new"},
+        "expressionType": "string",
+        "values": {"DEV": "1", "SBX": "2"},
+    }]
+
+def test_push_diff_is_db_driven():
+    db = {
+        "esv-only-db": _var({"DEV": "1"}),
+        "esv-changed": _var({"DEV": "new"}, description="db"),
+    }
+    source = {
+        "esv-changed": _var({"DEV": "old", "SBX": "extra"}, description="src"),
+        "esv-only-source": _var({"SBX": "2"}),
+    }
+
+    diff = collect_diff(iter_db_vs_source(db, source))
+
+    assert diff["create"] == [_var({"DEV": "1"}) | {"name": "esv-only-db"}]
+    assert diff["update"] == [{
+        "name": "esv-changed",
+        "description": {"old": "src", "new": "db"},
+        "expressionType": "string",
+        "values": {"DEV": {"old": "old", "new": "new"}},
+    }]
+    assert diff["delete"] == [
+        _var({"SBX": "extra"}, description="src") | {"name": "esv-changed"},
+        _var({"SBX": "2"}) | {"name": "esv-only-source"},
+    ]
+
+def test_identical_indexes_produce_no_diff():
+    index = {"esv-a": _var({"DEV": "1", "SBX": "2"})}
+
+    assert collect_diff(iter_source_vs_db(index, index)) == {"create": [], "update": [], "delete": []}
+    assert collect_diff(iter_db_vs_source(index, index)) == {"create": [], "update": [], "delete": []}
+
+def test_hash_phase_skips_unchanged_variables(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=50)
+    source = {
+        env.name: {
+            f"esv-var-{i:04d}": make_variable_record(f"variable {i}", "string", f"{env.name}-{i}")
+            for i in range(50)
+        }
+        for env in envs
+    }
+    source["SBX"]["esv-var-0007"] = make_variable_record("variable 7", "string", "changed")
+    del source["DEV"]["esv-var-0011"]
+    source["DEV"]["esv-var-0049"] = make_variable_record("variable 49", "json", "DEV-49")
+    source["DEV"]["esv-only-source"] = make_variable_record("", "string", "x")
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: source[env_name])
+
+    db_index, source_index = load_diff_indexes(session, user, envs)
+
+    assert sorted(db_index) == ["esv-var-0007", "esv-var-0011", "esv-var-0049"]
+    assert sorted(source_index) == ["esv-only-source", "esv-var-0007", "esv-var-0011", "esv-var-0049"]
+
+    full_db = load_db_index(session, user, envs)
+    full_source = load_source_index(envs)
+    assert collect_diff(iter_source_vs_db(source_index, db_index)) == collect_diff(iter_source_vs_db(full_source, full_db))
+    assert collect_diff(iter_db_vs_source(db_index, source_index)) == collect_diff(iter_db_vs_source(full_db, full_source))
+
+def test_upgrade_db_adds_and_backfills_hash_columns(engine, session, user, envs):
+    seed_variables(session, user, envs[:1], count=3)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE esvvariable DROP COLUMN content_hash")
+        conn.exec_driver_sql("ALTER TABLE esvvariablevalue DROP COLUMN value_hash")
+
+    db.upgrade_db(engine)
+    db.upgrade_db(engine)  # no-op once the columns exist
+
+    with engine.connect() as conn:
+        variables = conn.exec_driver_sql("SELECT description, expressionType, content_hash FROM esvvariable").all()
+        values = conn.exec_driver_sql("SELECT value, value_hash FROM esvvariablevalue").all()
+
+    assert [content_hash for *_, content_hash in variables] == [
+        metadata_hash(description, expression_type) for description, expression_type, _ in variables
+    ]
+    assert [hashed for _, hashed in values] == [value_hash(value) for value, _ in values]
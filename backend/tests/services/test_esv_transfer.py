@@ -0,0 +1,87 @@
+# tests/services/test_esv_transfer.py
+import asyncio
+
+import pytest
+
+from core.services import esv_transfer
+from core.services.esv_transfer import EsvImportError, import_variables, export_variables
+from core.services.sync_esv_service import get_variables_in_db
+
+from tests.services.conftest import seed_variables
+
+async def _stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+def _import(session, user, fmt, *chunks):
+    return asyncio.run(import_variables(_stream(*chunks), fmt, session, user))
+
+def _state(session, user):
+    return {v.name: (v.description, v.values) for v in get_variables_in_db(session=session, current_user=user)}
+
+def test_ndjson_import_upserts_in_chunks(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=1)
+    monkeypatch.setattr(esv_transfer.settings, "ESV_IMPORT_CHUNK_SIZE", 2)
+    upserts = []
+    real_upsert = esv_transfer.upsert_variables_in_db
+    monkeypatch.setattr(esv_transfer, "upsert_variables_in_db", lambda batch, *args: upserts.append(len(batch)) or real_upsert(batch, *args))
+
+    # Lines split across chunks, one unchanged value, one overwritten
+    totals = _import(
+        session, user, "ndjson",
+        b'{"name": "esv-var-0000", "description": "variable 0", "values": {"DEV": "DEV-0", "SBX": "x"}}\n{"na',
+        b'me": "esv-new-1", "values": {"PROD": "p"}}\n\n{"name": "esv-new-2"}',
+    )
+
+    assert upserts == [2, 1]
+    assert totals == {
+        "variables": 3,
+        "variables_created": 2,
+        "variables_updated": 0,
+        "values_created": 1,
+        "values_updated": 1,
+    }
+    state = _state(session, user)
+    assert state["esv-var-0000"] == ("variable 0", {"DEV": "DEV-0", "SBX": "x", "PROD": "PROD-0"})
+    assert state["esv-new-1"] == ("", {"PROD": "p"})
+
+def test_csv_import_and_export(session, user, envs):
+    _import(
+        session, user, "csv",
+        b'name,description,expressionType,DEV,SBX\nesv-a,"two\nlines",,1,\\N\n"esv-""b""",\\N,number,,2\n',
+    )
+    exported = b"".join(export_variables(session, user, "csv")).decode("utf-8")
+
+    assert exported == (
+        'name,description,expressionType,DEV,PROD,SBX\n'
+        '"esv-""b""",\\N,number,,\\N,2\n'
+        'esv-a,"two\nlines",string,1,\\N,\\N\n'
+    )
+
+@pytest.mark.parametrize("fmt", ["ndjson", "csv"])
+def test_export_then_import_changes_nothing(session, user, envs, fmt):
+    _import(
+        session, user, "ndjson",
+        b'{"name": "esv-null", "description": null, "expressionType": "string", "values": {"DEV": ""}}\n'
+        b'{"name": "esv-empty", "description": "", "expressionType": "list", "values": {"SBX": "a,b", "PROD": ""}}\n',
+    )
+    before = _state(session, user)
+    assert before["esv-null"] == (None, {"DEV": ""})
+
+    exported = b"".join(export_variables(session, user, fmt))
+    totals = _import(session, user, fmt, exported)
+
+    assert totals["variables"] == 2
+    assert totals["variables_created"] == totals["variables_updated"] == 0
+    assert totals["values_created"] == totals["values_updated"] == 0
+    assert _state(session, user) == before
+
+def test_import_stops_at_malformed_line(session, user, envs, monkeypatch):
+    monkeypatch.setattr(esv_transfer.settings, "ESV_IMPORT_CHUNK_SIZE", 1)
+
+    with pytest.raises(EsvImportError) as error:
+        _import(session, user, "ndjson", b'{"name": "esv-a", "values": {"DEV": "1"}}\n[1]\n')
+
+    assert "line 2" in str(error.value)
+    assert error.value.imported["variables"] == 1
+    assert list(_state(session, user)) == ["esv-a"]
@@ -0,0 +1,85 @@
+# tests/services/test_push_many_service.py
+import threading
+import time
+
+import pytest
+from sqlmodel import select
+
+from core.job import current_job_id_ctx_var
+from core.services import esv_diff, push_many_service, sync_esv_service
+from core.services.esv_revision import get_push_watermark
+from core.services.push_many_service import apply_push_to_sources
+from models import db_models
+
+from tests.services.conftest import seed_variables
+
+def test_push_many_fans_out_with_child_jobs(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=2)
+    # DEV and SBX share a tenant
+    envs[1].platformUrl = envs[0].platformUrl + "/"
+    session.add(envs[1])
+    session.commit()
+
+    running = {"all": 0, "tenant": 0}
+    peak = {"all": 0, "tenant": 0}
+    lock = threading.Lock()
+    progress = []
+
+    def fake_add(env_name, env_data, variables, apply=True):
+        shared = env_name in ("DEV", "SBX")
+        with lock:
+            running["all"] += 1
+            running["tenant"] += shared
+            peak["all"] = max(peak["all"], running["all"])
+            peak["tenant"] = max(peak["tenant"], running["tenant"])
+        time.sleep(0.05)
+        with lock:
+            running["all"] -= 1
+            running["tenant"] -= shared
+        return env_name != "PROD"
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: {})
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: "v1")
+    monkeypatch.setattr(sync_esv_service, "add_variables_to_source", fake_add)
+    applies = []
+    monkeypatch.setattr(
+        sync_esv_service, "apply_variables_to_source",
+        lambda env_name, env_data, apply_async=True: applies.append(apply_async) or True
+    )
+    monkeypatch.setattr(push_many_service, "update_job_progress", lambda p: progress.append(p))
+
+    token = current_job_id_ctx_var.set("parent-job")
+    try:
+        result = apply_push_to_sources(["DEV", "SBX", "PROD"], session=session, current_user=user)
+    finally:
+        current_job_id_ctx_var.reset(token)
+
+    assert list(result["envs"]) == ["DEV", "SBX", "PROD"]
+    assert result["failed"] == ["PROD"]
+    assert result["envs"]["DEV"]["result"]["created"][0]["count"] == 2
+    assert peak["all"] == 2 and peak["tenant"] == 1
+    # Workers never defer the apply to the status poller
+    assert applies == [False, False, False]
+    assert progress[-1] == {"envs_total": 3, "envs_done": 3, "envs_failed": 1}
+
+    children = session.exec(
+        select(db_models.Job).where(db_models.Job.parent_job_id == "parent-job")
+    ).all()
+    assert {job.job_id: job.status for job in children} == {
+        entry["job_id"]: entry["status"] for entry in result["envs"].values()
+    }
+
+    # Only the complete pushes move their watermark
+    watermarks = {env.name: get_push_watermark(session, user, env) for env in envs}
+    assert watermarks["DEV"] is not None and watermarks["SBX"] is not None
+    assert watermarks["PROD"] is None
+
+def test_push_many_rejects_unknown_env_before_pushing(session, user, envs, monkeypatch):
+    pushed = []
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: {})
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: "v1")
+    monkeypatch.setattr(sync_esv_service, "execute_push_plan", lambda plan, apply_async=True: pushed.append(plan))
+
+    with pytest.raises(ValueError, match="QA"):
+        apply_push_to_sources(["DEV", "QA"], session=session, current_user=user)
+    assert pushed == []
@@ -0,0 +1,454 @@
+# tests/services/test_sync_esv_service.py
+import copy
+
+from sqlmodel import select
+
+from core.esv_hash import value_hash
+from core.services.sync_esv_service import (
+    get_variables_in_db,
+    list_variables_in_db,
+    get_variable_matrix,
+    compare_envs_in_db,
+    clone_env_values_in_db,
+    create_variables_in_db,
+    update_variables_in_db,
+    delete_variables_in_db,
+    diff_db_vs_source_for_env,
+    diff_db_vs_source_all_envs,
+    iter_diff_db_vs_source_all_envs,
+    apply_pull_from_source,
+    apply_push_to_source
+)
+from core.services import esv_diff, sync_esv_service
+from core.services.esv_revision import (
+    bump_env_revision,
+    changed_names_since,
+    get_esv_revision,
+    get_push_watermark,
+    get_revisions
+)
+from models import db_models
+from models.esv_models import (
+    EsvVariableCreate,
+    EsvVariableUpdate,
+    EsvVariableDelete,
+    EsvVariablePerEnv
+)
+
+from tests.services.conftest import seed_variables
+
+def test_get_variables_in_db_runs_a_single_query(session, user, envs, query_counter):
+    seed_variables(session, user, envs, count=50)
+    session.expire_all()
+    session.refresh(user)
+    query_counter.clear()
+
+    response = get_variables_in_db(session=session, current_user=user)
+
+    assert len(query_counter) == 1
+    assert len(response) == 50
+    assert response[0].name == "esv-var-0000"
+    assert response[0].values == {"DEV": "DEV-0", "SBX": "SBX-0", "PROD": "PROD-0"}
+
+def test_get_variables_in_db_keeps_variables_without_values(session, user, envs):
+    session.add(db_models.EsvVariable(
+        name="esv-empty",
+        description=None,
+        expressionType="string",
+        user_profile_id=user.id
+    ))
+    session.commit()
+
+    response = get_variables_in_db(session=session, current_user=user)
+
+    assert [(r.name, r.values) for r in response] == [("esv-empty", {})]
+
+def test_create_variables_in_db_query_count_is_independent_of_size(session, user, envs, query_counter):
+    seed_variables(session, user, envs[:1], count=10)
+    payload = [
+        EsvVariableCreate(
+            name=f"esv-var-{i:04d}",
+            description="created",
+            expressionType="string",
+            values={env.name: f"new-{i}" for env in envs}
+        )
+        for i in range(200)
+    ]
+    session.refresh(user)
+    query_counter.clear()
+
+    response = create_variables_in_db(payload=payload, session=session, current_user=user)
+
+    # env lookup, variable lookup, variable insert + reload, value lookup,
+    # value insert, revision bump (+ first-time insert), change log insert,
+    # response query, commit
+    assert len(query_counter) <= 12
+    assert len(response) == 200
+    # Existing values are left alone, missing envs are filled in
+    assert response[0].values == {"DEV": "DEV-0", "SBX": "new-0", "PROD": "new-0"}
+    assert response[150].values == {"DEV": "new-150", "SBX": "new-150", "PROD": "new-150"}
+
+def test_update_variables_in_db_skips_missing_values(session, user, envs):
+    seed_variables(session, user, envs[:1], count=2)
+
+    response = update_variables_in_db(
+        payload=[
+            EsvVariableUpdate(name="esv-var-0000", description="updated", values={"DEV": "v2", "SBX": "nope"}),
+            EsvVariableUpdate(name="esv-missing", values={"DEV": "x"}),
+        ],
+        session=session,
+        current_user=user
+    )
+
+    assert [r.model_dump() for r in response] == [{
+        "name": "esv-var-0000",
+        "description": "updated",
+        "expressionType": "string",
+        "values": {"DEV": "v2"},
+    }]
+
+def test_delete_variables_in_db_is_set_based(session, user, envs, query_counter):
+    seed_variables(session, user, envs, count=100)
+    payload = [
+        # Partial delete: keeps PROD
+        EsvVariableDelete(name=f"esv-var-{i:04d}", values={"DEV": "", "SBX": ""})
+        for i in range(50)
+    ] + [
+        # Whole-variable delete
+        EsvVariableDelete(name=f"esv-var-{i:04d}")
+        for i in range(50, 100)
+    ] + [
+        EsvVariableDelete(name="esv-missing"),
+    ]
+    session.refresh(user)
+    query_counter.clear()
+
+    response = delete_variables_in_db(payload=payload, session=session, current_user=user)
+
+    assert len(query_counter) <= 12
+    assert len(response) == 50
+    assert response[0].values == {"PROD": "PROD-0"}
+
+    remaining = get_variables_in_db(session=session, current_user=user)
+    assert [r.name for r in remaining] == [f"esv-var-{i:04d}" for i in range(50)]
+
+def test_delete_last_values_removes_variable(session, user, envs):
+    seed_variables(session, user, envs[:1], count=1)
+
+    response = delete_variables_in_db(
+        payload=[EsvVariableDelete(name="esv-var-0000", values={"DEV": "DEV-0"})],
+        session=session,
+        current_user=user
+    )
+
+    assert response == []
+    assert get_variables_in_db(session=session, current_user=user) == []
+
+def test_diff_db_vs_source_for_env_only_reads_that_env(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=3)
+    read_envs = []
+
+    def fake_source(env_name, ref=None):
+        read_envs.append(env_name)
+        return {
+            "esv-var-0000": EsvVariablePerEnv(description="variable 0", expressionType="string", value="SBX-0"),
+            "esv-var-0001": EsvVariablePerEnv(description="variable 1", expressionType="string", value="stale"),
+            "esv-only-source": EsvVariablePerEnv(description="", expressionType="string", value="x"),
+        }
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", fake_source)
+    sbx = next(env for env in envs if env.name == "SBX")
+
+    diff = diff_db_vs_source_for_env(session=session, current_user=user, env=sbx)
+
+    assert read_envs == ["SBX"]
+    assert diff["create"] == [{
+        "name": "esv-var-0002",
+        "description": "variable 2",
+        "expressionType": "string",
+        "values": {"SBX": "SBX-2"},
+    }]
+    assert diff["update"] == [{
+        "name": "esv-var-0001",
+        "description": "variable 1",
+        "expressionType": "string",
+        "values": {"SBX": {"old": "stale", "new": "SBX-1"}},
+    }]
+    assert [entry["name"] for entry in diff["delete"]] == ["esv-only-source"]
+
+def test_push_plan_is_cached_until_db_or_source_changes(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=3)
+    sbx = next(env for env in envs if env.name == "SBX")
+    source = {"esv-var-0000": EsvVariablePerEnv(description="variable 0", expressionType="string", value="SBX-0")}
+    fingerprint = ["v1"]
+    reads = []
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: reads.append(env_name) or source)
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: fingerprint[0])
+
+    first = diff_db_vs_source_for_env(session=session, current_user=user, env=sbx)
+    assert diff_db_vs_source_for_env(session=session, current_user=user, env=sbx) is first
+    assert reads == ["SBX"]
+    assert [entry["name"] for entry in first["create"]] == ["esv-var-0001", "esv-var-0002"]
+
+    # DB write bumps the revision
+    delete_variables_in_db(payload=[EsvVariableDelete(name="esv-var-0002")], session=session, current_user=user)
+    second = diff_db_vs_source_for_env(session=session, current_user=user, env=sbx)
+    assert [entry["name"] for entry in second["create"]] == ["esv-var-0001"]
+    assert reads == ["SBX", "SBX"]
+
+    # Source change
+    fingerprint[0] = "v2"
+    diff_db_vs_source_for_env(session=session, current_user=user, env=sbx)
+    assert reads == ["SBX", "SBX", "SBX"]
+
+def test_writes_are_recorded_in_change_log(session, user, envs):
+    dev, sbx, prod = envs
+    create_variables_in_db(payload=[
+        EsvVariableCreate(name="esv-a", expressionType="string", values={"DEV": "1", "SBX": "1"}),
+        EsvVariableCreate(name="esv-b", expressionType="string", values={"PROD": "1"}),
+    ], session=session, current_user=user)
+    revision = get_esv_revision(session, user)
+
+    update_variables_in_db(payload=[
+        EsvVariableUpdate(name="esv-a", values={"SBX": "2"}),
+    ], session=session, current_user=user)
+    assert changed_names_since(session, user, sbx, revision) == {"esv-a"}
+    assert changed_names_since(session, user, dev, revision) == set()
+
+    delete_variables_in_db(payload=[EsvVariableDelete(name="esv-b")], session=session, current_user=user)
+    assert changed_names_since(session, user, dev, revision) == {"esv-b"}
+    assert changed_names_since(session, user, prod, 0) == {"esv-a", "esv-b"}
+    assert get_esv_revision(session, user) == revision + 2
+
+def test_push_is_incremental_from_watermark(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=3)
+    sbx = next(env for env in envs if env.name == "SBX")
+    fingerprint = ["v1"]
+    pushed = []
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: {})
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: fingerprint[0])
+    monkeypatch.setattr(
+        sync_esv_service, "add_variables_to_source",
+        lambda env_name, env_data, variables, apply=True: pushed.extend(variables) or True
+    )
+    monkeypatch.setattr(sync_esv_service, "apply_variables_to_source", lambda env_name, env_data, apply_async=True: True)
+
+    result = apply_push_to_source("SBX", session=session, current_user=user)
+    assert result["mode"] == "full"
+    assert pushed == ["esv-var-0000", "esv-var-0001", "esv-var-0002"]
+
+    # Only the variable written since the last push is planned
+    pushed.clear()
+    update_variables_in_db(payload=[
+        EsvVariableUpdate(name="esv-var-0001", values={"SBX": "new"}),
+    ], session=session, current_user=user)
+    result = apply_push_to_source("SBX", session=session, current_user=user)
+    assert result["mode"] == "incremental"
+    assert pushed == ["esv-var-0001"]
+
+    pushed.clear()
+    assert apply_push_to_source("SBX", session=session, current_user=user)["created"] == []
+    assert pushed == []
+
+    # A changed source invalidates the watermark
+    fingerprint[0] = "v2"
+    result = apply_push_to_source("SBX", session=session, current_user=user)
+    assert result["mode"] == "full"
+    assert len(pushed) == 3
+
+def test_list_variables_in_db_pages_by_name(session, user, envs, query_counter):
+    seed_variables(session, user, envs, count=5)
+    seed_variables(session, user, envs, count=2, prefix="esv-other")
+    session.refresh(user)
+    query_counter.clear()
+
+    names, after = [], None
+    while True:
+        page, after = list_variables_in_db(session, user, limit=3, after=after, prefix="esv-var")
+        names += [variable.name for variable in page]
+        if after is None:
+            break
+    assert names == [f"esv-var-{i:04d}" for i in range(5)]
+    assert page[-1].values == {"DEV": "DEV-4", "SBX": "SBX-4", "PROD": "PROD-4"}
+    # env lookup, page query and value query per page
+    assert len(query_counter) == 6
+
+def test_list_variables_in_db_prefix_before_surrogates(session, user, envs):
+    # The upper bound of a prefix ending in U+D7FF skips the surrogate range
+    seed_variables(session, user, envs, count=2, prefix="esv-\ud7ff")
+    seed_variables(session, user, envs, count=1, prefix="esv-\ue000")
+
+    page, after = list_variables_in_db(session, user, prefix="esv-\ud7ff")
+    assert [variable.name for variable in page] == ["esv-\ud7ff-0000", "esv-\ud7ff-0001"]
+
+def test_list_variables_in_db_filters_and_fields(session, user, envs):
+    seed_variables(session, user, envs, count=2)
+    delete_variables_in_db(payload=[
+        EsvVariableDelete(name="esv-var-0001", values={"SBX": ""}),
+    ], session=session, current_user=user)
+
+    page, after = list_variables_in_db(session, user, env_name="SBX")
+    assert after is None
+    assert [(variable.name, variable.values) for variable in page] == [("esv-var-0000", {"SBX": "SBX-0"})]
+
+    page, _ = list_variables_in_db(session, user, fields={"expressionType"})
+    assert page[0].model_dump(exclude_unset=True) == {"name": "esv-var-0000", "expressionType": "string"}
+
+    assert list_variables_in_db(session, user, expression_type="int") == ([], None)
+
+def test_esv_and_env_revisions_are_counted_separately(session, user, envs):
+    assert get_revisions(session, user) == (0, 0)
+    bump_env_revision(session, user)
+    session.commit()
+    assert get_revisions(session, user) == (0, 1)
+
+    create_variables_in_db(payload=[
+        EsvVariableCreate(name="esv-a", expressionType="string", values={"DEV": "1"}),
+    ], session=session, current_user=user)
+    assert get_revisions(session, user) == (1, 1)
+
+def test_iter_diff_matches_grouped_diff(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=4)
+    source = {
+        "esv-var-0001": EsvVariablePerEnv(description="variable 1", expressionType="string", value="stale"),
+        "esv-only-source": EsvVariablePerEnv(description="", expressionType="string", value="x"),
+    }
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: source)
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: "v1")
+
+    streamed = list(iter_diff_db_vs_source_all_envs(session=session, current_user=user))
+    grouped = diff_db_vs_source_all_envs(session=session, current_user=user)
+    assert esv_diff.collect_diff(streamed) == grouped
+
+    # Served from the plan cache once it is warm
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", None)
+    assert esv_diff.collect_diff(iter_diff_db_vs_source_all_envs(session=session, current_user=user)) == grouped
+
+def test_variable_matrix_is_columnar(session, user, envs, query_counter):
+    seed_variables(session, user, envs, count=2)
+    delete_variables_in_db(payload=[
+        EsvVariableDelete(name="esv-var-0000", values={"PROD": ""}),
+    ], session=session, current_user=user)
+    session.refresh(user)
+    query_counter.clear()
+
+    matrix = get_variable_matrix(session, user)
+
+    assert matrix == {
+        "envs": ["DEV", "PROD", "SBX"],
+        "names": ["esv-var-0000", "esv-var-0001"],
+        "values": [["DEV-0", "DEV-1"], [None, "PROD-1"], ["SBX-0", "SBX-1"]],
+    }
+    # env lookup and the pivot query
+    assert len(query_counter) == 2
+
+def test_pull_commits_in_chunks_and_reports_progress(session, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=2)
+    source = {
+        f"esv-new-{i}": EsvVariablePerEnv(description="", expressionType="string", value=str(i))
+        for i in range(5)
+    }
+    source["esv-var-0000"] = EsvVariablePerEnv(description="variable 0", expressionType="string", value="changed")
+    progress = []
+    commits = []
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: source)
+    monkeypatch.setattr(sync_esv_service.settings, "ESV_PULL_CHUNK_SIZE", 2)
+    monkeypatch.setattr(sync_esv_service, "update_job_progress", lambda p: progress.append(copy.deepcopy(p)))
+    real_commit = session.commit
+    monkeypatch.setattr(session, "commit", lambda: commits.append(1) or real_commit())
+
+    result = apply_pull_from_source(session, user)
+
+    assert sorted(v["name"] for v in result["created"]) == [f"esv-new-{i}" for i in range(5)]
+    assert [v["name"] for v in result["updated"]] == ["esv-var-0000"]
+    assert "esv-var-0001" not in {v.name for v in get_variables_in_db(session=session, current_user=user)}
+    # 3 create chunks, 1 update chunk, 1 delete chunk
+    assert len(commits) == 5
+    assert progress[0] == {
+        "create": {"done": 0, "total": 5},
+        "update": {"done": 0, "total": 1},
+        "delete": {"done": 0, "total": 1},
+    }
+    assert [p["create"]["done"] for p in progress[1:4]] == [2, 4, 5]
+    assert progress[-1]["delete"] == {"done": 1, "total": 1}
+
+def test_compare_envs_returns_only_differences(session, user, envs, query_counter):
+    seed_variables(session, user, envs, count=4)
+    update_variables_in_db(payload=[
+        EsvVariableUpdate(name="esv-var-0001", values={"PROD": "SBX-1"}),
+    ], session=session, current_user=user)
+    delete_variables_in_db(payload=[
+        EsvVariableDelete(name="esv-var-0002", values={"SBX": ""}),
+        EsvVariableDelete(name="esv-var-0003", values={"PROD": ""}),
+    ], session=session, current_user=user)
+    session.refresh(user)
+    query_counter.clear()
+
+    entries = list(compare_envs_in_db(session, user, "SBX", "PROD"))
+
+    assert [(e["name"], e["status"]) for e in entries] == [
+        ("esv-var-0000", "different"),
+        ("esv-var-0002", "missing_left"),
+        ("esv-var-0003", "missing_right"),
+    ]
+    assert entries[0]["left"] == "SBX-0" and entries[0]["right"] == "PROD-0"
+    # env lookup and the join
+    assert len(query_counter) == 2
+
+    page = list(compare_envs_in_db(session, user, "SBX", "PROD", limit=1, after="esv-var-0000"))
+    assert [e["name"] for e in page] == ["esv-var-0002", "esv-var-0003"]
+
+def test_clone_env_values_copies_server_side(session, user, envs, query_counter):
+    dev, sbx, prod = envs
+    seed_variables(session, user, [dev, sbx], count=300)
+    seed_variables(session, user, [dev], count=2, prefix="esv-dev-only")
+    update_variables_in_db(payload=[
+        EsvVariableUpdate(name="esv-var-0001", values={"SBX": "SBX-changed"}),
+    ], session=session, current_user=user)
+    revision = get_esv_revision(session, user)
+    query_counter.clear()
+
+    counts = clone_env_values_in_db(session, user, "DEV", "SBX", overrides={"esv-dev-only-0000": "override"})
+
+    assert counts == {"copied": 1, "overwritten": 0, "overridden": 1}
+    # Independent of the number of variables: plan, copy, override, change log
+    assert len(query_counter) <= 12
+
+    counts = clone_env_values_in_db(session, user, "DEV", "SBX", prefix="esv-var", names=["esv-var-0001"], overwrite=True)
+    assert counts == {"copied": 0, "overwritten": 1, "overridden": 0}
+    assert changed_names_since(session, user, sbx, revision) == {"esv-dev-only-0000", "esv-dev-only-0001", "esv-var-0001"}
+
+    clone_env_values_in_db(session, user, "SBX", "PROD", names=["esv-var-0000", "esv-dev-only-0000"])
+    values = session.exec(
+        select(db_models.EsvVariableValue).where(db_models.EsvVariableValue.environment_id == prod.id)
+    ).all()
+    assert sorted(v.value for v in values) == ["SBX-0", "override"]
+    assert all(v.value_hash == value_hash(v.value) for v in values)
+
+def test_push_watermark_waits_for_deferred_apply(session, engine, user, envs, monkeypatch):
+    seed_variables(session, user, envs, count=2)
+    sbx = next(env for env in envs if env.name == "SBX")
+    callbacks = []
+
+    monkeypatch.setattr(esv_diff, "pull_variables_from_source", lambda env_name, ref=None: {})
+    monkeypatch.setattr(sync_esv_service, "source_fingerprint", lambda env_name, ref=None: "v1")
+    monkeypatch.setattr(sync_esv_service, "add_variables_to_source", lambda env_name, env_data, variables, apply=True: True)
+    # Apply queued with --no-wait: reported as started, outcome comes later
+    monkeypatch.setattr(sync_esv_service, "apply_variables_to_source", lambda env_name, env_data, apply_async=True: True)
+    monkeypatch.setattr(sync_esv_service, "on_deferred_resolved", lambda callback: callbacks.append(callback) or True)
+    monkeypatch.setattr(sync_esv_service.db, "engine", engine)
+
+    apply_push_to_source("SBX", session=session, current_user=user)
+    assert get_push_watermark(session, user, sbx) is None
+
+    callbacks.pop()(False)
+    assert get_push_watermark(session, user, sbx) is None
+
+    # The restart failed, so the next push plans everything again
+    assert apply_push_to_source("SBX", session=session, current_user=user)["mode"] == "full"
+    callbacks.pop()(True)
+    session.expire_all()
+    assert get_push_watermark(session, user, sbx).revision == get_esv_revision(session, user)
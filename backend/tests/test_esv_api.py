@@ -0,0 +1,55 @@
+# tests/test_esv_api.py
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from api import esv
+from core.frodo.git_source import GitPathError, GitRefError
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+@pytest.mark.parametrize("endpoint, diff_name", [
+    (esv.preview_pull_esv_variables, "diff_source_vs_db_all_envs"),
+    (esv.preview_push_esv_variables, "diff_db_vs_source_all_envs"),
+])
+@pytest.mark.parametrize("error, status_code", [
+    (GitPathError("Variable folder not found for env PROD at main"), 404),
+    (GitRefError("Unknown git ref: nope"), 400),
+])
+def test_preview_maps_git_errors(monkeypatch, endpoint, diff_name, error, status_code):
+    def fail(**kwargs):
+        raise error
+
+    monkeypatch.setattr(esv, "get_revisions", lambda session, user: (1, 1))
+    monkeypatch.setattr(esv, "source_fingerprints", lambda session, user, ref=None: ())
+    monkeypatch.setattr(esv, diff_name, fail)
+
+    with pytest.raises(HTTPException) as raised:
+        endpoint(request=_request(), response=Response(), ref="main", format="json", session=None, current_user=SimpleNamespace(id=1))
+    assert raised.value.status_code == status_code
+
+def test_compare_etag_depends_on_the_query(monkeypatch):
+    monkeypatch.setattr(esv, "get_revisions", lambda session, user: (1, 1))
+    monkeypatch.setattr(esv, "compare_envs_in_db", lambda **kwargs: iter([]))
+
+    def compare(if_none_match=None, left="SBX", right="PROD", limit=None):
+        response = Response()
+        result = esv.compare_esv_envs(
+            request=_request(if_none_match), response=response, left=left, right=right,
+            limit=limit, cursor=None, format="json", session=None, current_user=SimpleNamespace(id=1)
+        )
+        return result, response
+
+    _, response = compare()
+    etag = response.headers["ETag"]
+
+    cached, _ = compare(etag)
+    assert cached.status_code == 304
+    for query in ({"left": "DEV"}, {"right": "DEV"}, {"limit": 10}):
+        result, response = compare(etag, **query)
+        assert not isinstance(result, Response)
+        assert response.headers["ETag"] != etag
@@ -0,0 +1,25 @@
+# tests/test_etag.py
+from fastapi import Response
+from starlette.requests import Request
+
+from core.etag import weak_etag, not_modified
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+def test_not_modified_uses_weak_comparison():
+    etag = weak_etag("esv", 1, (3, 2))
+    assert etag != weak_etag("esv", 1, (4, 2))
+
+    response = Response()
+    assert not_modified(_request(), response, etag) is None
+    assert response.headers["ETag"] == etag
+
+    # Proxies may drop the weak prefix or send a list of tags
+    for header in (etag, etag[2:], f'"other", {etag}', "*"):
+        cached = not_modified(_request(header), Response(), etag)
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+
+    assert not_modified(_request('W/"other"'), Response(), etag) is None
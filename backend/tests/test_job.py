@@ -0,0 +1,139 @@
+# tests/test_job.py
+import time
+
+from sqlmodel import Session
+
+from core import db
+from core.job import (
+    run_job_in_background,
+    defer_current_job,
+    on_deferred_resolved,
+    resolve_deferred_job,
+    get_job_status,
+    get_job_progress,
+    get_job_result,
+    update_job_progress
+)
+from models import db_models
+
+def _make_user(session: Session, username: str) -> db_models.UserProfile:
+    identity = db_models.IdentityUser(subject=username)
+    session.add(identity)
+    session.commit()
+    session.refresh(identity)
+
+    user = db_models.UserProfile(user_id=identity.id, username=username)
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+def _wait_for_status(user, job_id, expected, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with Session(db.engine) as session:
+            status = get_job_status(session=session, current_user=user, job_id=job_id)
+        if status == expected:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} never reached status {expected}, last={status}")
+
+def test_deferred_job_stays_applying_until_resolved():
+    db.init_db()
+    session = Session(db.engine)
+    user = _make_user(session, "deferred-user")
+
+    holder = {}
+
+    def job_fn():
+        holder["job_id"] = defer_current_job()
+        return {"created": 1}
+
+    job_id = run_job_in_background(
+        job_type="push_esv_variables",
+        job_fn=job_fn,
+        session=session,
+        current_user=user
+    )
+
+    _wait_for_status(user, job_id, "applying")
+    assert holder["job_id"] == job_id
+
+    resolve_deferred_job(job_id, True, {"env": "SBX", "status": "ready"})
+    _wait_for_status(user, job_id, "success")
+
+    with Session(db.engine) as check:
+        result = get_job_result(session=check, current_user=user, job_id=job_id)
+    assert result["created"] == 1
+    assert result["deferred"] == [{"env": "SBX", "status": "ready"}]
+
+def test_deferred_failure_fails_the_job_even_if_resolved_early():
+    db.init_db()
+    session = Session(db.engine)
+    user = _make_user(session, "deferred-early-user")
+
+    def job_fn():
+        job_id = defer_current_job()
+        # Resolved before job_fn returns
+        resolve_deferred_job(job_id, False, {"env": "SBX", "status": "restartFailed"})
+        return {"created": 1}
+
+    job_id = run_job_in_background(
+        job_type="push_esv_variables",
+        job_fn=job_fn,
+        session=session,
+        current_user=user
+    )
+
+    _wait_for_status(user, job_id, "failed")
+
+def test_defer_outside_job_is_a_no_op():
+    assert defer_current_job() is None
+    assert on_deferred_resolved(lambda success: None) is False
+
+def test_deferred_callbacks_get_the_outcome():
+    db.init_db()
+    session = Session(db.engine)
+    user = _make_user(session, "deferred-callback-user")
+    outcomes = []
+
+    def job_fn():
+        assert on_deferred_resolved(outcomes.append) is False
+        job_id = defer_current_job()
+        assert on_deferred_resolved(outcomes.append) is True
+        resolve_deferred_job(job_id, False, {"env": "SBX", "status": "restartFailed"})
+        assert outcomes == []
+        return {}
+
+    job_id = run_job_in_background(
+        job_type="push_esv_variables",
+        job_fn=job_fn,
+        session=session,
+        current_user=user
+    )
+
+    _wait_for_status(user, job_id, "failed")
+    assert outcomes == [False]
+
+def test_job_progress_is_recorded():
+    db.init_db()
+    session = Session(db.engine)
+    user = _make_user(session, "progress-user")
+
+    def job_fn():
+        update_job_progress({"create": {"done": 1, "total": 2}})
+        update_job_progress({"create": {"done": 2, "total": 2}})
+        return {}
+
+    job_id = run_job_in_background(
+        job_type="pull_esv_variables",
+        job_fn=job_fn,
+        session=session,
+        current_user=user
+    )
+
+    _wait_for_status(user, job_id, "success")
+    with Session(db.engine) as check:
+        assert get_job_progress(session=check, current_user=user, job_id=job_id) == {"create": {"done": 2, "total": 2}}
+
+    update_job_progress({"ignored": True})
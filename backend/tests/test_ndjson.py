@@ -0,0 +1,14 @@
+# tests/test_ndjson.py
+import json
+
+from core.ndjson import iter_ndjson
+
+def test_iter_ndjson_sends_first_line_alone_then_chunks():
+    objects = ({"name": f"esv-{i}", "value": "é" * 10} for i in range(50))
+    chunks = list(iter_ndjson(objects, chunk_bytes=200))
+
+    assert chunks[0].count(b"\n") == 1
+    assert all(len(chunk) < 200 + 100 for chunk in chunks)
+    lines = b"".join(chunks).decode("utf-8").splitlines()
+    assert [json.loads(line)["name"] for line in lines] == [f"esv-{i}" for i in range(50)]
+    assert list(iter_ndjson([])) == []